@@ -0,0 +1,133 @@
+"""CSC111 2021 Hashtag Partisanship, files of numpy arrays
+
+This file saves named numpy arrays, along with a json header, to a single binary file that can be
+memory-mapped when it is loaded. It is used for our graph snapshots (see graph_snapshot.py) and
+our columnar tweet files (see columnar.py).
+
+An array file starts with 8 magic bytes naming what kind of file it is, the version of that
+kind of file and the length of the header as two little-endian unsigned 32-bit integers, and
+then the header itself, which is utf-8 encoded json. Along with whatever the caller stores in
+it, the header records the dtype, shape and offset of every array. The arrays follow the header,
+each starting at a multiple of ALIGNMENT bytes.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+ALIGNMENT = 64
+
+# The magic bytes, the version and the length of the header.
+_PREFIX = struct.Struct('<8sII')
+
+
+def save_arrays(file_name: str, magic: bytes, version: int, header: dict,
+                arrays: dict[str, np.ndarray]) -> None:
+    """Save arrays to the array file file_name, with the given magic bytes, version and header
+    (which must be json-compatible, and not use the key 'arrays').
+
+    The file is written to a temporary file first, so a file that is being loaded is never left
+    half written.
+
+    Preconditions:
+        - len(magic) == 8
+        - 'arrays' not in header
+    """
+    array_info = {}
+    offset = 0
+    for name, values in arrays.items():
+        array_info[name] = {'dtype': values.dtype.str, 'shape': list(values.shape),
+                            'offset': offset}
+        offset = _align(offset + values.nbytes)
+    encoded_header = json.dumps({**header, 'arrays': array_info}).encode('utf-8')
+
+    temp_file_name = file_name + '.tmp'
+    with open(temp_file_name, mode='wb') as file:
+        file.write(_PREFIX.pack(magic, version, len(encoded_header)))
+        file.write(encoded_header)
+        data_start = _align(_PREFIX.size + len(encoded_header))
+        for name, values in arrays.items():
+            file.seek(data_start + array_info[name]['offset'])
+            file.write(np.ascontiguousarray(values).tobytes())
+    os.replace(temp_file_name, file_name)
+
+
+def read_header(file_name: str, magic: bytes, version: int) -> dict:
+    """Return the header of the array file file_name, with the offset of the first array stored
+    under 'data_start'.
+
+    Raise a ValueError if file_name isn't an array file with the given magic bytes and version.
+    """
+    with open(file_name, mode='rb') as file:
+        prefix = file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError
+        file_magic, file_version, header_length = _PREFIX.unpack(prefix)
+        if file_magic != magic or file_version != version:
+            raise ValueError
+        header = json.loads(file.read(header_length).decode('utf-8'))
+    header['data_start'] = _align(_PREFIX.size + header_length)
+    return header
+
+
+def has_magic(file_name: str, magic: bytes) -> bool:
+    """Return whether the file file_name starts with the given magic bytes."""
+    with open(file_name, mode='rb') as file:
+        return file.read(len(magic)) == magic
+
+
+def load_arrays(file_name: str, magic: bytes, version: int) -> tuple[dict, dict[str, np.ndarray]]:
+    """Return the header and the arrays of the array file file_name.
+
+    Only the header is read: the arrays are memory-mapped, so they are read from the file as
+    they are used, and processes that load the same file share its pages.
+
+    Raise a ValueError if file_name isn't an array file with the given magic bytes and version.
+    """
+    header = read_header(file_name, magic, version)
+    arrays = {}
+    for name, info in header['arrays'].items():
+        shape = tuple(info['shape'])
+        if 0 in shape:
+            # a file can't map zero bytes
+            arrays[name] = np.zeros(shape, dtype=info['dtype'])
+        else:
+            arrays[name] = np.memmap(file_name, dtype=info['dtype'], mode='r', shape=shape,
+                                     offset=header['data_start'] + info['offset'])
+    return header, arrays
+
+
+def _align(offset: int) -> int:
+    """Return the first multiple of ALIGNMENT that is at least offset.
+
+    >>> _align(0), _align(1), _align(64), _align(65)
+    (0, 64, 64, 128)
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['json', 'os', 'struct', 'numpy'],
+        'allowed-io': ['save_arrays', 'read_header', 'has_magic'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,355 @@
+"""CSC111 2021 Hashtag Partisanship, benchmarks
+
+This file times the slow parts of our pipeline on generated data, so that the full 40GB data-set
+isn't needed to see how a change to the pipeline affects its speed.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Iterable
+
+import numpy as np
+
+from dataclasses import WeightedGraph
+from compact_graph import CompactWeightedGraph
+import cooccurrence
+import csv_to_graph
+import making_new_csv
+import search
+
+# How many of the made up politicians are American. The rest are politicians from other
+# countries, like in the TwitterPoliticians data-set.
+NUM_US_POLITICIANS = 500
+NUM_OTHER_POLITICIANS = 4500
+NUM_HASHTAGS = 20000
+
+
+def make_tweet_fixture(tweets_file: str, member_info_file: str, senate_file: str,
+                       num_tweets: int, seed: int = 0) -> None:
+    """Write num_tweets made up hydrated tweets to tweets_file, in the same shape as the ones
+    from the hydrator, along with the member info and senate files used by get_us_hashtags.
+
+    About a third of the tweets have hashtags, and a fifth of them are retweets. The text of
+    one in a hundred tweets ends in half of an emoji (a lone UTF-16 surrogate), like the text of
+    a tweet cut short, which orjson can't decode.
+    """
+    rng = random.Random(seed)
+    us_ids = [str(10 ** 9 + i) for i in range(NUM_US_POLITICIANS)]
+    other_ids = [str(2 * 10 ** 9 + i) for i in range(NUM_OTHER_POLITICIANS)]
+    all_ids = us_ids + other_ids
+    hashtags = [f'Hashtag{i}' for i in range(NUM_HASHTAGS)]
+
+    with open(member_info_file, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['', '', '', 'user_id', 'party', '', '', '', '', 'country'])
+        for i, user_id in enumerate(us_ids):
+            writer.writerow(['', '', '', user_id, ['Democrat', 'Republican'][i % 2],
+                             '', '', '', '', 'United States'])
+        for user_id in other_ids:
+            writer.writerow(['', '', '', user_id, 'Labour', '', '', '', '', 'United Kingdom'])
+
+    with open(senate_file, mode='w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerow([''] * 16)
+
+    with open(tweets_file, mode='w', encoding='utf-8') as file:
+        for i in range(num_tweets):
+            tweet = _make_tweet(rng, i, rng.choice(all_ids), all_ids, hashtags)
+            if rng.random() < 0.2:
+                tweet['retweeted_status'] = _make_tweet(rng, i + num_tweets,
+                                                        rng.choice(all_ids), all_ids, hashtags)
+            file.write(json.dumps(tweet) + '\n')
+
+
+def _make_tweet(rng: random.Random, tweet_id: int, user_id: str, all_ids: list[str],
+                hashtags: list[str]) -> dict:
+    """Return a made up tweet with the given id and user id."""
+    if rng.random() < 0.35:
+        tweet_hashtags = [{'text': rng.choice(hashtags), 'indices': [0, 10]}
+                          for _ in range(rng.randint(1, 4))]
+    else:
+        tweet_hashtags = []
+    full_text = 'A made up tweet about "politics" ' * rng.randint(1, 6)
+    if rng.random() < 0.01:
+        full_text += '\ud83d'
+    return {
+        'created_at': 'Sat Apr 04 12:40:32 +0000 2017',
+        'id': tweet_id,
+        'id_str': str(tweet_id),
+        'full_text': full_text,
+        'truncated': False,
+        'display_text_range': [0, 140],
+        'entities': {'hashtags': tweet_hashtags, 'symbols': [], 'urls': [],
+                     'user_mentions': [{'screen_name': 'someone', 'name': 'Someone',
+                                        'id': int(mention), 'id_str': mention,
+                                        'indices': [0, 8]}
+                                       for mention in rng.sample(all_ids, rng.randint(0, 2))]},
+        'source': '<a href="https://mobile.twitter.com" rel="nofollow">Twitter Web App</a>',
+        'in_reply_to_status_id': None,
+        'in_reply_to_status_id_str': None,
+        'user': {'id': int(user_id), 'id_str': user_id, 'name': f'Politician {user_id}',
+                 'screen_name': f'politician{user_id}', 'location': 'Washington, DC',
+                 'description': 'Proudly serving my district. ' * 3,
+                 'followers_count': rng.randint(0, 10 ** 6), 'friends_count': 100,
+                 'created_at': 'Sat Apr 04 12:40:32 +0000 2009', 'verified': True,
+                 'statuses_count': 5000, 'lang': None,
+                 'profile_image_url_https': 'https://pbs.twimg.com/profile_images/1/a.jpg'},
+        'geo': None,
+        'retweet_count': rng.randint(0, 1000),
+        'favorite_count': rng.randint(0, 5000),
+        'favorited': False,
+        'retweeted': False,
+        'lang': 'en'
+    }
+
+
+def make_csv_fixture(csv_file_name: str, num_tweets: int, seed: int = 0) -> None:
+    """Write num_tweets made up rows to csv_file_name, in the same format as the csv files from
+    get_us_hashtags. A few of the hashtags are very common and most are rare, like in the
+    real data-set.
+    """
+    rng = random.Random(seed)
+    with open(csv_file_name, mode='w', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=making_new_csv.FIELDNAMES,
+                                lineterminator='\n')
+        writer.writeheader()
+        for tweet_id in range(num_tweets):
+            num_hashtags = min(int(rng.expovariate(0.8)) + 1, 10)
+            hashtags = {f'Hashtag{int(NUM_HASHTAGS * 10 * rng.random() ** 3)}'
+                        for _ in range(num_hashtags)}
+            writer.writerow({'name': 'Politician', 'partisan_score': rng.randint(0, 1),
+                             'hashtags': hashtags, 'tweet_id': tweet_id})
+
+
+def benchmark_tweet_filter(num_tweets: int = 200000) -> dict[str, float]:
+    """Time the tweet filtering loop of get_us_hashtags on num_tweets generated tweets, once
+    decoding every tweet with the json module (how it used to work) and once with
+    making_new_csv._filter_tweets. Return the seconds taken per million tweets by each, and
+    raise an AssertionError if the csv files or the counts of the two are not the same.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        tweets_file = os.path.join(directory, 'tweets.jsonl')
+        member_info_file = os.path.join(directory, 'member_info.csv')
+        senate_file = os.path.join(directory, 'senate.csv')
+        make_tweet_fixture(tweets_file, member_info_file, senate_file, num_tweets)
+        us_politicians = making_new_csv.get_us_information(member_info_file, senate_file)
+
+        times = {}
+        outputs = {}
+        for name, filter_tweets in [('json.loads every tweet', _filter_tweets_json),
+                                    ('fast path', making_new_csv._filter_tweets)]:
+            output_file = os.path.join(directory, f'{len(outputs)}.csv')
+            with open(output_file, mode='w', encoding='utf-8') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=making_new_csv.FIELDNAMES,
+                                        lineterminator='\n')
+                writer.writeheader()
+                with open(tweets_file, mode='rb') as json_file:
+                    start = time.perf_counter()
+                    unread, unique_politicians = filter_tweets(json_file, us_politicians,
+                                                               writer)
+                    times[name] = (time.perf_counter() - start) * 10 ** 6 / num_tweets
+            with open(output_file, mode='rb') as csv_file:
+                outputs[name] = (csv_file.read(), unread, len(unique_politicians))
+
+    assert len(set(outputs.values())) == 1
+    for name, seconds in times.items():
+        print(f'{name}: {seconds:.2f}s per million tweets')
+    return times
+
+
+def benchmark_graph_memory(num_tweets: int = 300000) -> dict[str, float]:
+    """Load a generated csv file of num_tweets rows into a WeightedGraph and into a
+    CompactWeightedGraph (without removing any hashtags), and return the memory in MB each graph
+    takes up once it is built and the most memory used while building it. Raise an
+    AssertionError if the two graphs are not the same.
+    """
+    memory = {}
+    graphs = {}
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file_name = os.path.join(directory, 'filtered.csv')
+        make_csv_fixture(csv_file_name, num_tweets)
+        for name, compact in [('WeightedGraph', False), ('CompactWeightedGraph', True)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            graph = csv_to_graph.load_weighted_hashtags_graph(csv_file_name, 0, 'abs', compact)
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory[name] = current / 2 ** 20
+            memory[name + ' (peak)'] = peak / 2 ** 20
+            graphs[name] = graph
+            print(f'{name}: {current / 2 ** 20:.1f}MB, {peak / 2 ** 20:.1f}MB at peak, '
+                  f'built in {seconds:.1f}s')
+
+    graph, compact_graph = graphs['WeightedGraph'], graphs['CompactWeightedGraph']
+    rng = random.Random(0)
+    items = list(graph.get_vertices())
+    for _ in range(1000):
+        item1, item2 = rng.choice(items), rng.choice(items)
+        assert graph.get_weight_hashtag(item1) == compact_graph.get_weight_hashtag(item1)
+        assert graph.adjacent(item1, item2) == compact_graph.adjacent(item1, item2)
+        assert graph.get_weight_edge(item1, item2) == compact_graph.get_weight_edge(item1, item2)
+    return memory
+
+
+def benchmark_cooccurrence(num_tweets: int = 300000, min_count: int = 10) -> dict[str, float]:
+    """Time building a WeightedGraph (without the hashtags at or below min_count) from a
+    generated csv file of num_tweets rows, once adding every pair of hashtags of every tweet
+    with add_edge (how it used to work) and once with csv_to_graph.build_graph_from_records.
+    Return the seconds taken by each, and raise an AssertionError if the two graphs are not the
+    same.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file_name = os.path.join(directory, 'filtered.csv')
+        make_csv_fixture(csv_file_name, num_tweets)
+        records = list(csv_to_graph.read_tweets_csv(csv_file_name))
+
+    times = {}
+    graphs = {}
+    for name, build in [('add_edge for every pair', _build_graph_pairs),
+                        ('sparse matrix product', csv_to_graph.build_graph_from_records)]:
+        start = time.perf_counter()
+        graphs[name] = build(records, min_count, 'abs')
+        times[name] = time.perf_counter() - start
+        print(f'{name}: {times[name]:.1f}s')
+
+    graph, sparse_graph = graphs.values()
+    vertices = graph.get_vertices()
+    sparse_vertices = sparse_graph.get_vertices()
+    assert list(vertices) == list(sparse_vertices)
+    for item, vertex in vertices.items():
+        sparse_vertex = sparse_vertices[item]
+        assert (vertex.count, vertex.count_dem, vertex.count_rep, vertex.partisanship) == \
+            (sparse_vertex.count, sparse_vertex.count_dem, sparse_vertex.count_rep,
+             sparse_vertex.partisanship)
+        assert {u.item: count for u, count in vertex.neighbours.items()} == \
+            {u.item: count for u, count in sparse_vertex.neighbours.items()}
+    return times
+
+
+def benchmark_early_pruning(num_tweets: int = 300000, min_count: int = 10) -> dict[str, float]:
+    """Count the pairs of hashtags of a generated csv file of num_tweets rows, once counting
+    every pair and then removing the hashtags at or below min_count (how it used to work), and
+    once removing them before the pairs are counted. Return the seconds taken and the most
+    memory used in MB by each, and raise an AssertionError if the two graphs are not the same.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file_name = os.path.join(directory, 'filtered.csv')
+        make_csv_fixture(csv_file_name, num_tweets)
+        encoded = cooccurrence.encode_records(csv_to_graph.read_tweets_csv(csv_file_name))
+
+    results = {}
+    arrays = {}
+    for name, prune_first in [('count then remove_min_count', False),
+                              ('remove before counting pairs', True)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        if prune_first:
+            graph_arrays = cooccurrence.count_cooccurrences(*encoded, min_count)
+        else:
+            graph = CompactWeightedGraph.from_arrays(
+                'abs', cooccurrence.count_cooccurrences(*encoded))
+            graph.remove_min_count(min_count)
+            graph_arrays = graph.to_arrays()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        results[name] = seconds
+        results[name + ' (peak MB)'] = peak
+        arrays[name] = graph_arrays
+        print(f'{name}: {seconds:.2f}s, {peak:.1f}MB at peak')
+
+    pruned_later, pruned_first = arrays.values()
+    for key, values in pruned_later.items():
+        assert np.array_equal(values, pruned_first[key])
+    return results
+
+
+def benchmark_search(num_hashtags: int = 1000000, num_queries: int = 2000) -> dict[str, float]:
+    """Time building a search.HashtagIndex of num_hashtags generated hashtags, and searching it
+    for num_queries prefixes of them, of one to six characters. Return the seconds taken to
+    build it, and the median and slowest search in milliseconds.
+    """
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 8)))
+             for _ in range(5000)]
+    names = list({''.join(rng.choices(words, k=rng.randint(1, 3)))
+                  for _ in range(num_hashtags)})
+    counts = [int(rng.paretovariate(1.2)) for _ in names]
+
+    start = time.perf_counter()
+    index = search.HashtagIndex(names, counts)
+    results = {'build': time.perf_counter() - start}
+    print(f'build an index of {len(names)} hashtags: {results["build"]:.1f}s')
+
+    times = []
+    for _ in range(num_queries):
+        query = rng.choice(names)[:rng.randint(1, 6)]
+        start = time.perf_counter()
+        index.search(query)
+        times.append((time.perf_counter() - start) * 1000)
+    results['median search (ms)'] = float(np.median(times))
+    results['slowest search (ms)'] = max(times)
+    print(f'search: {results["median search (ms)"]:.3f}ms median, '
+          f'{results["slowest search (ms)"]:.3f}ms at most')
+    return results
+
+
+def _build_graph_pairs(records: Iterable[tuple[int, list[str]]], min_count: int,
+                       edge_format: str) -> WeightedGraph:
+    """csv_to_graph.build_graph_from_records before the pairs were counted with a sparse
+    matrix product."""
+    hashtag_graph = WeightedGraph(edge_format)
+    for party, lst in records:
+        for hashtag in lst:
+            hashtag_graph.add_vertex(hashtag, party)
+        for i in range(0, len(lst) - 1):
+            for j in range(i + 1, len(lst)):
+                hashtag_graph.add_edge(lst[i], lst[j])
+    hashtag_graph.remove_min_count(min_count)
+    return hashtag_graph
+
+
+def _filter_tweets_json(lines: list, us_politicians: dict[str, int],
+                        writer: csv.DictWriter) -> tuple[int, set[str]]:
+    """The tweet filtering loop of get_us_hashtags before the fast path was added (but with
+    the tweet_id and created_at columns, so the rows are the same)."""
+    unread = 0
+    unique_politicians = set()
+    for line in lines:
+        tweet = json.loads(line)
+        user = tweet['user']
+        user_id = user['id_str']
+        if tweet['entities']['hashtags'] != []:
+            if user_id in us_politicians:
+                writer.writerow(
+                    {'name': user['name'],
+                     'partisan_score': us_politicians[user['id_str']],
+                     'hashtags': {x['text'] for x in tweet['entities']['hashtags']},
+                     'tweet_id': tweet['id_str'],
+                     'created_at': making_new_csv.parse_created_at(tweet['created_at'])})
+                unique_politicians.add(user_id)
+            else:
+                unread += 1
+    return unread, unique_politicians
+
+
+if __name__ == '__main__':
+    benchmark_tweet_filter()
+    benchmark_graph_memory()
+    benchmark_cooccurrence()
+    benchmark_early_pruning()
+    benchmark_search()
@@ -0,0 +1,186 @@
+"""CSC111 2021 Hashtag Partisanship, caching the steps of building the graph
+
+This file runs the steps of our program (filtering the hydrated tweets into a csv file, counting
+the hashtags and the pairs of hashtags in that csv file, and removing the hashtags below
+min_count) through a cache, so that only the steps whose inputs have changed are run again.
+
+Every step's output is saved in the cache directory under a key, which is a hash of the
+step's name and version, its parameters, and its inputs. An input file is identified by its
+fingerprint (its size and modification time, or optionally a hash of its contents), and the
+output of an earlier step by that step's key. For example, changing min_count only changes the
+key of the last step, so the counts of the earlier step are loaded from the cache and just the
+hashtags below min_count are removed again.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import hashlib
+import json
+import os
+
+from compact_graph import CompactWeightedGraph
+import csv_to_graph
+import graph_snapshot
+import making_new_csv
+
+CACHE_DIR = '.hashtag_cache'
+
+# Change the version of a step whenever its output would change for the same inputs, so that
+# outputs saved by older code are not used.
+FILTER_STEP_VERSION = 3
+COUNT_STEP_VERSION = 1
+PRUNE_STEP_VERSION = 1
+
+# How many bytes of a file are hashed at once by input_fingerprint.
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def build_graph(tweets_file: str, member_info_file: str, senate_file: str, min_count: int,
+                edge_format: str, cache_dir: str = CACHE_DIR, hash_contents: bool = False,
+                num_workers: int = 0) -> CompactWeightedGraph:
+    """Return the graph of the us politician tweets in the hydrated tweets_file, like running
+    get_us_hashtags and then load_weighted_hashtags_graph, but reusing the output of every step
+    saved in cache_dir whose inputs haven't changed.
+
+    Optional arguments:
+        - cache_dir: the directory the outputs of each step are saved in
+        - hash_contents: identify the input files by a hash of their contents instead of their
+            size and modification time, which is slower but notices files that are replaced by
+            a copy with the same size and time
+        - num_workers: the number of processes used to filter tweets_file, see
+            get_us_hashtags_parallel. get_us_hashtags is used if this is 1.
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+        - num_workers >= 0
+    """
+    key = step_key('filter', FILTER_STEP_VERSION,
+                   [input_fingerprint(file_name, hash_contents)
+                    for file_name in (tweets_file, member_info_file, senate_file)], {})
+    filtered_csv = _cache_file(cache_dir, 'filtered', key, '.csv')
+    if not os.path.exists(filtered_csv):
+        temp_file_name = filtered_csv + '.tmp'
+        if num_workers == 1:
+            making_new_csv.get_us_hashtags(tweets_file, member_info_file, senate_file,
+                                           temp_file_name)
+        else:
+            making_new_csv.get_us_hashtags_parallel(tweets_file, member_info_file, senate_file,
+                                                    temp_file_name, num_workers)
+        os.replace(temp_file_name, filtered_csv)
+
+    return _build_graph_from_key(filtered_csv, key, min_count, edge_format, cache_dir)
+
+
+def build_graph_from_csv(tweets_csv: str, min_count: int, edge_format: str,
+                         cache_dir: str = CACHE_DIR, hash_contents: bool = False) \
+        -> CompactWeightedGraph:
+    """Return the graph load_weighted_hashtags_graph would build from the csv file tweets_csv,
+    reusing the counts and graph saved in cache_dir if tweets_csv hasn't changed.
+
+    See build_graph for the optional arguments.
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+    """
+    key = step_key('csv', 1, [input_fingerprint(tweets_csv, hash_contents)], {})
+    return _build_graph_from_key(tweets_csv, key, min_count, edge_format, cache_dir)
+
+
+def _build_graph_from_key(tweets_csv: str, csv_key: str, min_count: int, edge_format: str,
+                          cache_dir: str) -> CompactWeightedGraph:
+    """Return the graph of tweets_csv, whose contents are identified by csv_key, running the
+    counting and pruning steps if their outputs aren't in cache_dir.
+    """
+    count_key = step_key('count', COUNT_STEP_VERSION, [csv_key], {})
+    raw_counts_file = _cache_file(cache_dir, 'counts', count_key, '.graph')
+    prune_key = step_key('prune', PRUNE_STEP_VERSION, [count_key],
+                         {'min_count': min_count, 'edge_format': edge_format})
+    graph_file = _cache_file(cache_dir, 'graph', prune_key, '.graph')
+
+    if os.path.exists(graph_file):
+        return graph_snapshot.load_snapshot(graph_file)
+
+    if os.path.exists(raw_counts_file):
+        graph = graph_snapshot.load_snapshot(raw_counts_file)
+    else:
+        # the edge format doesn't change the counts, so the same counts are used for both
+        graph = csv_to_graph.load_weighted_hashtags_graph(tweets_csv, 0, 'abs', compact=True)
+        graph_snapshot.save_snapshot(graph, raw_counts_file, 0, {'key': count_key})
+
+    graph.edge_format = edge_format
+    graph.remove_min_count(min_count)
+    graph_snapshot.save_snapshot(graph, graph_file, min_count, {'key': prune_key})
+    return graph
+
+
+def step_key(step: str, version: int, inputs: list, parameters: dict) -> str:
+    """Return the cache key of running the given version of step on inputs with parameters.
+    inputs and parameters must be json-compatible.
+
+    >>> step_key('prune', 1, ['abc'], {'min_count': 200}) == \
+        step_key('prune', 1, ['abc'], {'min_count': 200})
+    True
+    >>> step_key('prune', 1, ['abc'], {'min_count': 200}) == \
+        step_key('prune', 1, ['abc'], {'min_count': 100})
+    False
+    """
+    description = json.dumps({'step': step, 'version': version, 'inputs': inputs,
+                              'parameters': parameters}, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def input_fingerprint(file_name: str, hash_contents: bool = False) -> dict:
+    """Return a json-compatible dict identifying the contents of the file file_name: its
+    absolute path, inode, size and modification time, or the sha256 hash of its contents if
+    hash_contents is True.
+
+    The path and inode are included so that two different files with the same size and
+    modification time (which cp -p, rsync -a and extracting an archive can make) don't share
+    a cache entry.
+    """
+    if not hash_contents:
+        stat = os.stat(file_name)
+        return {'path': os.path.abspath(file_name), 'inode': stat.st_ino,
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    file_hash = hashlib.sha256()
+    with open(file_name, mode='rb') as file:
+        block = file.read(_HASH_BLOCK_SIZE)
+        while block != b'':
+            file_hash.update(block)
+            block = file.read(_HASH_BLOCK_SIZE)
+    return {'sha256': file_hash.hexdigest()}
+
+
+def _cache_file(cache_dir: str, step: str, key: str, extension: str) -> str:
+    """Return the name of the file in cache_dir that the output of step with the given key is
+    saved to, creating cache_dir if it doesn't exist.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f'{step}-{key[:32]}{extension}')
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['hashlib', 'json', 'os', 'compact_graph', 'csv_to_graph',
+                          'graph_snapshot', 'making_new_csv'],
+        'allowed-io': ['input_fingerprint'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
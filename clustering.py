@@ -0,0 +1,299 @@
+"""CSC111 2021 Hashtag Partisanship, finding clusters of hashtags
+
+This file splits the hashtags of a graph into clusters (communities) of hashtags that are used
+together much more than they are used with the rest of the graph, for
+visualization.visualize_graph_clusters.
+
+The clusters are found from the edges of the graph in CSR form (see
+CompactWeightedGraph.to_csr), by one of the METHODS:
+    - 'label_propagation': every hashtag starts in a cluster of its own, and at every step
+        moves to the cluster its neighbours have the most weight in. Every step looks at all
+        the edges at once with numpy, so the whole graph takes a few seconds.
+    - 'louvain': the Louvain method of networkx, which usually finds better clusters (with a
+        higher modularity, see modularity), but is much slower on a large graph.
+The clusters are numbered from the largest to the smallest, and are returned as a dict that
+maps every hashtag to the number of its cluster. Since finding them takes a while, they can be
+saved to a file next to the graph (see load_or_compute_clusters), like the layout.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import hashlib
+import os
+from typing import Any, Callable, Optional, Union
+
+import networkx as nx
+import numpy as np
+
+import array_file
+from dataclasses import WeightedGraph
+from compact_graph import CompactWeightedGraph, sum_by_key
+
+CLUSTERS_MAGIC = b'HASHCLUS'
+CLUSTERS_VERSION = 1
+
+# The most steps label_propagation takes, if its clusters haven't stopped changing before.
+MAX_ITERATIONS = 50
+
+# The chance that a hashtag that would move to another cluster at a step of label_propagation
+# does, so that two groups of hashtags don't keep swapping their clusters.
+UPDATE_PROBABILITY = 0.5
+
+# The id of a hashtag takes up the bits above these in the keys of label_propagation.
+_LABEL_BITS = 32
+_LABEL_MASK = (1 << _LABEL_BITS) - 1
+
+
+def cluster_graph(graph: Union[WeightedGraph, CompactWeightedGraph],
+                  method: str = 'label_propagation', seed: int = 0) -> dict[Any, int]:
+    """Return the number of the cluster of every hashtag of graph, found with the given method
+    (see METHODS). The clusters are numbered from the largest to the smallest.
+
+    Preconditions:
+        - method in METHODS
+
+    >>> g = WeightedGraph()
+    >>> for hashtag in ['daca', 'dreamers', 'maga', 'kag', 'trump']:
+    ...     g.add_vertex(hashtag, 0)
+    >>> for hashtag1, hashtag2 in [('daca', 'dreamers'), ('maga', 'kag'), ('kag', 'trump'),
+    ...                            ('maga', 'trump')]:
+    ...     g.add_edge(hashtag1, hashtag2)
+    >>> cluster_graph(g)
+    {'daca': 1, 'dreamers': 1, 'maga': 0, 'kag': 0, 'trump': 0}
+    """
+    return cluster_csr(graph_csr(graph), method, seed)
+
+
+def cluster_csr(csr: tuple[list, np.ndarray, np.ndarray, np.ndarray], method: str,
+                seed: int = 0) -> dict[Any, int]:
+    """Return the number of the cluster of every hashtag of the graph with the given hashtags
+    and CSR arrays (see graph_csr), found with the given method (see METHODS).
+
+    Preconditions:
+        - method in METHODS
+    """
+    items, offsets, indices, weights = csr
+    labels = METHODS[method](offsets, indices, weights, seed)
+    return dict(zip(items, labels.tolist()))
+
+
+def graph_csr(graph: Union[WeightedGraph, CompactWeightedGraph]) \
+        -> tuple[list, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the hashtags and the edges of graph in CSR form (see
+    CompactWeightedGraph.to_csr).
+    """
+    if isinstance(graph, WeightedGraph):
+        graph = CompactWeightedGraph.from_weighted_graph(graph)
+    return graph.to_csr()
+
+
+def label_propagation(offsets: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+                      seed: int = 0, max_iterations: int = MAX_ITERATIONS) -> np.ndarray:
+    """Return the number of the cluster of every node of the graph with the given CSR arrays
+    (see CompactWeightedGraph.to_csr), found by weighted label propagation. The clusters are
+    numbered from the largest to the smallest.
+
+    Every node starts with a label of its own. At every step, the weights of the edges of each
+    node are added up by the label of the node at their other end, and the node moves to the
+    label with the most weight. A node stays with its own label if that is one of the best,
+    and otherwise picks one of the best at random. Only about UPDATE_PROBABILITY of the nodes
+    that would move do, picked at random with seed. This stops once no node would move, or
+    after max_iterations steps. An edge from a node to itself is ignored.
+
+    Every step sorts the edges by node and label once, so it takes O(E log E) time.
+
+    >>> offsets, indices = np.array([0, 1, 2, 4, 6, 8]), np.array([1, 0, 3, 4, 2, 4, 2, 3])
+    >>> label_propagation(offsets, indices, np.ones(8)).tolist()
+    [1, 1, 0, 0, 0]
+    """
+    num_nodes = len(offsets) - 1
+    rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(offsets))
+    others = rows != indices
+    rows = rows[others]
+    cols = np.asarray(indices, dtype=np.int64)[others]
+    weights = np.asarray(weights, dtype=np.float64)[others]
+    labels = np.arange(num_nodes, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(max_iterations if len(rows) > 0 else 0):
+        # the weight of the edges of every node to every label, sorted by node and then label
+        keys, sums = sum_by_key((rows << _LABEL_BITS) | labels[cols], weights)
+        key_rows, key_labels = keys >> _LABEL_BITS, keys & _LABEL_MASK
+        starts = np.flatnonzero(np.concatenate([[True], key_rows[1:] != key_rows[:-1]]))
+        nodes = key_rows[starts]
+        is_best = sums == np.repeat(np.maximum.reduceat(sums, starts),
+                                    np.diff(np.append(starts, len(keys))))
+        # a random one of the best labels, unless the node's own label is one of them
+        priorities = np.where(is_best, rng.random(len(keys)), -1.0)
+        picked = np.flatnonzero(priorities == np.repeat(np.maximum.reduceat(priorities, starts),
+                                                        np.diff(np.append(starts, len(keys)))))
+        picked = picked[np.searchsorted(picked, starts)]
+        keeps_own = np.logical_or.reduceat(is_best & (key_labels == labels[key_rows]), starts)
+        new_labels = np.where(keeps_own, labels[nodes], key_labels[picked])
+
+        moving = new_labels != labels[nodes]
+        if not moving.any():
+            break
+        moving &= rng.random(len(moving)) < UPDATE_PROBABILITY
+        labels[nodes[moving]] = new_labels[moving]
+    return _number_by_size(labels)
+
+
+def louvain(offsets: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+            seed: int = 0) -> np.ndarray:
+    """Return the number of the cluster of every node of the graph with the given CSR arrays,
+    found with the Louvain method of networkx (with the given seed). The clusters are numbered
+    from the largest to the smallest.
+    """
+    num_nodes = len(offsets) - 1
+    rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(offsets))
+    # every edge is in the rows of both of its nodes, and is only added once
+    upper = rows < indices
+    graph_nx = nx.Graph()
+    graph_nx.add_nodes_from(range(num_nodes))
+    graph_nx.add_weighted_edges_from(zip(rows[upper].tolist(), indices[upper].tolist(),
+                                         weights[upper].tolist()))
+
+    labels = np.zeros(num_nodes, dtype=np.int64)
+    for label, community in enumerate(nx.community.louvain_communities(graph_nx, seed=seed)):
+        labels[list(community)] = label
+    return _number_by_size(labels)
+
+
+def modularity(offsets: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+               labels: np.ndarray) -> float:
+    """Return the modularity of the clusters with the given labels of the graph with the given
+    CSR arrays: the share of the weight of the edges that is inside clusters, minus the share
+    that would be expected if the edges were placed at random. An edge from a node to itself
+    is ignored.
+
+    >>> offsets, indices = np.array([0, 1, 2, 4, 6, 8]), np.array([1, 0, 3, 4, 2, 4, 2, 3])
+    >>> round(modularity(offsets, indices, np.ones(8), np.array([1, 1, 0, 0, 0])), 3)
+    0.375
+    """
+    num_nodes = len(offsets) - 1
+    rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(offsets))
+    others = rows != indices
+    rows, cols, weights = rows[others], np.asarray(indices)[others], weights[others]
+    total = weights.sum()
+    if total == 0:
+        return 0.0
+    inside = weights[labels[rows] == labels[cols]].sum()
+    strengths = np.bincount(labels[rows], weights=weights)
+    return float(inside / total - np.sum((strengths / total) ** 2))
+
+
+def clusters_key(csr: tuple[list, np.ndarray, np.ndarray, np.ndarray], method: str,
+                 seed: int) -> str:
+    """Return a hash of the hashtags and CSR arrays of a graph (see graph_csr) and of the way
+    its clusters are found, which changes whenever its clusters would.
+    """
+    items, offsets, indices, weights = csr
+    digest = hashlib.sha256(f'{method}\n{seed}\n'.encode('utf-8'))
+    digest.update('\n'.join(str(item) for item in items).encode('utf-8'))
+    for values in (offsets, indices, weights):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def clusters_file_name(graph_file: str) -> str:
+    """Return the name of the clusters file kept next to the file graph_file the graph was
+    built from.
+
+    >>> clusters_file_name('total_filtered_politician.csv')
+    'total_filtered_politician.clusters'
+    """
+    return os.path.splitext(graph_file)[0] + '.clusters'
+
+
+def load_or_compute_clusters(graph: Union[WeightedGraph, CompactWeightedGraph], file_name: str,
+                             method: str = 'label_propagation', seed: int = 0) -> dict[Any, int]:
+    """Return cluster_graph(graph, method, seed), loading it from the clusters file file_name
+    if it was saved for this graph, method and seed. Otherwise, find the clusters and save
+    them to file_name.
+
+    Preconditions:
+        - method in METHODS
+    """
+    # the graph is only turned into CSR arrays once, since that copies a WeightedGraph
+    csr = graph_csr(graph)
+    key = clusters_key(csr, method, seed)
+    clusters = load_clusters(file_name, key, csr[0])
+    if clusters is None:
+        clusters = cluster_csr(csr, method, seed)
+        array_file.save_arrays(file_name, CLUSTERS_MAGIC, CLUSTERS_VERSION, {'key': key}, {
+            'labels': np.fromiter(clusters.values(), dtype=np.int32, count=len(clusters))
+        })
+    return clusters
+
+
+def load_clusters(file_name: str, key: str, items: list) -> Optional[dict[Any, int]]:
+    """Return the clusters of the hashtags items saved in the clusters file file_name, or None
+    if there is no such file or it wasn't saved for the clusters_key key.
+
+    The hashtags aren't saved: the labels are in the order of the hashtags of the graph,
+    which is part of the key.
+    """
+    if not os.path.exists(file_name):
+        return None
+    try:
+        header, arrays = array_file.load_arrays(file_name, CLUSTERS_MAGIC, CLUSTERS_VERSION)
+    except ValueError:
+        return None
+    if header.get('key') != key:
+        return None
+    return dict(zip(items, arrays['labels'].tolist()))
+
+
+def cluster_sets(clusters: dict[Any, int]) -> list[set]:
+    """Return the clusters as a list of sets of hashtags, indexed by the number of each cluster.
+
+    >>> [sorted(cluster) for cluster in cluster_sets({'daca': 1, 'maga': 0, 'dreamers': 1})]
+    [['maga'], ['daca', 'dreamers']]
+    """
+    sets = [set() for _ in range(max(clusters.values(), default=-1) + 1)]
+    for item, label in clusters.items():
+        sets[label].add(item)
+    return sets
+
+
+def _number_by_size(labels: np.ndarray) -> np.ndarray:
+    """Return labels with every label replaced by the number of its cluster, from the largest
+    cluster to the smallest. Clusters of the same size are in the order of their labels.
+
+    >>> _number_by_size(np.array([7, 3, 7, 5, 3, 7])).tolist()
+    [0, 1, 0, 2, 1, 0]
+    """
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    numbers = np.empty(len(counts), dtype=np.int32)
+    numbers[np.argsort(-counts, kind='stable')] = np.arange(len(counts), dtype=np.int32)
+    return numbers[inverse.reshape(-1)]
+
+
+# The ways of finding clusters, by name.
+METHODS: dict[str, Callable[..., np.ndarray]] = {'label_propagation': label_propagation,
+                                                 'louvain': louvain}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['hashlib', 'os', 'networkx', 'numpy', 'array_file', 'dataclasses',
+                          'compact_graph'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
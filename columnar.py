@@ -0,0 +1,254 @@
+"""CSC111 2021 Hashtag Partisanship, columnar files of filtered tweets
+
+This file saves the filtered tweets of us politicians (see making_new_csv.py) to a binary
+columnar file, which is an array file (see array_file.py) that can be used instead of the csv
+file made by get_us_hashtags. It is much smaller than the csv file, and much faster to read,
+since no row has to be parsed.
+
+Every hashtag (as it was written) is stored once, in a dictionary of hashtags, and each tweet
+stores the indexes of its hashtags in that dictionary. The columns of a columnar file are:
+    - hashtags: the dictionary of hashtags, encoded in utf-8 and separated by newlines
+    - tweet_offsets: the hashtags of tweet i are tweet_hashtags[tweet_offsets[i]:
+        tweet_offsets[i + 1]]
+    - tweet_hashtags: the indexes of the hashtags of every tweet in the dictionary
+    - parties: the partisan score of every tweet (democrat: 0, republicans: 1)
+    - politicians: the index of the politician that sent every tweet, in politician_ids and
+        politician_names
+    - tweet_ids: the id of every tweet, or -1 if it isn't known
+    - created_at: the time every tweet was sent, in seconds since the epoch, or -1 if it isn't
+        known (version 1 files don't have this column, see load_columnar)
+    - politician_ids: the twitter id of every politician, or -1 if it isn't known
+    - politician_names: the name of every politician, encoded in utf-8 and separated by newlines
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import ast
+import csv
+from array import array
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+import array_file
+
+COLUMNAR_MAGIC = b'HASHCOLS'
+COLUMNAR_VERSION = 2
+
+# How many tweets read_columnar converts to python lists at once.
+_CHUNK_SIZE = 1 << 16
+
+
+class ColumnarWriter:
+    """A columnar file of tweets that is being written. The tweets are kept in memory (as
+    arrays of integers) until save is called.
+
+    >>> writer = ColumnarWriter()
+    >>> writer.add_tweet('Nancy Pelosi', 15764644, 0, ['DACA', 'Dreamers'], 1)
+    >>> writer.add_tweet('Nancy Pelosi', 15764644, 0, ['DACA'], 2)
+    >>> writer.num_tweets
+    2
+    """
+    num_tweets: int
+
+    # Private Instance Attributes:
+    #     - _hashtag_ids: the index of every hashtag in the dictionary of hashtags
+    #     - _politician_indexes: the index of every politician, keyed by their id and name
+    #     - _politician_ids: the twitter id of every politician
+    #     - _politician_names: the name of every politician
+    #     - _tweet_offsets, _tweet_hashtags, _parties, _politicians, _tweet_ids, _created_at:
+    #         the columns of the tweets added so far (see the module docstring)
+    _hashtag_ids: dict[str, int]
+    _politician_indexes: dict[tuple[int, str], int]
+    _politician_ids: array
+    _politician_names: list[str]
+    _tweet_offsets: array
+    _tweet_hashtags: array
+    _parties: array
+    _politicians: array
+    _tweet_ids: array
+    _created_at: array
+
+    def __init__(self) -> None:
+        self.num_tweets = 0
+        self._hashtag_ids = {}
+        self._politician_indexes = {}
+        self._politician_ids = array('q')
+        self._politician_names = []
+        self._tweet_offsets = array('q', [0])
+        self._tweet_hashtags = array('i')
+        self._parties = array('B')
+        self._politicians = array('i')
+        self._tweet_ids = array('q')
+        self._created_at = array('q')
+
+    def add_tweet(self, name: str, user_id: int, party: int, hashtags: Iterable[str],
+                  tweet_id: int, created_at: int = -1) -> None:
+        """Add a tweet with the given hashtags, sent by the politician with the given name and
+        twitter id at the time created_at (in seconds since the epoch). user_id, tweet_id and
+        created_at are -1 if they aren't known.
+
+        Preconditions:
+            - party in {0, 1}
+            - all('\\n' not in hashtag for hashtag in hashtags) and '\\n' not in name
+        """
+        politician = self._politician_indexes.setdefault((user_id, name),
+                                                         len(self._politician_names))
+        if politician == len(self._politician_names):
+            self._politician_ids.append(user_id)
+            self._politician_names.append(name)
+
+        for hashtag in hashtags:
+            self._tweet_hashtags.append(self._hashtag_ids.setdefault(hashtag,
+                                                                     len(self._hashtag_ids)))
+        self._tweet_offsets.append(len(self._tweet_hashtags))
+        self._parties.append(party)
+        self._politicians.append(politician)
+        self._tweet_ids.append(tweet_id)
+        self._created_at.append(created_at)
+        self.num_tweets += 1
+
+    def save(self, file_name: str) -> None:
+        """Save the tweets added so far to the columnar file file_name."""
+        array_file.save_arrays(file_name, COLUMNAR_MAGIC, COLUMNAR_VERSION,
+                               {'num_tweets': self.num_tweets}, {
+                                   'hashtags': _encode_strings(list(self._hashtag_ids)),
+                                   'tweet_offsets': np.frombuffer(self._tweet_offsets, np.int64),
+                                   'tweet_hashtags': np.frombuffer(self._tweet_hashtags,
+                                                                   np.int32),
+                                   'parties': np.frombuffer(self._parties, np.uint8),
+                                   'politicians': np.frombuffer(self._politicians, np.int32),
+                                   'tweet_ids': np.frombuffer(self._tweet_ids, np.int64),
+                                   'created_at': np.frombuffer(self._created_at, np.int64),
+                                   'politician_ids': np.frombuffer(self._politician_ids,
+                                                                   np.int64),
+                                   'politician_names': _encode_strings(self._politician_names)
+                               })
+
+
+def write_columnar(tweets: Iterable[Any], file_name: str) -> int:
+    """Save tweets, which are FilteredTweets (see making_new_csv.py), to the columnar file
+    file_name, and return the number of tweets saved.
+    """
+    writer = ColumnarWriter()
+    for tweet in tweets:
+        writer.add_tweet(tweet.name, int(tweet.user_id), tweet.party, tweet.hashtags,
+                         int(tweet.tweet_id), tweet.created_at)
+    writer.save(file_name)
+    return writer.num_tweets
+
+
+def csv_to_columnar(tweets_csv: str, file_name: str) -> int:
+    """Save the tweets in the csv file tweets_csv, made by get_us_hashtags, to the columnar file
+    file_name, and return the number of tweets saved.
+
+    The csv file doesn't have the twitter ids of the politicians, so they are saved as -1, and
+    so are the tweet ids and times of csv files made before the tweet_id and created_at
+    columns were added.
+    """
+    writer = ColumnarWriter()
+    with open(tweets_csv, encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        id_column = header.index('tweet_id') if 'tweet_id' in header else -1
+        time_column = header.index('created_at') if 'created_at' in header else -1
+        for row in reader:
+            tweet_id = int(row[id_column]) if id_column != -1 else -1
+            created_at = int(row[time_column] or -1) if time_column != -1 else -1
+            # unlike string_to_list, this keeps hashtags with quotes or commas in one piece. The
+            # set is read as a list, so the hashtags stay in the order of the csv file.
+            hashtags = ast.literal_eval('[' + row[2][1:-1] + ']')
+            writer.add_tweet(row[0], -1, int(row[1]), hashtags, tweet_id, created_at)
+    writer.save(file_name)
+    return writer.num_tweets
+
+
+def is_columnar_file(file_name: str) -> bool:
+    """Return whether file_name is a columnar file (rather than a csv file)."""
+    return array_file.has_magic(file_name, COLUMNAR_MAGIC)
+
+
+def load_columnar(file_name: str) -> dict[str, np.ndarray]:
+    """Return the columns of the columnar file file_name, which are memory-mapped. The
+    created_at column of a version 1 file, which doesn't have one, is all -1.
+
+    Raise a ValueError if file_name isn't a columnar file of COLUMNAR_VERSION or version 1.
+    """
+    try:
+        return array_file.load_arrays(file_name, COLUMNAR_MAGIC, COLUMNAR_VERSION)[1]
+    except ValueError:
+        columns = array_file.load_arrays(file_name, COLUMNAR_MAGIC, 1)[1]
+        columns['created_at'] = np.full(len(columns['parties']), -1, dtype=np.int64)
+        return columns
+
+
+def decode_strings(blob: np.ndarray) -> list[str]:
+    """Return the list of strings saved in blob, a column of strings separated by newlines.
+
+    >>> decode_strings(_encode_strings(['DACA', 'Dreamers']))
+    ['DACA', 'Dreamers']
+    >>> decode_strings(_encode_strings([]))
+    []
+    """
+    if len(blob) == 0:
+        return []
+    return blob.tobytes().decode('utf-8').split('\n')
+
+
+def read_columnar(file_name: str) -> Iterator[tuple[int, list[str]]]:
+    """Yield the party and the list of hashtags of every tweet in the columnar file file_name,
+    the same way read_tweets_csv does for a csv file: the hashtags are in lower case, in the
+    order they were saved in.
+    """
+    for _, party, hashtags in read_columnar_with_ids(file_name):
+        yield party, hashtags
+
+
+def read_columnar_with_ids(file_name: str) -> Iterator[tuple[int, int, list[str]]]:
+    """Yield the tweet id, party and list of hashtags of every tweet in the columnar file
+    file_name. See read_columnar.
+    """
+    columns = load_columnar(file_name)
+    # every hashtag is only lowered once, instead of once for every tweet it is in
+    hashtags = np.array([hashtag.lower() for hashtag in decode_strings(columns['hashtags'])],
+                        dtype=object)
+    tweet_offsets = columns['tweet_offsets']
+    num_tweets = len(tweet_offsets) - 1
+
+    for start in range(0, num_tweets, _CHUNK_SIZE):
+        end = min(start + _CHUNK_SIZE, num_tweets)
+        offsets = (tweet_offsets[start:end + 1] - tweet_offsets[start]).tolist()
+        chunk = hashtags[columns['tweet_hashtags'][tweet_offsets[start]:
+                                                   tweet_offsets[end]]].tolist()
+        parties = columns['parties'][start:end].tolist()
+        tweet_ids = columns['tweet_ids'][start:end].tolist()
+        for i in range(end - start):
+            yield tweet_ids[i], parties[i], chunk[offsets[i]:offsets[i + 1]]
+
+
+def _encode_strings(strings: list[str]) -> np.ndarray:
+    """Return strings as a column of bytes, encoded in utf-8 and separated by newlines."""
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['ast', 'csv', 'array', 'numpy', 'array_file'],
+        'allowed-io': ['csv_to_columnar'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
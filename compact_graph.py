@@ -0,0 +1,717 @@
+"""CSC111 2021 Hashtag Partisanship, a compact WeightedGraph
+
+This file holds our CompactWeightedGraph class, which has the same methods as WeightedGraph but
+keeps its hashtags and edges in arrays instead of one object per hashtag, so that the graph of
+the full data-set fits in memory.
+
+Every hashtag is given an integer id in the order it was added. The counts of the hashtags are
+kept in typed arrays indexed by id, and once all the edges have been added, the adjacency is
+kept in compressed sparse row (CSR) form: the neighbours of the hashtag with id i are
+_indices[_offsets[i]:_offsets[i + 1]] (sorted by id), and the number of tweets it shares with
+each of them is in the same positions of _edge_counts.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+from __future__ import annotations
+from array import array
+from typing import Any, Optional, Union
+
+import networkx as nx
+import numpy as np
+
+from dataclasses import DEMOCRATIC, WeightedGraph, rank_networkx_neighbours
+
+# The number of edge updates that are buffered before they are merged into the CSR arrays.
+PENDING_EDGE_LIMIT = 1 << 22
+
+# The id of a hashtag takes up the low 32 bits of an edge key, see _edge_key.
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+class CompactWeightedGraph:
+    """A weighted graph used to represent the connections between hashtags, stored in arrays.
+    Has the same methods as WeightedGraph.
+
+    Instance Attributes:
+        - edge_format: how the weight of an edge is worked out from the number of tweets its
+            hashtags appear in together. See WeightedGraph.weigh_edge.
+
+    Representation Invariants:
+        - self.edge_format == 'abs' or self.edge_format == 'max'
+        - len(self._items) == len(self._counts) == len(self._counts_dem) \
+            == len(self._counts_rep)
+        - all('\n' not in item for item in self._items)
+        - all(self._ids[self._items[i]] == i for i in range(len(self._items)))
+        - len(self._pending_keys) == len(self._pending_counts)
+    """
+    # Private Instance Attributes:
+    #     - _id_dict: Maps each hashtag to its integer id, or None if it hasn't been made yet.
+    #         Use the _ids property instead.
+    #     - _item_list: The hashtags, indexed by id, or None if they are still in _item_blob.
+    #         Use the _items property instead.
+    #     - _item_blob: The hashtags joined by newlines and encoded as utf-8, if they haven't
+    #         been decoded yet (see from_arrays), or None.
+    #     - _counts: The number of times each hashtag has appeared in a tweet, indexed by id.
+    #         Like _counts_dem and _counts_rep, this is a read-only numpy array if the graph came
+    #         from from_arrays and no vertex has been added since.
+    #     - _counts_dem: The number of Democratic tweets each hashtag appeared in.
+    #     - _counts_rep: The number of Republican tweets each hashtag appeared in.
+    #     - _offsets, _indices, _edge_counts: The CSR arrays of the edges, see the module
+    #         docstring. An edge between two different hashtags is stored in both of their rows.
+    #     - _pending_keys, _pending_counts: Edge updates that haven't been merged into the CSR
+    #         arrays yet, as edge keys (see _edge_key) and the count to add to each.
+    #     - _position_keys: (row << 32) | column for every position of the CSR arrays, which is
+    #         sorted, or None if it hasn't been made since the CSR arrays last changed. Used to
+    #         look up many edges at once, see _edge_positions.
+    #     - _rankings: The order of the neighbours of every hashtag from strongest to weakest,
+    #         by the name of the ranking (see _ranking_name). For each hashtag, the positions of
+    #         its row in the CSR arrays, relative to the start of the row, in that order.
+    #         Rankings are made when they are first used, and dropped when the counts change.
+    #     - _partisanships: The partisanship of the hashtags whose partisanship was set with
+    #         set_weight_hashtags, by hashtag. Every other hashtag's partisanship is the share of
+    #         its tweets that are Republican.
+    edge_format: str
+    _id_dict: Optional[dict[Any, int]]
+    _item_list: Optional[list]
+    _item_blob: Optional[np.ndarray]
+    _counts: Union[array, np.ndarray]
+    _counts_dem: Union[array, np.ndarray]
+    _counts_rep: Union[array, np.ndarray]
+    _offsets: np.ndarray
+    _indices: np.ndarray
+    _edge_counts: np.ndarray
+    _pending_keys: array
+    _pending_counts: array
+    _position_keys: Optional[np.ndarray]
+    _rankings: dict[str, np.ndarray]
+    _partisanships: dict[Any, float]
+
+    def __init__(self, edge_format: str = 'abs') -> None:
+        """Initialize an empty graph (no hashtag vertices or edges).
+
+        Preconditions:
+            - edge_format == 'abs' or edge_format == 'max'
+        """
+        self.edge_format = edge_format
+        self._id_dict = {}
+        self._item_list = []
+        self._item_blob = None
+        self._counts = array('q')
+        self._counts_dem = array('q')
+        self._counts_rep = array('q')
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._edge_counts = np.zeros(0, dtype=np.int64)
+        self._pending_keys = array('q')
+        self._pending_counts = array('q')
+        self._position_keys = None
+        self._rankings = {}
+        self._partisanships = {}
+
+    @classmethod
+    def from_arrays(cls, edge_format: str, arrays: dict[str, np.ndarray]) \
+            -> CompactWeightedGraph:
+        """Return a graph with the given edge_format made from arrays, which has the same keys as
+        the dict returned by to_arrays. The arrays are used as they are, so they can be read-only
+        or memory-mapped, and the hashtags are only decoded once they are needed.
+
+        Preconditions:
+            - edge_format == 'abs' or edge_format == 'max'
+        """
+        graph = cls(edge_format)
+        graph._id_dict = None
+        graph._item_list = None
+        graph._item_blob = arrays['items']
+        graph._counts = arrays['counts']
+        graph._counts_dem = arrays['counts_dem']
+        graph._counts_rep = arrays['counts_rep']
+        graph._offsets = arrays['offsets']
+        graph._indices = arrays['indices']
+        graph._edge_counts = arrays['edge_counts']
+        if 'ranked_neighbours' in arrays:
+            graph._rankings[graph._ranking_name('weight')] = arrays['ranked_neighbours']
+        return graph
+
+    @classmethod
+    def from_weighted_graph(cls, graph: WeightedGraph) -> CompactWeightedGraph:
+        """Return a CompactWeightedGraph with the same vertices and edges as graph."""
+        compact = cls(graph.edge_format)
+        vertices = graph.get_vertices()
+        compact._item_list = list(vertices)
+        compact._id_dict = {item: i for i, item in enumerate(compact._item_list)}
+        compact._counts = array('q', [v.count for v in vertices.values()])
+        compact._counts_dem = array('q', [v.count_dem for v in vertices.values()])
+        compact._counts_rep = array('q', [v.count_rep for v in vertices.values()])
+        compact._partisanships = {v.item: v.partisanship for v in vertices.values()
+                                  if v.partisanship != v.count_rep / v.count}
+        for v in vertices.values():
+            for u, count in v.neighbours.items():
+                # every edge is in the neighbours of both of its hashtags
+                if compact._id_dict[v.item] <= compact._id_dict[u.item]:
+                    compact._pending_keys.append(_edge_key(compact._id_dict[v.item],
+                                                           compact._id_dict[u.item]))
+                    compact._pending_counts.append(count)
+        compact.finalize()
+        return compact
+
+    def to_weighted_graph(self) -> WeightedGraph:
+        """Return a WeightedGraph with the same vertices and edges as this graph."""
+        self.finalize()
+        graph = WeightedGraph(self.edge_format)
+        items = self._items
+        for item, count_dem, count_rep in zip(items, np.asarray(self._counts_dem).tolist(),
+                                              np.asarray(self._counts_rep).tolist()):
+            graph.add_vertex_counts(item, count_dem, count_rep)
+
+        # the rows of the CSR arrays are already the neighbours of each hashtag, so each
+        # neighbours dict is made at once instead of one add_edge_count at a time
+        vertices = [graph.get_vertices()[item] for item in items]
+        neighbours = [vertices[hashtag_id] for hashtag_id in self._indices.tolist()]
+        counts = self._edge_counts.tolist()
+        offsets = np.asarray(self._offsets).tolist()
+        for hashtag_id, vertex in enumerate(vertices):
+            start, end = offsets[hashtag_id], offsets[hashtag_id + 1]
+            vertex.neighbours = dict(zip(neighbours[start:end], counts[start:end]))
+        graph.set_weight_hashtags(self._partisanships)
+        return graph
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays that make up this graph, by name. See from_arrays.
+
+        Along with the arrays of the hashtags and edges, the order of the neighbours of each
+        hashtag by weight is included (see top_neighbours), so a graph loaded from these arrays
+        doesn't have to sort them again.
+        """
+        self.finalize()
+        if self._item_blob is not None:
+            items = self._item_blob
+        else:
+            items = np.frombuffer('\n'.join(self._items).encode('utf-8'), dtype=np.uint8)
+        return {'items': items,
+                'counts': np.array(self._counts, dtype=np.int64),
+                'counts_dem': np.array(self._counts_dem, dtype=np.int64),
+                'counts_rep': np.array(self._counts_rep, dtype=np.int64),
+                'offsets': self._offsets,
+                'indices': self._indices,
+                'edge_counts': self._edge_counts,
+                'ranked_neighbours': self._ranking('weight')}
+
+    def to_csr(self) -> tuple[list, np.ndarray, np.ndarray, np.ndarray]:
+        """Return the hashtags of this graph (indexed by id) and its edges in CSR form: the
+        neighbours of the hashtag with id i are indices[offsets[i]:offsets[i + 1]], and the
+        weights of the edges to them (see WeightedGraph.weigh_edge) are in the same positions
+        of weights. The arrays are shared with this graph, so they must not be changed.
+
+        >>> g = CompactWeightedGraph()
+        >>> for hashtag in ['DACA', 'DACA', 'DREAMers', 'MAGA']:
+        ...     g.add_vertex(hashtag, 0)
+        >>> g.add_edge('DACA', 'DREAMers')
+        >>> items, offsets, indices, weights = g.to_csr()
+        >>> items, offsets.tolist(), indices.tolist(), weights.round(3).tolist()
+        (['DACA', 'DREAMers', 'MAGA'], [0, 1, 2, 2], [1, 0], [0.667, 0.667])
+        """
+        self.finalize()
+        return (self._items, self._offsets, self._indices,
+                self._weigh_many(self._rows(), self._indices, self._edge_counts))
+
+    @property
+    def _items(self) -> list:
+        """The hashtags of this graph, indexed by id."""
+        if self._item_list is None:
+            if len(self._counts) == 0:
+                self._item_list = []
+            else:
+                self._item_list = bytes(self._item_blob).decode('utf-8').split('\n')
+            self._item_blob = None
+        return self._item_list
+
+    @property
+    def _ids(self) -> dict[Any, int]:
+        """Maps each hashtag of this graph to its id."""
+        if self._id_dict is None:
+            self._id_dict = {item: i for i, item in enumerate(self._items)}
+        return self._id_dict
+
+    def add_vertex(self, item: Any, party: int) -> None:
+        """Add one tweet of the given party to the hashtag item, adding it to this graph if it
+        isn't in it.
+
+        Preconditions:
+            - party == 0 or 1
+        """
+        if not isinstance(self._counts, array):
+            # the counts came from from_arrays, and can't be changed in place
+            self._counts = array('q', np.asarray(self._counts, dtype=np.int64).tobytes())
+            self._counts_dem = array('q', np.asarray(self._counts_dem, dtype=np.int64).tobytes())
+            self._counts_rep = array('q', np.asarray(self._counts_rep, dtype=np.int64).tobytes())
+
+        if item in self._ids:
+            hashtag_id = self._ids[item]
+        else:
+            hashtag_id = len(self._items)
+            self._ids[item] = hashtag_id
+            self._items.append(item)
+            self._counts.append(0)
+            self._counts_dem.append(0)
+            self._counts_rep.append(0)
+
+        self._rankings = {}
+        self._partisanships.pop(item, None)
+        self._counts[hashtag_id] += 1
+        if party == DEMOCRATIC:
+            self._counts_dem[hashtag_id] += 1
+        else:
+            self._counts_rep[hashtag_id] += 1
+
+    def add_edge(self, item1: Any, item2: Any) -> None:
+        """Add one to the number of times the hashtags with the given items appear together,
+        adding an edge between them if there isn't one.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+        """
+        self.add_edge_count(item1, item2, 1)
+
+    def add_edge_count(self, item1: Any, item2: Any, count: int) -> None:
+        """Add count to the number of times the hashtags with the given items appear together,
+        adding an edge between them if there isn't one.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+
+        Preconditions:
+            - count >= 1
+        """
+        if item1 in self._ids and item2 in self._ids:
+            self._pending_keys.append(_edge_key(self._ids[item1], self._ids[item2]))
+            self._pending_counts.append(count)
+            if len(self._pending_keys) >= PENDING_EDGE_LIMIT:
+                self.finalize()
+        else:
+            # We didn't find an existing vertex for both items.
+            raise ValueError
+
+    def finalize(self) -> None:
+        """Merge all the edge updates made since the last call into the CSR arrays.
+
+        This is called by every method that reads the edges, so it never has to be called
+        directly, but calling it once all edges are added frees the buffered updates.
+        """
+        if len(self._pending_keys) == 0:
+            return
+
+        keys, counts = self._edge_keys()
+        keys = np.concatenate([keys, np.frombuffer(self._pending_keys, dtype=np.int64)])
+        counts = np.concatenate([counts, np.frombuffer(self._pending_counts, dtype=np.int64)])
+        self._pending_keys = array('q')
+        self._pending_counts = array('q')
+        self._set_edges(*sum_by_key(keys, counts))
+
+    def adjacent(self, item1: Any, item2: Any) -> bool:
+        """Return whether item1 and item2 are adjacent vertices in this graph.
+        Return False if item1/item2 are not in the graph.
+        """
+        if item1 in self._ids and item2 in self._ids:
+            return self._edge_position(self._ids[item1], self._ids[item2]) != -1
+        else:
+            return False
+
+    def adjacent_many(self, pairs: list[tuple[Any, Any]]) -> np.ndarray:
+        """Return an array of whether the items of each pair in pairs are adjacent vertices in
+        this graph, like adjacent. The pairs are all looked up at once.
+        """
+        return self._edge_positions(*self._pair_ids(pairs)) != -1
+
+    def get_count_edge(self, item1: Any, item2: Any) -> int:
+        """Return the number of tweets the given items appear in together.
+
+        Return 0 if item1 and item2 are not adjacent.
+
+        Preconditions:
+            - item1 and item2 are vertices in this graph
+        """
+        position = self._edge_position(self._ids[item1], self._ids[item2])
+        if position == -1:
+            return 0
+        else:
+            return int(self._edge_counts[position])
+
+    def get_weight_edge(self, item1: Any, item2: Any) -> float:
+        """Return the weight of the edge between the given items.
+
+        Return -1 if item1 and item2 are not adjacent.
+
+        Preconditions:
+            - item1 and item2 are vertices in this graph
+        """
+        id1 = self._ids[item1]
+        id2 = self._ids[item2]
+        position = self._edge_position(id1, id2)
+        if position == -1:
+            return -1
+        else:
+            return self._weigh(id1, id2, int(self._edge_counts[position]))
+
+    def get_weight_edges(self, pairs: list[tuple[Any, Any]]) -> np.ndarray:
+        """Return an array of the weight of the edge between the items of each pair in pairs,
+        like get_weight_edge. The pairs are all looked up at once.
+
+        Preconditions:
+            - all(item1 in self._ids and item2 in self._ids for item1, item2 in pairs)
+        """
+        ids1, ids2 = self._pair_ids(pairs)
+        positions = self._edge_positions(ids1, ids2)
+        found = positions != -1
+        weights = np.full(len(pairs), -1.0)
+        weights[found] = self._weigh_many(ids1[found], ids2[found],
+                                          self._edge_counts[positions[found]])
+        return weights
+
+    def top_neighbours(self, item: Any, k: int, by: str = 'weight') -> list:
+        """Return the (at most) k neighbours of item with the strongest edges to it, from
+        strongest to weakest. The neighbours are ranked by the weight of their edges if by is
+        'weight', or by the number of tweets they share with item if by is 'count'. Neighbours
+        with the same weight or count are in the order they were added.
+
+        The neighbours of every hashtag are ranked once, the first time a ranking is used (or
+        when the graph is loaded from a snapshot), so this only takes O(k) time.
+
+        Preconditions:
+            - item in self._ids
+            - k >= 0
+            - by in {'weight', 'count'}
+        """
+        ranking = self._ranking(by)
+        hashtag_id = self._ids[item]
+        start = int(self._offsets[hashtag_id])
+        end = min(start + k, int(self._offsets[hashtag_id + 1]))
+        return [self._items[u] for u in self._indices[start + ranking[start:end]].tolist()]
+
+    def get_weight_hashtag(self, item: Any) -> float:
+        """Returns the weight of the partisanship of the hashtag.
+
+        Preconditions:
+            - item in self._ids
+        """
+        if item in self._partisanships:
+            return self._partisanships[item]
+        hashtag_id = self._ids[item]
+        return int(self._counts_rep[hashtag_id]) / int(self._counts[hashtag_id])
+
+    def set_weight_hashtags(self, partisanships: dict[Any, float]) -> None:
+        """Set the partisanship of every hashtag in partisanships that is in this graph. See
+        WeightedGraph.set_weight_hashtags.
+
+        Preconditions:
+            - all(0 <= partisanship <= 1 for partisanship in partisanships.values())
+        """
+        for item, partisanship in partisanships.items():
+            if item in self._ids:
+                self._partisanships[item] = partisanship
+
+    def remove_min_count(self, min_count: int) -> None:
+        """Removes nodes that have a count less than or equal to min_count, along with their
+        edges. The remaining hashtags keep the order they were added in.
+        """
+        self.finalize()
+        counts = np.array(self._counts, dtype=np.int64)
+        keep = counts > min_count
+        # new_ids[i] is the id of hashtag i once the others are removed
+        new_ids = np.cumsum(keep) - 1
+
+        rows = self._rows()
+        kept_edges = keep[rows] & keep[self._indices]
+        rows = new_ids[rows[kept_edges]]
+        self._indices = new_ids[self._indices[kept_edges]].astype(np.int32)
+        self._edge_counts = self._edge_counts[kept_edges]
+        self._offsets = _offsets_of(rows, int(keep.sum()))
+        self._position_keys = None
+        self._rankings = {}
+
+        self._item_list = [item for item, kept in zip(self._items, keep) if kept]
+        self._id_dict = None
+        self._partisanships = {item: partisanship
+                               for item, partisanship in self._partisanships.items()
+                               if item in self._ids}
+        self._counts = array('q', counts[keep].tobytes())
+        self._counts_dem = array('q', np.array(self._counts_dem, dtype=np.int64)[keep].tobytes())
+        self._counts_rep = array('q', np.array(self._counts_rep, dtype=np.int64)[keep].tobytes())
+
+    def to_networkx(self, max_vertices: int = 5000, rank_by: Optional[str] = None,
+                    min_weight: float = 0.0) -> nx.Graph:
+        """Converts the weighted graph to the networkx graph, to be called after the
+        computations have been completed. Creates a networkx graph including the partisanship
+        bias, the weighting of the hashtag node (absolute number of times it has appeared),
+        as well as all the weighted edges connecting the hashtag nodes.
+
+        Like WeightedGraph.to_networkx, the hashtags are visited in the order they were added,
+        and the neighbours of each are added until there are max_vertices nodes, unless rank_by
+        is given. See WeightedGraph.to_networkx for rank_by and min_weight.
+        graph_nx.graph['ranked_neighbours'] maps every node to its neighbours in graph_nx by
+        weight.
+
+        Preconditions:
+            - max_vertices >= 0
+            - rank_by in {None, 'count', 'degree', 'strength'}
+        """
+        self.finalize()
+        if rank_by is not None:
+            graph_nx = self._top_networkx(max_vertices, rank_by, min_weight)
+        else:
+            graph_nx = nx.Graph()
+            for v in range(len(self._counts)):
+                self._add_networkx_node(graph_nx, v)
+
+                for position in range(self._offsets[v], self._offsets[v + 1]):
+                    u = int(self._indices[position])
+                    if graph_nx.number_of_nodes() < max_vertices:
+                        self._add_networkx_node(graph_nx, u)
+
+                    if self._items[u] in graph_nx.nodes:
+                        graph_nx.add_edge(self._items[v], self._items[u],
+                                          weight=self._weigh(v, u,
+                                                             int(self._edge_counts[position])))
+
+                if graph_nx.number_of_nodes() >= max_vertices:
+                    break
+
+        rank_networkx_neighbours(graph_nx)
+        return graph_nx
+
+    def _top_networkx(self, max_vertices: int, rank_by: str, min_weight: float) -> nx.Graph:
+        """Return the networkx graph of the max_vertices most important hashtags by rank_by,
+        with the edges between them of at least min_weight. See to_networkx.
+
+        Only the rows of the chosen hashtags are read, so this takes about the same time no
+        matter how large the rest of the graph is (apart from finding the hashtags).
+        """
+        chosen = self._top_ids(max_vertices, rank_by)
+        is_chosen = np.zeros(len(self._counts), dtype=bool)
+        is_chosen[chosen] = True
+
+        # every position of the rows of the chosen hashtags
+        starts = self._offsets[chosen]
+        lengths = self._offsets[chosen + 1] - starts
+        row_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = row_starts + np.arange(int(lengths.sum()))
+        rows = np.repeat(chosen, lengths)
+        cols = self._indices[positions].astype(np.int64)
+        # each edge once, and only between chosen hashtags
+        kept = is_chosen[cols] & (rows <= cols)
+        rows, cols, positions = rows[kept], cols[kept], positions[kept]
+        weights = self._weigh_many(rows, cols, self._edge_counts[positions])
+        strong = weights >= min_weight
+
+        items = self._items
+        counts = np.asarray(self._counts, dtype=np.int64)
+        counts_rep = np.asarray(self._counts_rep, dtype=np.int64)
+        graph_nx = nx.Graph()
+        graph_nx.add_nodes_from((items[v], {'bias': self._partisanships.get(items[v], rep / count),
+                                            'count': count})
+                                for v, count, rep in zip(chosen.tolist(), counts[chosen].tolist(),
+                                                         counts_rep[chosen].tolist()))
+        graph_nx.add_edges_from((items[v], items[u], {'weight': weight})
+                                for v, u, weight in zip(rows[strong].tolist(),
+                                                        cols[strong].tolist(),
+                                                        weights[strong].tolist()))
+        return graph_nx
+
+    def _top_ids(self, k: int, rank_by: str) -> np.ndarray:
+        """Return the ids of the k hashtags with the highest count, degree or strength (the
+        sum of the weights of its edges), highest first. Hashtags with the same score are in
+        the order they were added, like heapq.nlargest.
+        """
+        if rank_by == 'count':
+            scores = np.asarray(self._counts, dtype=np.float64)
+        elif rank_by == 'degree':
+            scores = np.diff(self._offsets).astype(np.float64)
+        else:
+            rows = self._rows()
+            scores = np.bincount(rows, weights=self._weigh_many(rows, self._indices,
+                                                                self._edge_counts),
+                                 minlength=len(self._counts))
+        if k >= len(scores):
+            chosen = np.arange(len(scores))
+        else:
+            # everything above the k-th highest score, and as many of the hashtags with exactly
+            # that score as there is room for
+            threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+            above = np.flatnonzero(scores > threshold)
+            tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+            chosen = np.concatenate([above, tied])
+        return chosen[np.lexsort((chosen, -scores[chosen]))]
+
+    def _add_networkx_node(self, graph_nx: nx.Graph, hashtag_id: int) -> None:
+        """Add the hashtag with the given id to graph_nx, with its bias and count."""
+        graph_nx.add_node(self._items[hashtag_id],
+                          bias=self.get_weight_hashtag(self._items[hashtag_id]),
+                          count=int(self._counts[hashtag_id]))
+
+    def _weigh(self, id1: int, id2: int, count: int) -> float:
+        """Return the weight of an edge between the hashtags with ids id1 and id2 that appear
+        together count times. See WeightedGraph.weigh_edge.
+        """
+        if self.edge_format == 'abs':
+            denom = (self._counts[id1] + self._counts[id2]) / 2
+        else:
+            denom = min(self._counts[id1], self._counts[id2])
+        return count / denom
+
+    def _weigh_many(self, ids1: np.ndarray, ids2: np.ndarray,
+                    edge_counts: np.ndarray) -> np.ndarray:
+        """Return the weights of the edges between the hashtags with ids ids1[i] and ids2[i]
+        that appear together edge_counts[i] times, like _weigh.
+        """
+        counts = np.asarray(self._counts, dtype=np.int64)
+        if self.edge_format == 'abs':
+            denom = (counts[ids1] + counts[ids2]) / 2
+        else:
+            denom = np.minimum(counts[ids1], counts[ids2])
+        return edge_counts / denom
+
+    def _ranking_name(self, by: str) -> str:
+        """Return the name the ranking of neighbours by is kept under in _rankings. The order
+        by weight depends on the edge format, so each edge format has its own ranking.
+        """
+        if by == 'weight':
+            return f'weight-{self.edge_format}'
+        else:
+            return by
+
+    def _ranking(self, by: str) -> np.ndarray:
+        """Return the ranking of the neighbours of every hashtag by weight or count (see
+        _rankings and top_neighbours), making it if it hasn't been made yet.
+        """
+        self.finalize()
+        name = self._ranking_name(by)
+        if name not in self._rankings:
+            rows = self._rows()
+            if by == 'weight':
+                strengths = self._weigh_many(rows, self._indices, self._edge_counts)
+            else:
+                strengths = self._edge_counts
+            # sorted by row first, so every row keeps its own positions
+            order = np.lexsort((-strengths, rows))
+            self._rankings[name] = (order - self._offsets[rows]).astype(np.int32)
+        return self._rankings[name]
+
+    def _edge_position(self, id1: int, id2: int) -> int:
+        """Return the position of id2 in the row of id1 in the CSR arrays, or -1 if the
+        hashtags are not adjacent.
+        """
+        self.finalize()
+        start = self._offsets[id1]
+        end = self._offsets[id1 + 1]
+        position = start + int(np.searchsorted(self._indices[start:end], id2))
+        if position < end and self._indices[position] == id2:
+            return position
+        else:
+            return -1
+
+    def _pair_ids(self, pairs: list[tuple[Any, Any]]) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ids of the first and of the second items of the pairs, with -1 for the
+        items that are not in this graph.
+        """
+        ids = self._ids
+        ids1 = np.fromiter((ids.get(pair[0], -1) for pair in pairs), dtype=np.int64,
+                           count=len(pairs))
+        ids2 = np.fromiter((ids.get(pair[1], -1) for pair in pairs), dtype=np.int64,
+                           count=len(pairs))
+        return ids1, ids2
+
+    def _edge_positions(self, ids1: np.ndarray, ids2: np.ndarray) -> np.ndarray:
+        """Return the position of ids2[i] in the row of ids1[i] in the CSR arrays for every i,
+        or -1 where the hashtags are not adjacent (or an id is -1).
+        """
+        self.finalize()
+        if self._position_keys is None:
+            self._position_keys = (self._rows() << _ID_BITS) | self._indices
+        keys = (ids1 << _ID_BITS) | ids2
+        positions = np.searchsorted(self._position_keys, keys)
+        found = (ids1 >= 0) & (ids2 >= 0) & (positions < len(self._position_keys))
+        found[found] = self._position_keys[positions[found]] == keys[found]
+        return np.where(found, positions, -1)
+
+    def _rows(self) -> np.ndarray:
+        """Return the id of the row every position of the CSR arrays is in."""
+        return np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64),
+                         np.diff(self._offsets))
+
+    def _edge_keys(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the keys and counts of the edges in the CSR arrays, each edge once."""
+        rows = self._rows()
+        once = rows <= self._indices
+        return (rows[once] << _ID_BITS) | self._indices[once], self._edge_counts[once]
+
+    def _set_edges(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """Replace the CSR arrays with the edges with the given distinct keys and counts."""
+        low = keys >> _ID_BITS
+        high = keys & _ID_MASK
+        # an edge between two different hashtags goes in both of their rows
+        twice = low != high
+        rows = np.concatenate([low, high[twice]])
+        cols = np.concatenate([high, low[twice]])
+        counts = np.concatenate([counts, counts[twice]])
+
+        order = np.argsort((rows << _ID_BITS) | cols, kind='stable')
+        self._indices = cols[order].astype(np.int32)
+        self._edge_counts = counts[order]
+        self._offsets = _offsets_of(rows, len(self._counts))
+        self._position_keys = None
+        self._rankings = {}
+
+
+def sum_by_key(keys: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the distinct values in keys in sorted order, and the sum of the counts of each.
+
+    >>> unique_keys, sums = sum_by_key(np.array([5, 3, 5]), np.array([1, 2, 3]))
+    >>> unique_keys.tolist(), sums.tolist()
+    ([3, 5], [2, 4])
+    """
+    if len(keys) == 0:
+        return keys.astype(np.int64), counts.astype(np.int64)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[starts], np.add.reduceat(counts[order], starts)
+
+
+def _edge_key(id1: int, id2: int) -> int:
+    """Return the key of the edge between the hashtags with ids id1 and id2, which is the same
+    no matter the order of the ids.
+
+    >>> _edge_key(3, 1) == _edge_key(1, 3) == (1 << 32) + 3
+    True
+    """
+    if id1 > id2:
+        id1, id2 = id2, id1
+    return (id1 << _ID_BITS) | id2
+
+
+def _offsets_of(rows: np.ndarray, num_rows: int) -> np.ndarray:
+    """Return the CSR offsets of the given sorted row ids."""
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=offsets[1:])
+    return offsets
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['array', 'networkx', 'numpy', 'dataclasses'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
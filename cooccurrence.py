@@ -0,0 +1,264 @@
+"""CSC111 2021 Hashtag Partisanship, counting pairs of hashtags with sparse matrices
+
+This file counts the hashtags of a set of tweets, and the number of tweets every pair of
+hashtags appears in together, without looping over the pairs of hashtags of each tweet.
+
+The tweets are encoded as a sparse tweet x hashtag incidence matrix X, where X[t, h] is the
+number of times hashtag h is in tweet t (a tweet can have the same hashtag twice once the
+hashtags are lower-cased, for example #DACA and #daca). Then the number of tweets hashtags g
+and h appear in together is (X^T X)[g, h], which is a single sparse matrix product. This counts
+the same thing as adding an edge for every pair of hashtags in a tweet (see
+csv_to_graph.build_graph_from_records): a tweet with g m times and h n times adds m * n to the
+edge between g and h, and m * (m - 1) / 2 to the edge between g and itself.
+
+A stream of tweets is counted CHUNK_SIZE tweets at a time (see count_records): the counts and
+the X^T X of every chunk are added up, so only one chunk of tweets is held at once, and the
+memory used grows with the number of hashtags and pairs rather than with the number of tweets.
+
+The counts are returned in the arrays of a CompactWeightedGraph (see
+CompactWeightedGraph.to_arrays), which can also be turned into a WeightedGraph.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+from array import array
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+import scipy.sparse
+
+from dataclasses import DEMOCRATIC, WeightedGraph
+from compact_graph import CompactWeightedGraph
+import columnar
+
+# How many tweets count_records encodes and counts at a time.
+CHUNK_SIZE = 1 << 18
+
+
+def encode_records(records: Iterable[tuple[int, list[str]]]) \
+        -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Return the tweets in records, which are tuples of the party of the tweet and its list of
+    hashtags, as integer arrays.
+
+    Every hashtag is given an id in the order it first appears in records. The returned tuple is
+    the list of hashtags (indexed by id), the offsets and the hashtag ids of the tweets (the
+    hashtags of tweet i are hashtag_ids[offsets[i]:offsets[i + 1]]), and the party of every
+    tweet. records is only iterated over once.
+
+    >>> items, offsets, hashtag_ids, parties = encode_records([(0, ['daca', 'dreamers']),
+    ...                                                        (1, ['maga', 'daca'])])
+    >>> items, offsets.tolist(), hashtag_ids.tolist(), parties.tolist()
+    (['daca', 'dreamers', 'maga'], [0, 2, 4], [0, 1, 2, 0], [0, 1])
+    """
+    ids = {}
+    offsets = array('q', [0])
+    hashtag_ids = array('i')
+    parties = array('B')
+    for party, lst in records:
+        for hashtag in lst:
+            hashtag_ids.append(ids.setdefault(hashtag, len(ids)))
+        offsets.append(len(hashtag_ids))
+        parties.append(party)
+    return (list(ids), np.frombuffer(offsets, dtype=np.int64),
+            np.frombuffer(hashtag_ids, dtype=np.int32), np.frombuffer(parties, dtype=np.uint8))
+
+
+def encode_chunks(records: Iterable[tuple[int, list[str]]],
+                  ids: dict[str, int]) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield the tweets in records in chunks of CHUNK_SIZE tweets, each encoded as the offsets,
+    hashtag ids and parties encode_records returns. ids maps each hashtag to its id, and is
+    added to as new hashtags are found, so the ids are the same in every chunk.
+
+    >>> ids = {}
+    >>> [(offsets.tolist(), hashtag_ids.tolist()) for offsets, hashtag_ids, _ in
+    ...  encode_chunks([(0, ['daca', 'dreamers']), (1, ['maga', 'daca'])], ids)]
+    [([0, 2, 4], [0, 1, 2, 0])]
+    >>> ids
+    {'daca': 0, 'dreamers': 1, 'maga': 2}
+    """
+    offsets = array('q', [0])
+    hashtag_ids = array('i')
+    parties = array('B')
+    for party, lst in records:
+        for hashtag in lst:
+            hashtag_ids.append(ids.setdefault(hashtag, len(ids)))
+        offsets.append(len(hashtag_ids))
+        parties.append(party)
+        if len(parties) == CHUNK_SIZE:
+            yield (np.frombuffer(offsets, dtype=np.int64),
+                   np.frombuffer(hashtag_ids, dtype=np.int32),
+                   np.frombuffer(parties, dtype=np.uint8))
+            offsets = array('q', [0])
+            hashtag_ids = array('i')
+            parties = array('B')
+    yield (np.frombuffer(offsets, dtype=np.int64), np.frombuffer(hashtag_ids, dtype=np.int32),
+           np.frombuffer(parties, dtype=np.uint8))
+
+
+def count_records(records: Iterable[tuple[int, list[str]]],
+                  min_count: int = 0) -> dict[str, np.ndarray]:
+    """Return the same arrays as count_cooccurrences(*encode_records(records), min_count),
+    counting records CHUNK_SIZE tweets at a time (see encode_chunks). records is only iterated
+    over once.
+
+    The counts and pair_matrix of every chunk are added up, and the hashtags at or below
+    min_count are only removed at the end, so this holds the counts of every hashtag and pair
+    of records, but never more than one chunk of the tweets.
+
+    >>> arrays = count_records([(0, ['daca', 'dreamers']), (1, ['daca', 'daca', 'maga'])], 1)
+    >>> graph = CompactWeightedGraph.from_arrays('abs', arrays)
+    >>> graph.get_count_edge('daca', 'daca'), graph.get_weight_hashtag('daca')
+    (1, 0.6666666666666666)
+    """
+    ids = {}
+    counts = np.zeros(0, dtype=np.int64)
+    counts_dem = np.zeros(0, dtype=np.int64)
+    pairs = scipy.sparse.csr_matrix((0, 0), dtype=np.int64)
+    for offsets, hashtag_ids, parties in encode_chunks(records, ids):
+        entry_parties = np.repeat(parties, np.diff(offsets))
+        # the hashtags first found in this chunk have no counts yet
+        counts = np.append(counts, np.zeros(len(ids) - len(counts), dtype=np.int64))
+        counts_dem = np.append(counts_dem, np.zeros(len(ids) - len(counts_dem), dtype=np.int64))
+        counts += np.bincount(hashtag_ids, minlength=len(ids))
+        counts_dem += np.bincount(hashtag_ids[entry_parties == DEMOCRATIC], minlength=len(ids))
+        pairs.resize((len(ids), len(ids)))
+        pairs = pairs + pair_matrix(len(ids), offsets, hashtag_ids)
+
+    keep = counts > min_count
+    pairs = pairs.tocsr()[keep][:, keep].tocsr()
+    return graph_arrays([item for item, kept in zip(ids, keep.tolist()) if kept], counts[keep],
+                        counts_dem[keep], pairs)
+
+
+def encode_columnar(file_name: str) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Return the tweets in the columnar file file_name in the same form as encode_records does
+    for the tweets read_columnar yields, without looking at the tweets one at a time.
+    """
+    columns = columnar.load_columnar(file_name)
+    # hashtags that are only different in case are the same once they are lower-cased, and the
+    # dictionary is in the order the hashtags first appear, so the first of them keeps its place
+    ids = {}
+    new_ids = np.array([ids.setdefault(hashtag.lower(), len(ids))
+                        for hashtag in columnar.decode_strings(columns['hashtags'])],
+                       dtype=np.int32)
+    return (list(ids), np.asarray(columns['tweet_offsets']),
+            new_ids[columns['tweet_hashtags']], np.asarray(columns['parties']))
+
+
+def count_cooccurrences(items: list[str], offsets: np.ndarray, hashtag_ids: np.ndarray,
+                        parties: np.ndarray, min_count: int = 0) -> dict[str, np.ndarray]:
+    """Return the arrays of the CompactWeightedGraph (see CompactWeightedGraph.to_arrays) of
+    the tweets encoded in the given arrays (see encode_records), without the hashtags at or
+    below min_count.
+
+    The hashtags are counted first, and the ones at or below min_count are taken out of the
+    tweets before the pairs are counted, so no pair with one of them is ever counted. This gives
+    the same arrays as counting every pair and then calling remove_min_count, but most of the
+    pairs of the full data-set are between rare hashtags, so it is much faster and uses much
+    less memory.
+
+    >>> arrays = count_cooccurrences(*encode_records([(0, ['daca', 'dreamers']),
+    ...                                               (1, ['daca', 'daca', 'maga'])]))
+    >>> graph = CompactWeightedGraph.from_arrays('abs', arrays)
+    >>> graph.get_count_edge('daca', 'dreamers'), graph.get_count_edge('daca', 'maga')
+    (1, 2)
+    >>> graph.get_count_edge('daca', 'daca'), graph.get_weight_hashtag('daca')
+    (1, 0.6666666666666666)
+    >>> arrays = count_cooccurrences(*encode_records([(0, ['daca', 'dreamers']),
+    ...                                               (1, ['daca', 'daca', 'maga'])]), 1)
+    >>> CompactWeightedGraph.from_arrays('abs', arrays).get_count_edge('daca', 'daca')
+    1
+    """
+    entry_parties = np.repeat(parties, np.diff(offsets))
+    counts = np.bincount(hashtag_ids, minlength=len(items)).astype(np.int64)
+    if min_count > 0:
+        keep = counts > min_count
+        kept_entries = keep[hashtag_ids]
+        # new_ids[i] is the id of hashtag i once the others are removed
+        new_ids = (np.cumsum(keep) - 1).astype(np.int32)
+        # the number of kept hashtags before every position of hashtag_ids
+        kept_before = np.zeros(len(hashtag_ids) + 1, dtype=np.int64)
+        np.cumsum(kept_entries, out=kept_before[1:])
+
+        items = [item for item, kept in zip(items, keep.tolist()) if kept]
+        offsets = kept_before[offsets]
+        hashtag_ids = new_ids[hashtag_ids[kept_entries]]
+        entry_parties = entry_parties[kept_entries]
+        counts = counts[keep]
+
+    counts_dem = np.bincount(hashtag_ids[entry_parties == DEMOCRATIC],
+                             minlength=len(items)).astype(np.int64)
+    return graph_arrays(items, counts, counts_dem, pair_matrix(len(items), offsets, hashtag_ids))
+
+
+def pair_matrix(num_hashtags: int, offsets: np.ndarray,
+                hashtag_ids: np.ndarray) -> scipy.sparse.csr_matrix:
+    """Return X^T X, where X is the incidence matrix of the tweets encoded in offsets and
+    hashtag_ids (see encode_records), whose hashtag ids are all less than num_hashtags.
+
+    (X^T X)[g, h] is the number of tweets hashtags g and h are in together, and the diagonal
+    is the sum of m^2 over the tweets with the hashtag m times (see graph_arrays). These
+    matrices can be added together to count the pairs of a data-set a part at a time.
+    """
+    incidence = scipy.sparse.csr_matrix(
+        (np.ones(len(hashtag_ids), dtype=np.int64), hashtag_ids, offsets),
+        shape=(len(offsets) - 1, num_hashtags))
+    incidence.sum_duplicates()
+    return (incidence.T @ incidence).tocsr()
+
+
+def graph_arrays(items: list[str], counts: np.ndarray, counts_dem: np.ndarray,
+                 pairs: scipy.sparse.csr_matrix) -> dict[str, np.ndarray]:
+    """Return the arrays of the CompactWeightedGraph (see CompactWeightedGraph.to_arrays) with
+    the given hashtags, counts and pair_matrix.
+    """
+    # the diagonal is the sum of m^2 over the tweets with the hashtag m times, but a hashtag
+    # that appears m times only makes m * (m - 1) / 2 pairs with itself
+    pairs.setdiag((pairs.diagonal() - counts) // 2)
+    pairs.eliminate_zeros()
+    pairs.sort_indices()
+
+    return {'items': np.frombuffer('\n'.join(items).encode('utf-8'), dtype=np.uint8),
+            'counts': counts,
+            'counts_dem': counts_dem,
+            'counts_rep': counts - counts_dem,
+            'offsets': pairs.indptr.astype(np.int64),
+            'indices': pairs.indices.astype(np.int32),
+            'edge_counts': pairs.data.astype(np.int64)}
+
+
+def build_graph(arrays: dict[str, np.ndarray], edge_format: str, compact: bool = False) \
+        -> Union[WeightedGraph, CompactWeightedGraph]:
+    """Return the graph of the counts in arrays (see count_cooccurrences). See
+    csv_to_graph.load_weighted_hashtags_graph for compact.
+
+    Preconditions:
+        - edge_format == 'abs' or 'max'
+    """
+    graph = CompactWeightedGraph.from_arrays(edge_format, arrays)
+    if compact:
+        return graph
+    return graph.to_weighted_graph()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['array', 'numpy', 'scipy.sparse', 'dataclasses', 'compact_graph',
+                          'columnar'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -19,33 +19,140 @@ please consult with us.
 This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
 """
 import csv
+from typing import Iterable, Iterator, TextIO, Union
 
 from dataclasses import WeightedGraph
+from compact_graph import CompactWeightedGraph
+import columnar
+import cooccurrence
+import making_new_csv
+import sketches
 
 
-def load_weighted_hashtags_graph(tweets_csv: str, min_count: int, edge_format: str) -> WeightedGraph:
+def load_weighted_hashtags_graph(tweets_csv: Union[str, TextIO], min_count: int,
+                                 edge_format: str, compact: bool = False,
+                                 memory_budget: int = 0) \
+        -> Union[WeightedGraph, CompactWeightedGraph]:
     """Return a WEIGHTED graph corresponding to the given datasets.
 
+    tweets_csv is either the name of the csv file, or a text stream of it (such as sys.stdin or
+    a pipe from get_us_hashtags). It is only read once: the vertices and edges are both updated
+    from each row as it is read. tweets_csv can also be the name of a columnar file (see
+    columnar.py), which is much faster to read.
+
+    Optional arguments:
+        - compact: return a CompactWeightedGraph, which takes up much less memory, instead of a
+            WeightedGraph
+        - memory_budget: if this isn't 0, tweets_csv is read twice, and only the hashtags found
+            to be common in the first pass with a summary of at most this many bytes are
+            counted. See load_heavy_hitters_graph.
+
     Preconditions:
         - min_count >= 0
         - edge_format == 'abs' or 'max'
+        - memory_budget == 0 or isinstance(tweets_csv, str)
     """
-    hashtag_graph = WeightedGraph()
+    if memory_budget != 0:
+        return load_heavy_hitters_graph(tweets_csv, min_count, edge_format, memory_budget,
+                                        compact)[0]
+    if isinstance(tweets_csv, str) and columnar.is_columnar_file(tweets_csv):
+        arrays = cooccurrence.count_cooccurrences(*cooccurrence.encode_columnar(tweets_csv),
+                                                  min_count)
+        return cooccurrence.build_graph(arrays, edge_format, compact)
+    return build_graph_from_records(read_tweets_csv(tweets_csv), min_count, edge_format,
+                                    compact)
+
+
+def load_heavy_hitters_graph(tweets_file: str, min_count: int, edge_format: str,
+                             memory_budget: int, compact: bool = False) \
+        -> tuple[Union[WeightedGraph, CompactWeightedGraph], dict]:
+    """Return the graph of the csv or columnar file tweets_file without the hashtags at or below
+    min_count, only counting the hashtags that a Misra-Gries summary of at most memory_budget
+    bytes finds to be common, along with the guarantees of the graph.
+
+    The graph is the same as the one load_weighted_hashtags_graph builds when
+    guarantees['exact'] is True. Otherwise, it only leaves out hashtags used at most
+    guarantees['max_missed_count'] times. See sketches.heavy_hitters_graph.
 
-    with open(tweets_csv, encoding="utf-8") as csv_file:
-        next(csv_file)
-        for row in csv.reader(csv_file):
-            hashtags = row[2]
-            party = int(row[1])
-            lst = string_to_list(hashtags)
-            for hashtag in lst:
-                hashtag_graph.add_vertex(hashtag, party)
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+        - memory_budget >= sketches.BYTES_PER_COUNTER
+    """
+    return sketches.heavy_hitters_graph(lambda: read_tweets(tweets_file), min_count, edge_format,
+                                        memory_budget, compact)
+
+
+def load_weighted_hashtags_graph_from_tweets(tweets_file: str, member_info_file: str,
+                                             senate_file: str, min_count: int, edge_format: str,
+                                             compact: bool = False, csv_file_name: str = '') \
+        -> Union[WeightedGraph, CompactWeightedGraph]:
+    """Return the same graph as load_weighted_hashtags_graph would from the csv file that
+    get_us_hashtags makes from the given files, but without making the csv file: the tweets
+    are added to the graph as they are read from the hydrated tweets_file.
+
+    Optional arguments:
+        - compact: see load_weighted_hashtags_graph
+        - csv_file_name: if given, the csv file is also written as the tweets are read
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+    """
+    tweets = making_new_csv.stream_us_tweets(tweets_file, member_info_file, senate_file)
+    if csv_file_name != '':
+        tweets = making_new_csv.tee_to_csv(tweets, csv_file_name)
+    records = ((tweet.party, tweet.hashtag_list()) for tweet in tweets)
+    return build_graph_from_records(records, min_count, edge_format, compact)
 
-    add_edges(tweets_csv, hashtag_graph, edge_format)
 
-    hashtag_graph.remove_min_count(min_count)
+def build_graph_from_records(records: Iterable[tuple[int, list[str]]], min_count: int,
+                             edge_format: str, compact: bool = False) \
+        -> Union[WeightedGraph, CompactWeightedGraph]:
+    """Return a WEIGHTED graph of the tweets in records, which are tuples of the party of the
+    tweet and its list of hashtags. records is only iterated over once.
 
-    return hashtag_graph
+    Every hashtag gets one to its count for each time it is in a tweet, and every pair of
+    hashtags in a tweet gets one to the count of the edge between them. The pairs of each
+    chunk of tweets are counted all at once with a sparse matrix product, see
+    cooccurrence.count_records, so only one chunk of records is held at a time, and the
+    hashtags at or below min_count are removed once every chunk is counted.
+
+    See load_weighted_hashtags_graph for compact.
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+    """
+    arrays = cooccurrence.count_records(records, min_count)
+    return cooccurrence.build_graph(arrays, edge_format, compact)
+
+
+def read_tweets(tweets_file: str) -> Iterator[tuple[int, list[str]]]:
+    """Yield the party and the list of hashtags of every tweet in tweets_file, which is either a
+    csv file or a columnar file.
+    """
+    if columnar.is_columnar_file(tweets_file):
+        return columnar.read_columnar(tweets_file)
+    return read_tweets_csv(tweets_file)
+
+
+def read_tweets_csv(tweets_csv: Union[str, TextIO]) -> Iterator[tuple[int, list[str]]]:
+    """Yield the party and the list of hashtags of every row in tweets_csv, which is either the
+    name of the csv file or a text stream of it.
+    """
+    if isinstance(tweets_csv, str):
+        with open(tweets_csv, encoding="utf-8") as csv_file:
+            yield from _read_rows(csv_file)
+    else:
+        yield from _read_rows(tweets_csv)
+
+
+def _read_rows(csv_file: TextIO) -> Iterator[tuple[int, list[str]]]:
+    """Yield the party and the list of hashtags of every row in the open csv_file."""
+    next(csv_file)
+    for row in csv.reader(csv_file):
+        yield int(row[1]), string_to_list(row[2])
 
 
 def string_to_list(set_str: str) -> list:
@@ -63,11 +170,8 @@ def string_to_list(set_str: str) -> list:
     return hashtags
 
 
-def add_edges(tweets_csv: str, hashtag_graph: WeightedGraph, edge_format: str) -> None:
+def add_edges(tweets_csv: str, hashtag_graph: WeightedGraph) -> None:
     """Adds edges to the graph based on strict connections in the same tweet.
-
-        Preconditions:
-            - edge_format == 'abs' or 'max'
     """
     with open(tweets_csv, encoding="utf-8") as csv_file:
         next(csv_file)
@@ -77,7 +181,7 @@ def add_edges(tweets_csv: str, hashtag_graph: WeightedGraph, edge_format: str) -
             if len(lst) > 1:
                 for i in range(0, len(lst) - 1):
                     for j in range(i + 1, len(lst)):
-                        hashtag_graph.add_edge(lst[i], lst[j], edge_format)
+                        hashtag_graph.add_edge(lst[i], lst[j])
 
 
 if __name__ == '__main__':
@@ -86,7 +190,8 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 1000,
         'disable': ['E1136'],
-        'extra-imports': ['csv', 'networkx'],
-        'allowed-io': ['load_weighted_hashtags_graph', 'add_edges'],
+        'extra-imports': ['csv', 'networkx', 'dataclasses', 'compact_graph', 'columnar',
+                          'cooccurrence', 'making_new_csv', 'sketches'],
+        'allowed-io': ['read_tweets_csv', 'add_edges'],
         'max-nested-blocks': 4
     })
@@ -17,8 +17,10 @@ please consult with us.
 This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
 """
 from __future__ import annotations
-from typing import Any
+import heapq
+from typing import Any, Optional
 import networkx as nx
+import numpy as np
 
 # These global variables represent the absolute weighting of bias, where 0 corresponds
 # with a Democratic oriented tweet/hashtag and 1 for Republican.
@@ -32,8 +34,9 @@ class _WeightedHashtag:
 
     Instance Attributes:
         - item: The name of the hashtag stored as a str
-        - neighbours: The vertices that are adjacent to this vertex, and their corresponding
-            edge weights. See: neighbours_indirect function.
+        - neighbours: The vertices that are adjacent to this vertex, and the number of tweets
+            this hashtag appears in together with each of them. The weight of an edge is worked
+            out from this count when it is needed, see WeightedGraph.weigh_edge.
         - count: The absolute number of times the hashtag has appeared in a tweet.
         - count_dem: the amount of times a hashtag has appeared in a Democratic member's tweet.
         - count_rep: the amount of times a hashtag has appeared in a Republican member's tweet.
@@ -48,7 +51,7 @@ class _WeightedHashtag:
 
     """
     item: Any
-    neighbours: dict[_WeightedHashtag, (float, float)]
+    neighbours: dict[_WeightedHashtag, int]
     count: int
     count_dem: int
     count_rep: int
@@ -99,7 +102,6 @@ class _WeightedHashtag:
             self.count_rep += 1
         # Update the entire count
         self.count += 1
-        self.partisanship = self.count_rep / self.count
         self.update_weighting_absolute()
 
     def update_weighting_absolute(self) -> None:
@@ -116,16 +118,35 @@ class WeightedGraph:
     """A weighted graph used to represent the connections between hashtags.
     Includes functions to update the graph, as well as retrieve information. A few functions
     modified from CSC111 Assignment 3.
+
+    Instance Attributes:
+        - edge_format: how the weight of an edge is worked out from the number of tweets its
+            hashtags appear in together. See weigh_edge.
+
+    Representation Invariants:
+        - self.edge_format == 'abs' or self.edge_format == 'max'
     """
     # Private Instance Attributes:
     #     - _vertices:
     #         A collection of _WeightedHashtag contained in the graph.
     #         Maps item to _WeightedHashtag object.
+    #     - _rankings:
+    #         The neighbours of every vertex from strongest to weakest, by the name of the
+    #         ranking (see top_neighbours). Rankings are made when they are first used, and
+    #         dropped whenever a count changes.
+    edge_format: str
     _vertices: dict[Any, _WeightedHashtag]
+    _rankings: dict[str, dict[Any, list[_WeightedHashtag]]]
+
+    def __init__(self, edge_format: str = 'abs') -> None:
+        """Initialize an empty graph (no hashtag vertices or edges).
 
-    def __init__(self) -> None:
-        """Initialize an empty graph (no hashtag vertices or edges)."""
+        Preconditions:
+            - edge_format == 'abs' or edge_format == 'max'
+        """
+        self.edge_format = edge_format
         self._vertices = {}
+        self._rankings = {}
 
     def add_vertex(self, item: Any, party: int) -> None:
         """Add a vertex with the given item to this graph with the corresponding party affiliation.
@@ -137,6 +158,7 @@ class WeightedGraph:
             - party == 0 or 1
         """
 
+        self._rankings = {}
         if item not in self._vertices:
             # Create a new hashtag with an initial weighting of 0 for a democratic biased node.
             if party == DEMOCRATIC:
@@ -149,78 +171,118 @@ class WeightedGraph:
 
             self._vertices[item].update(party)
 
-    def add_edge(self, item1: Any, item2: Any, weight_format: str) -> None:
-        """Add an edge between the two hashtags with the given items in this graph,
-        with the given weight. Modified from CSC111-A3
+    def add_vertex_counts(self, item: Any, count_dem: int, count_rep: int) -> None:
+        """Add count_dem Democratic tweets and count_rep Republican tweets to the vertex with
+        the given item, adding it to this graph if it isn't in it. This is the same as calling
+        add_vertex once for each of the tweets.
+
+        Preconditions:
+            - count_dem >= 0
+            - count_rep >= 0
+            - count_dem + count_rep >= 1
+        """
+        self._rankings = {}
+        if item not in self._vertices:
+            self._vertices[item] = _WeightedHashtag(item, 0, 0, 0)
+        vertex = self._vertices[item]
+        vertex.count_dem += count_dem
+        vertex.count_rep += count_rep
+        vertex.count += count_dem + count_rep
+        vertex.update_weighting_absolute()
+
+    def add_edge(self, item1: Any, item2: Any) -> None:
+        """Add one to the number of times the hashtags with the given items appear together,
+        adding an edge between them if there isn't one. Modified from CSC111-A3
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+        """
+        self.add_edge_count(item1, item2, 1)
+
+    def add_edge_count(self, item1: Any, item2: Any, count: int) -> None:
+        """Add count to the number of times the hashtags with the given items appear together,
+        adding an edge between them if there isn't one.
 
         Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
 
         Preconditions:
-            - item1 != item2
-            - weight_format == 'absolute' or 'highest'
+            - count >= 1
         """
         if item1 in self._vertices and item2 in self._vertices:
-
-            # Add the new edge
-            if weight_format == 'abs':
-                self.update_edge_weight_absolute(item1, item2)
-            else:
-                self.update_edge_weight_highest(item1, item2)
+            self._rankings = {}
+            v1 = self._vertices[item1]
+            v2 = self._vertices[item2]
+            new_count = v1.neighbours.get(v2, 0) + count
+            v1.neighbours[v2] = new_count
+            v2.neighbours[v1] = new_count
         else:
             # We didn't find an existing vertex for both items.
             raise ValueError
 
-    def update_edge_weight_absolute(self, item1: Any, item2: Any) -> None:
-        """Updates the edge weight based on the occurences of both hashtags.
+    def weigh_edge(self, v1: _WeightedHashtag, v2: _WeightedHashtag) -> float:
+        """Return the weight of the edge between the adjacent hashtags v1 and v2, using the
+        current counts of both hashtags.
+
+        When self.edge_format == 'abs', the weight is based on the occurences of both hashtags.
         If #DACA occurs 10 times, #DREAMers occurs 8 times, and they occur together 6 times, the
         edge weighting would be 6/9.
-        """
-        v1 = self._vertices[item1]
-        v2 = self._vertices[item2]
-
-        new_denom = (v1.count + v2.count) / 2
-        if v2 in v1.neighbours:
-            og_count = v1.neighbours[v2][0]
-
-            v1.neighbours[v2] = (og_count + 1, og_count / new_denom)
-            v2.neighbours[v1] = (og_count + 1, og_count / new_denom)
-        else:
 
-            v1.neighbours[v2] = (1, 1 / new_denom)
-            v2.neighbours[v1] = (1, 1 / new_denom)
+        When self.edge_format == 'max', the weight is based on the occurences of the least common
+        hashtag. E.G. If #Trump has 100 occurences and #ImpeachTrump has 30 occurences, with 25
+        occurred with #Trump, the edge weighting would be 25/30.
 
-    def update_edge_weight_highest(self, item1: Any, item2: Any) -> None:
-        """Updates the edge weight based on the occurences of the least common hashtag.
-        E.G. If #Trump has 100 occurences and #ImpeachTrump has 30 occurences, with 25 occurred
-        with #Trump, the edge weighting would be 25/30.
+        Preconditions:
+            - v2 in v1.neighbours
+
+        >>> g = WeightedGraph('abs')
+        >>> for _ in range(10):
+        ...     g.add_vertex('DACA', 0)
+        >>> for _ in range(8):
+        ...     g.add_vertex('DREAMers', 0)
+        >>> g.add_edge_count('DACA', 'DREAMers', 6)
+        >>> g.get_weight_edge('DACA', 'DREAMers') == 6 / 9
+        True
         """
-        v1 = self._vertices[item1]
-        v2 = self._vertices[item2]
-
-        if v1.count > v2.count:
-            new_denom = v2.count
+        if self.edge_format == 'abs':
+            denom = (v1.count + v2.count) / 2
         else:
-            new_denom = v1.count
-
-        if v2 in v1.neighbours:
-            og_count = v1.neighbours[v2][0]
-
-            v1.neighbours[v2] = (og_count + 1, og_count / new_denom)
-            v2.neighbours[v1] = (og_count + 1, og_count / new_denom)
-        else:
-            v1.neighbours[v2] = (1, 1 / new_denom)
-            v2.neighbours[v1] = (1, 1 / new_denom)
+            denom = min(v1.count, v2.count)
+        return v1.neighbours[v2] / denom
 
     def adjacent(self, item1: Any, item2: Any) -> bool:
         """Return whether item1 and item2 are adjacent vertices in this graph.
         Return False if item1/item2 are not in the graph. Modified from CSC111-A3
         """
         if item1 in self._vertices and item2 in self._vertices:
-            v1 = self._vertices[item1]
-            return any(v2.item == item2 for v2 in v1.neighbours)
+            return self._vertices[item2] in self._vertices[item1].neighbours
         else:
             return False
 
+    def adjacent_many(self, pairs: list[tuple[Any, Any]]) -> np.ndarray:
+        """Return an array of whether the items of each pair in pairs are adjacent vertices in
+        this graph, like adjacent.
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex('DACA', 0)
+        >>> g.add_vertex('DREAMers', 0)
+        >>> g.add_edge('DACA', 'DREAMers')
+        >>> g.adjacent_many([('DACA', 'DREAMers'), ('DACA', 'DACA'), ('DACA', 'MAGA')]).tolist()
+        [True, False, False]
+        """
+        return np.fromiter((self.adjacent(item1, item2) for item1, item2 in pairs), dtype=bool,
+                           count=len(pairs))
+
+    def get_count_edge(self, item1: Any, item2: Any) -> int:
+        """Return the number of tweets the given items appear in together.
+
+        Return 0 if item1 and item2 are not adjacent.
+
+        Preconditions:
+            - item1 and item2 are vertices in this graph
+        """
+        v1 = self._vertices[item1]
+        v2 = self._vertices[item2]
+        return v1.neighbours.get(v2, 0)
+
     def get_weight_edge(self, item1: Any, item2: Any) -> float:
         """Return the weight of the edge between the given items.
 
@@ -231,7 +293,63 @@ class WeightedGraph:
         """
         v1 = self._vertices[item1]
         v2 = self._vertices[item2]
-        return v1.neighbours.get(v2, -1)[1]
+        if v2 in v1.neighbours:
+            return self.weigh_edge(v1, v2)
+        else:
+            return -1
+
+    def get_weight_edges(self, pairs: list[tuple[Any, Any]]) -> np.ndarray:
+        """Return an array of the weight of the edge between the items of each pair in pairs,
+        like get_weight_edge.
+
+        Preconditions:
+            - all(item1 in self._vertices and item2 in self._vertices for item1, item2 in pairs)
+        """
+        return np.fromiter((self.get_weight_edge(item1, item2) for item1, item2 in pairs),
+                           dtype=np.float64, count=len(pairs))
+
+    def top_neighbours(self, item: Any, k: int, by: str = 'weight') -> list:
+        """Return the (at most) k neighbours of item with the strongest edges to it, from
+        strongest to weakest. The neighbours are ranked by the weight of their edges if by is
+        'weight', or by the number of tweets they share with item if by is 'count'. Neighbours
+        with the same weight or count are in the order they were added.
+
+        The neighbours of every vertex are ranked once, the first time a ranking is used after
+        the graph changes, so this only takes O(k) time.
+
+        Preconditions:
+            - item in self._vertices
+            - k >= 0
+            - by in {'weight', 'count'}
+
+        >>> g = WeightedGraph()
+        >>> for hashtag in ['DACA', 'DACA', 'DREAMers', 'MAGA', 'MAGA', 'MAGA']:
+        ...     g.add_vertex(hashtag, 0)
+        >>> g.add_edge('DACA', 'DREAMers')
+        >>> g.add_edge_count('DACA', 'MAGA', 2)
+        >>> g.top_neighbours('DACA', 2, 'count')
+        ['MAGA', 'DREAMers']
+        >>> g.top_neighbours('DACA', 2)
+        ['MAGA', 'DREAMers']
+        """
+        return [u.item for u in self._ranking(by)[item][:k]]
+
+    def _ranking(self, by: str) -> dict[Any, list[_WeightedHashtag]]:
+        """Return the neighbours of every vertex, ranked by weight or count (see
+        top_neighbours), ranking them if they haven't been ranked since the graph changed.
+        """
+        # the order by weight depends on the edge format, so each format has its own ranking
+        name = f'weight-{self.edge_format}' if by == 'weight' else by
+        if name not in self._rankings:
+            ranking = {}
+            for v in self._vertices.values():
+                if by == 'weight':
+                    strengths = {u: self.weigh_edge(v, u) for u in v.neighbours}
+                else:
+                    strengths = v.neighbours
+                ranking[v.item] = sorted(v.neighbours, key=strengths.__getitem__, reverse=True)
+            self._rankings[name] = ranking
+        return self._rankings[name]
 
     def get_weight_hashtag(self, item: Any) -> float:
         """Returns the weight of the partisanship of the hashtag.
@@ -242,33 +360,108 @@ class WeightedGraph:
             - item in self._vertices"""
         return self._vertices[item].partisanship
 
+    def set_weight_hashtags(self, partisanships: dict[Any, float]) -> None:
+        """Set the partisanship of every hashtag in partisanships that is in this graph, such as
+        the de-biased scores of partisanship.py, instead of the share of its tweets that are
+        Republican. The partisanship of a hashtag goes back to that share as soon as it is
+        added to again. Hashtags that aren't in this graph are ignored.
+
+        Preconditions:
+            - all(0 <= partisanship <= 1 for partisanship in partisanships.values())
+
+        >>> g = WeightedGraph()
+        >>> g.add_vertex('MAGA', 1)
+        >>> g.set_weight_hashtags({'MAGA': 0.75, 'DACA': 0.0})
+        >>> g.get_weight_hashtag('MAGA')
+        0.75
+        """
+        for item, partisanship in partisanships.items():
+            if item in self._vertices:
+                self._vertices[item].partisanship = partisanship
+
     def get_vertices(self) -> dict:
         """Returns the _vertices of the graph."""
         return self._vertices
 
-    def to_networkx(self, max_vertices: int = 5000) -> nx.Graph:
+    def to_networkx(self, max_vertices: int = 5000, rank_by: Optional[str] = None,
+                    min_weight: float = 0.0) -> nx.Graph:
         """Converts the weighted graph to the networkx graph, to be called after the
         computations have been completed. Creates a networkx graph including the partisanship
         bias, the weighting of the hashtag node (absolute number of times it has appeared),
-        as well as all the weighted edges connecting the hashtag nodes."""
-        graph_nx = nx.Graph()
-        for v in self._vertices.values():
-            graph_nx.add_node(v.item, bias=v.partisanship, count=v.count)
+        as well as all the weighted edges connecting the hashtag nodes.
 
-            for u in v.neighbours:
-                if graph_nx.number_of_nodes() < max_vertices:
-                    graph_nx.add_node(u.item, bias=u.partisanship, count=u.count)
+        graph_nx.graph['ranked_neighbours'] maps every node to its neighbours in graph_nx, from
+        the strongest edge to the weakest (see rank_networkx_neighbours).
+
+        Optional arguments:
+            - max_vertices: the most nodes the networkx graph can have
+            - rank_by: if this is given, the networkx graph has the max_vertices hashtags with
+                the highest 'count', 'degree' or 'strength' (the sum of the weights of its
+                edges), instead of the first hashtags that were added and their neighbours
+            - min_weight: if rank_by is given, only the edges with at least this weight are
+                in the networkx graph
+
+        Preconditions:
+            - max_vertices >= 0
+            - rank_by in {None, 'count', 'degree', 'strength'}
+        """
+        if rank_by is not None:
+            graph_nx = self._top_networkx(max_vertices, rank_by, min_weight)
+        else:
+            graph_nx = nx.Graph()
+            for v in self._vertices.values():
+                graph_nx.add_node(v.item, bias=v.partisanship, count=v.count)
 
-                if u.item in graph_nx.nodes:
-                    graph_nx.add_edge(v.item, u.item, weight=u.neighbours[v][1])
+                for u in v.neighbours:
+                    if graph_nx.number_of_nodes() < max_vertices:
+                        graph_nx.add_node(u.item, bias=u.partisanship, count=u.count)
 
-            if graph_nx.number_of_nodes() >= max_vertices:
-                break
+                    if u.item in graph_nx.nodes:
+                        graph_nx.add_edge(v.item, u.item, weight=self.weigh_edge(v, u))
+
+                if graph_nx.number_of_nodes() >= max_vertices:
+                    break
+
+        rank_networkx_neighbours(graph_nx)
+        return graph_nx
+
+    def _top_networkx(self, max_vertices: int, rank_by: str, min_weight: float) -> nx.Graph:
+        """Return the networkx graph of the max_vertices most important hashtags by rank_by,
+        with the edges between them of at least min_weight. See to_networkx.
+
+        The hashtags are picked with a heap, and only their edges are visited.
+        """
+        if rank_by == 'count':
+            chosen = heapq.nlargest(max_vertices, self._vertices.values(),
+                                    key=lambda v: v.count)
+        elif rank_by == 'degree':
+            chosen = heapq.nlargest(max_vertices, self._vertices.values(),
+                                    key=lambda v: v.degree())
+        else:
+            chosen = heapq.nlargest(max_vertices, self._vertices.values(),
+                                    key=lambda v: sum(self.weigh_edge(v, u)
+                                                      for u in v.neighbours))
+        # the place of each chosen hashtag, so that each edge is only added once
+        places = {v: place for place, v in enumerate(chosen)}
+
+        edges = []
+        for v in chosen:
+            for u in v.neighbours:
+                if u in places and places[v] <= places[u]:
+                    weight = self.weigh_edge(v, u)
+                    if weight >= min_weight:
+                        edges.append((v.item, u.item, {'weight': weight}))
+
+        graph_nx = nx.Graph()
+        graph_nx.add_nodes_from((v.item, {'bias': v.partisanship, 'count': v.count})
+                                for v in chosen)
+        graph_nx.add_edges_from(edges)
         return graph_nx
 
     def remove_min_count(self, min_count: int) -> None:
         """Removes nodes that have a count less than min_count.
         """
+        self._rankings = {}
         new_graph = self._vertices.copy()
         for hashtag in self._vertices:
             if self._vertices[hashtag].count <= min_count:
@@ -278,3 +471,19 @@ class WeightedGraph:
                         neighbour.neighbours.pop(new_graph[hashtag])
                 new_graph.pop(hashtag)
         self._vertices = new_graph
+
+
+def rank_networkx_neighbours(graph_nx: nx.Graph) -> None:
+    """Store the neighbours of every node of graph_nx, from the heaviest edge to the lightest
+    (without the node itself), in graph_nx.graph['ranked_neighbours'], so that the renderer can
+    get the strongest neighbours of a node without sorting them (see
+    rendering.strongest_neighbours).
+
+    Only the edges of graph_nx are sorted, so this is fast no matter how large the graph it
+    came from is.
+    """
+    ranked_neighbours = {}
+    for item, neighbours in graph_nx.adj.items():
+        weights = {u: data['weight'] for u, data in neighbours.items() if u != item}
+        ranked_neighbours[item] = sorted(weights, key=weights.__getitem__, reverse=True)
+    graph_nx.graph['ranked_neighbours'] = ranked_neighbours
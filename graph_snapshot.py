@@ -0,0 +1,82 @@
+"""CSC111 2021 Hashtag Partisanship, saving and loading graphs
+
+This file saves our graphs to binary snapshot files, and loads them back as
+CompactWeightedGraphs, so that the graph doesn't have to be built from the csv file every time
+the program starts.
+
+A snapshot file is an array file (see array_file.py) of the arrays of the graph (see
+CompactWeightedGraph.to_arrays), whose header records the edge format and min_count the graph
+was built with, and the files it was built from (see file_fingerprint). build_cache.py decides
+when a snapshot can be reused.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import os
+from typing import Optional, Union
+
+from dataclasses import WeightedGraph
+from compact_graph import CompactWeightedGraph
+import array_file
+
+SNAPSHOT_MAGIC = b'HASHTAGS'
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(graph: Union[WeightedGraph, CompactWeightedGraph], file_name: str,
+                  min_count: int, inputs: Optional[dict] = None) -> None:
+    """Save graph to the snapshot file file_name, recording the min_count it was built with and
+    the inputs it was built from (any json-compatible dict, see file_fingerprint).
+    """
+    if isinstance(graph, WeightedGraph):
+        graph = CompactWeightedGraph.from_weighted_graph(graph)
+    array_file.save_arrays(file_name, SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                           {'edge_format': graph.edge_format, 'min_count': min_count,
+                            'inputs': inputs or {}},
+                           graph.to_arrays())
+
+
+def read_snapshot_header(file_name: str) -> dict:
+    """Return the header of the snapshot file file_name.
+
+    Raise a ValueError if file_name isn't a snapshot file of SNAPSHOT_VERSION.
+    """
+    return array_file.read_header(file_name, SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+
+
+def load_snapshot(file_name: str) -> CompactWeightedGraph:
+    """Return the graph saved in the snapshot file file_name.
+
+    Only the header is read: the arrays of the graph are memory-mapped, so they are read from
+    the file as they are used, and processes that load the same snapshot share its pages.
+
+    Raise a ValueError if file_name isn't a snapshot file of SNAPSHOT_VERSION.
+    """
+    header, arrays = array_file.load_arrays(file_name, SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+    return CompactWeightedGraph.from_arrays(header['edge_format'], arrays)
+
+
+def file_fingerprint(file_name: str) -> dict:
+    """Return a dict that changes whenever the file file_name is changed, made of its absolute
+    path, size and modification time.
+    """
+    stat = os.stat(file_name)
+    return {'path': os.path.abspath(file_name), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['os', 'dataclasses', 'compact_graph', 'array_file'],
+        'max-nested-blocks': 4
+    })
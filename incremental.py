@@ -0,0 +1,330 @@
+"""CSC111 2021 Hashtag Partisanship, adding new batches of tweets to a graph
+
+This file adds a new batch of tweets (either hydrated tweets, or a csv file made by
+get_us_hashtags) to the counts of an existing graph, so that a daily batch of tweets only costs
+as much as the batch, instead of filtering and counting every tweet again.
+
+The counts are kept in a snapshot file (see graph_snapshot.py) of the graph before any hashtags
+are removed, and the ids of every tweet already counted are kept in a sorted numpy array saved
+next to it, so that a tweet that is delivered twice is only counted once. Every batch saves its
+own counts and ids to batch files next to these two files (see _batch_file), and its ids are
+looked up in the memory-mapped id files, so adding a batch doesn't read or write the counts or
+ids of the batches before it. Once there are more than MAX_BATCH_FILES batches, they are
+merged into the two files (see merge_batches), which takes time for the whole history, but only
+once every MAX_BATCH_FILES batches. refresh_graph then adds up the counts of every batch and
+removes the hashtags below min_count, like load_weighted_hashtags_graph does.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import csv
+import os
+import tempfile
+from typing import Iterator
+
+import numpy as np
+
+from compact_graph import CompactWeightedGraph, sum_by_key
+import columnar
+import cooccurrence
+import csv_to_graph
+import graph_snapshot
+import making_new_csv
+
+
+# The most batches append_tweets keeps in batch files of their own before merging them.
+MAX_BATCH_FILES = 16
+
+# The id of the first hashtag of an edge takes up the bits above these in its key.
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def append_tweets(raw_counts_file: str, seen_ids_file: str, delta_file: str,
+                  member_info_file: str = '', senate_file: str = '') -> dict[str, int]:
+    """Add the tweets in delta_file that haven't been counted yet to the raw counts kept in the
+    snapshot file raw_counts_file, and their ids to the ids kept in seen_ids_file (a .npy file).
+    Neither file has to exist yet, so the first batch starts the graph.
+
+    The ids of the batch are looked up in the memory-mapped id files all at once, its tweets
+    are counted with cooccurrence.count_records, and its counts and ids are saved to batch
+    files of their own, so this only takes time for the batch, except for every
+    MAX_BATCH_FILES batches, when the batches are merged (see merge_batches).
+
+    delta_file is a csv file made by get_us_hashtags, a columnar file made by
+    get_us_hashtags_columnar, or a file of hydrated tweets if member_info_file and senate_file
+    are given (see get_us_hashtags).
+
+    Return the number of tweets that were added, and the number of tweets that were skipped
+    because they had already been counted.
+
+    Raise a ValueError if delta_file is a csv file without a tweet_id column.
+    """
+    merged = _merged_batch(raw_counts_file)
+    batches = _batch_numbers(seen_ids_file)
+    seen_ids = [np.load(file_name, mmap_mode='r') for file_name in _ids_files(seen_ids_file)]
+
+    if member_info_file != '':
+        with tempfile.TemporaryDirectory() as directory:
+            delta_csv = os.path.join(directory, 'delta.csv')
+            making_new_csv.get_us_hashtags(delta_file, member_info_file, senate_file, delta_csv)
+            arrays, new_ids, duplicates = _count_tweets(_read_rows_with_ids(delta_csv), seen_ids)
+    else:
+        arrays, new_ids, duplicates = _count_tweets(_read_rows_with_ids(delta_file), seen_ids)
+
+    if len(new_ids) > 0:
+        batch = max(batches + [merged]) + 1
+        # the counts are saved first, so a batch's ids are never saved without its counts
+        graph_snapshot.save_snapshot(CompactWeightedGraph.from_arrays('abs', arrays),
+                                     _batch_file(raw_counts_file, batch), 0)
+        _save_array(_batch_file(seen_ids_file, batch), new_ids)
+        batches.append(batch)
+    if len([batch for batch in batches if batch > merged]) > MAX_BATCH_FILES:
+        merge_batches(raw_counts_file, seen_ids_file)
+    return {'added': len(new_ids), 'duplicates': duplicates}
+
+
+def merge_batches(raw_counts_file: str, seen_ids_file: str) -> None:
+    """Merge the counts and ids of every batch that append_tweets saved to batch files into
+    raw_counts_file and seen_ids_file, and delete the batch files.
+
+    The number of the last batch merged is saved in the header of raw_counts_file, so if this
+    is stopped before the batch files are deleted, their counts aren't added again.
+    """
+    batches = _batch_numbers(seen_ids_file)
+    if not batches:
+        return
+    if batches[-1] > _merged_batch(raw_counts_file):
+        graph_snapshot.save_snapshot(load_raw_counts(raw_counts_file), raw_counts_file, 0,
+                                     {'merged_batch': batches[-1]})
+    _save_array(seen_ids_file, np.unique(np.concatenate(
+        [np.load(file_name) for file_name in _ids_files(seen_ids_file)])))
+
+    for batch in _batch_numbers(seen_ids_file):
+        for file_name in (_batch_file(raw_counts_file, batch), _batch_file(seen_ids_file, batch)):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+
+def load_raw_counts(raw_counts_file: str) -> CompactWeightedGraph:
+    """Return the raw counts kept in raw_counts_file and the batch files that haven't been
+    merged into it yet (see append_tweets), added up. The hashtags are in the order they were
+    first counted.
+    """
+    graphs = [graph_snapshot.load_snapshot(file_name)
+              for file_name in _counts_files(raw_counts_file)]
+    if len(graphs) == 0:
+        return CompactWeightedGraph()
+    elif len(graphs) == 1:
+        return graphs[0]
+    return CompactWeightedGraph.from_arrays('abs', _add_counts(graphs))
+
+
+def refresh_graph(raw_counts_file: str, min_count: int, edge_format: str,
+                  graph_file: str) -> CompactWeightedGraph:
+    """Return the graph of the raw counts in raw_counts_file and its batch files (see
+    load_raw_counts) without the hashtags at or below min_count, using edge_format for its
+    edges, and save it to the snapshot file graph_file.
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+    """
+    file_names = _counts_files(raw_counts_file)
+    graph = load_raw_counts(raw_counts_file)
+    graph.edge_format = edge_format
+    graph.remove_min_count(min_count)
+    graph_snapshot.save_snapshot(graph, graph_file, min_count,
+                                 {'raw_counts': [graph_snapshot.file_fingerprint(file_name)
+                                                 for file_name in file_names]})
+    return graph
+
+
+def _count_tweets(rows: Iterator[tuple[int, int, list[str]]],
+                  seen_ids: list[np.ndarray]) -> tuple[dict[str, np.ndarray], np.ndarray, int]:
+    """Return the arrays (see cooccurrence.count_records) of the counts of the rows of
+    (tweet id, party, hashtags) whose tweet ids aren't in any of the sorted arrays seen_ids or
+    in an earlier row, the sorted ids of those rows, and the number of rows that were skipped.
+
+    The ids are checked all at once, with one binary search of each array of seen_ids, so
+    only the pages of the memory-mapped arrays that are searched are read.
+
+    >>> rows = [(7, 0, ['daca', 'dreamers']), (3, 1, ['maga']), (7, 0, ['daca', 'dreamers'])]
+    >>> arrays, new_ids, duplicates = _count_tweets(iter(rows), [np.array([3, 5])])
+    >>> columnar.decode_strings(arrays['items']), new_ids.tolist(), duplicates
+    (['daca', 'dreamers'], [7], 2)
+    """
+    rows = list(rows)
+    tweet_ids = np.fromiter((tweet_id for tweet_id, _, _ in rows), dtype=np.int64,
+                            count=len(rows))
+    # the first row of every tweet id
+    new_ids, first = np.unique(tweet_ids, return_index=True)
+    new = np.ones(len(new_ids), dtype=bool)
+    for ids in seen_ids:
+        new &= ~_in_sorted(ids, new_ids)
+    kept = np.sort(first[new])
+    arrays = cooccurrence.count_records((rows[i][1], rows[i][2]) for i in kept.tolist())
+    return arrays, new_ids[new], len(rows) - len(kept)
+
+
+def _read_rows_with_ids(tweets_csv: str) -> Iterator[tuple[int, int, list[str]]]:
+    """Yield the tweet id, party and list of hashtags of every row of the csv (or columnar)
+    file tweets_csv.
+
+    Raise a ValueError if tweets_csv doesn't have a tweet_id column, or is a columnar file
+    without tweet ids.
+    """
+    if columnar.is_columnar_file(tweets_csv):
+        if (columnar.load_columnar(tweets_csv)['tweet_ids'] < 0).any():
+            raise ValueError
+        yield from columnar.read_columnar_with_ids(tweets_csv)
+        return
+    with open(tweets_csv, encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        if 'tweet_id' not in header:
+            raise ValueError
+        id_column = header.index('tweet_id')
+        for row in reader:
+            yield int(row[id_column]), int(row[1]), csv_to_graph.string_to_list(row[2])
+
+
+def _in_sorted(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Return whether every value of values is in the sorted array sorted_values.
+
+    >>> _in_sorted(np.array([2, 5, 9]), np.array([5, 10, 1])).tolist()
+    [True, False, False]
+    """
+    positions = np.searchsorted(sorted_values, values)
+    found = np.zeros(len(values), dtype=bool)
+    inside = positions < len(sorted_values)
+    found[inside] = sorted_values[positions[inside]] == values[inside]
+    return found
+
+
+def _add_counts(graphs: list[CompactWeightedGraph]) -> dict[str, np.ndarray]:
+    """Return the arrays (see CompactWeightedGraph.to_arrays) of the sum of the counts of
+    graphs, whose hashtags are in the order they first appear in graphs.
+
+    >>> graph1, graph2 = CompactWeightedGraph(), CompactWeightedGraph()
+    >>> for graph, party, hashtags in [(graph1, 0, ['daca', 'dreamers']),
+    ...                                (graph2, 1, ['maga', 'daca'])]:
+    ...     for hashtag in hashtags:
+    ...         graph.add_vertex(hashtag, party)
+    ...     graph.add_edge(*hashtags)
+    >>> graph = CompactWeightedGraph.from_arrays('abs', _add_counts([graph1, graph2]))
+    >>> graph.get_count_edge('daca', 'dreamers'), graph.get_count_edge('daca', 'maga')
+    (1, 1)
+    >>> graph.get_weight_hashtag('daca')
+    0.5
+    """
+    ids = {}
+    new_ids, arrays = [], []
+    for graph in graphs:
+        graph_arrays = graph.to_arrays()
+        new_ids.append(np.array([ids.setdefault(item, len(ids)) for item in
+                                 columnar.decode_strings(graph_arrays['items'])],
+                                dtype=np.int64))
+        arrays.append(graph_arrays)
+
+    counts = {name: sum(np.bincount(graph_ids, weights=graph_arrays[name],
+                                    minlength=len(ids)).astype(np.int64)
+                        for graph_ids, graph_arrays in zip(new_ids, arrays))
+              for name in ['counts', 'counts_dem', 'counts_rep']}
+    keys, edge_counts = sum_by_key(
+        np.concatenate([(graph_ids[np.repeat(np.arange(len(graph_ids)),
+                                             np.diff(graph_arrays['offsets']))] << _ID_BITS)
+                        | graph_ids[graph_arrays['indices']]
+                        for graph_ids, graph_arrays in zip(new_ids, arrays)]),
+        np.concatenate([graph_arrays['edge_counts'] for graph_arrays in arrays]))
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys >> _ID_BITS, minlength=len(ids)), out=offsets[1:])
+    return {'items': np.frombuffer('\n'.join(ids).encode('utf-8'), dtype=np.uint8),
+            **counts,
+            'offsets': offsets,
+            'indices': (keys & _ID_MASK).astype(np.int32),
+            'edge_counts': edge_counts}
+
+
+def _merged_batch(raw_counts_file: str) -> int:
+    """Return the number of the last batch merged into raw_counts_file (see merge_batches), or
+    0 if none has been.
+    """
+    if not os.path.exists(raw_counts_file):
+        return 0
+    return graph_snapshot.read_snapshot_header(raw_counts_file)['inputs'].get('merged_batch', 0)
+
+
+def _counts_files(raw_counts_file: str) -> list[str]:
+    """Return the names of raw_counts_file and of the batch files of counts that haven't been
+    merged into it, which exist.
+    """
+    merged = _merged_batch(raw_counts_file)
+    file_names = [raw_counts_file] + [_batch_file(raw_counts_file, batch)
+                                      for batch in _batch_numbers(raw_counts_file)
+                                      if batch > merged]
+    return [file_name for file_name in file_names if os.path.exists(file_name)]
+
+
+def _ids_files(seen_ids_file: str) -> list[str]:
+    """Return the names of seen_ids_file and of its batch files, which exist. Every one of
+    them is kept until merge_batches has merged it into seen_ids_file.
+    """
+    file_names = [seen_ids_file] + [_batch_file(seen_ids_file, batch)
+                                    for batch in _batch_numbers(seen_ids_file)]
+    return [file_name for file_name in file_names if os.path.exists(file_name)]
+
+
+def _batch_file(file_name: str, batch: int) -> str:
+    """Return the name of the file of batch number batch kept next to file_name.
+
+    >>> _batch_file('seen_ids.npy', 3)
+    'seen_ids.batch3.npy'
+    """
+    root, extension = os.path.splitext(file_name)
+    return f'{root}.batch{batch}{extension}'
+
+
+def _batch_numbers(file_name: str) -> list[int]:
+    """Return the numbers of the batch files kept next to file_name (see _batch_file), in
+    order.
+    """
+    root, extension = os.path.splitext(file_name)
+    directory, prefix = os.path.split(root + '.batch')
+    batches = []
+    for name in os.listdir(directory or '.'):
+        number = name[len(prefix):len(name) - len(extension)]
+        if name.startswith(prefix) and name.endswith(extension) and number.isdigit():
+            batches.append(int(number))
+    return sorted(batches)
+
+
+def _save_array(file_name: str, values: np.ndarray) -> None:
+    """Save values to the .npy file file_name, replacing it only once it is fully written."""
+    with open(file_name + '.tmp', mode='wb') as file:
+        np.save(file, values)
+    os.replace(file_name + '.tmp', file_name)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['csv', 'os', 'tempfile', 'numpy', 'compact_graph', 'columnar',
+                          'cooccurrence', 'csv_to_graph', 'graph_snapshot', 'making_new_csv'],
+        'allowed-io': ['_read_rows_with_ids', '_save_array'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
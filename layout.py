@@ -0,0 +1,441 @@
+"""CSC111 2021 Hashtag Partisanship, laying out the graph once
+
+This file computes one layout of the whole graph (with force_layout), saves it to a layout file
+next to the graph, and reuses its positions whenever a part of the graph is drawn, so the graph
+isn't laid out from scratch every time a view is shown in the gui.
+
+A node that isn't in the layout yet is placed near its neighbours that are, and then only the new
+nodes are moved by force_layout while every other node stays where it is. The new positions are
+added to the layout, so a node keeps its place in every view it is drawn in.
+
+force_layout is the force-directed layout of nx.spring_layout (Fruchterman-Reingold), except
+that the repulsion between far apart nodes is approximated with a grid. Every node is pushed away
+exactly by the nodes in its cell of the grid and the cells next to it, and by every other cell
+as a whole, from the centroid of the cell's nodes. So an iteration takes about
+O(n * NODES_PER_CELL + (n / NODES_PER_CELL)^2 + m) time instead of O(n^2), which makes graphs of
+tens of thousands of nodes take seconds instead of hours, and the cells can be split between
+several processes.
+
+LAYOUTS names the layouts of this file, so they can be used wherever the name of a networkx
+layout is (see get_layout).
+
+A layout file is an array file (see array_file.py) of the names of the nodes and their positions,
+whose header records the graph it was computed for (see graph_key), so the layout is computed
+again whenever the graph changes.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+from typing import Callable, Optional
+
+import networkx as nx
+import numpy as np
+
+import array_file
+
+LAYOUT_MAGIC = b'HASHPOSN'
+LAYOUT_VERSION = 1
+
+# The average number of nodes in a cell of the grid of force_layout.
+NODES_PER_CELL = 16
+
+# How far a new node is placed from the average position of its neighbours, before the new
+# nodes are moved by force_layout.
+_JITTER = 0.05
+
+# The most pairs of nodes (or cells) whose repulsion a task of force_layout computes at once.
+_MAX_PAIRS = 1 << 21
+
+# How close two nodes are treated as being at most, like nx.spring_layout does.
+_MIN_DISTANCE = 0.01
+
+
+class GraphLayout:
+    """The positions of the nodes of a graph.
+
+    Instance Attributes:
+        - positions: the x and y coordinates of every node that has been placed, keyed by name
+
+    >>> graph_nx = nx.Graph([('daca', 'dreamers'), ('daca', 'maga')])
+    >>> layout = GraphLayout({'daca': np.array([0.0, 0.0]), 'dreamers': np.array([1.0, 0.0])})
+    >>> pos = layout.place(graph_nx, seed=0)
+    >>> pos['daca'].tolist(), pos['dreamers'].tolist()
+    ([0.0, 0.0], [1.0, 0.0])
+    >>> 'maga' in layout.positions
+    True
+    """
+    positions: dict[str, np.ndarray]
+
+    def __init__(self, positions: Optional[dict[str, np.ndarray]] = None) -> None:
+        self.positions = positions if positions is not None else {}
+
+    def place(self, graph_nx: nx.Graph, iterations: int = 50, seed: Optional[int] = None,
+              num_workers: int = 1) -> dict[str, np.ndarray]:
+        """Return the positions of the nodes of graph_nx, as a dict that can be used as the pos
+        of visualize_graph.
+
+        The nodes that already have a position keep it, so no layout is computed when every node
+        of graph_nx has one. Otherwise, every new node starts at the average position of its
+        placed neighbours (or at a random position if it has none), and then only the new nodes
+        are moved by iterations steps of force_layout. The new nodes are added to
+        self.positions.
+
+        Optional arguments:
+            - iterations: the number of steps of force_layout used to move the new nodes
+            - seed: the seed of the random positions, so the same nodes are always placed the
+                same way
+            - num_workers: see force_layout
+        """
+        new_nodes = [node for node in graph_nx.nodes if node not in self.positions]
+        if new_nodes:
+            self._place_new_nodes(graph_nx, new_nodes, iterations, seed, num_workers)
+        return {node: self.positions[node] for node in graph_nx.nodes}
+
+    def _place_new_nodes(self, graph_nx: nx.Graph, new_nodes: list[str], iterations: int,
+                         seed: Optional[int], num_workers: int) -> None:
+        """Add the positions of new_nodes, the nodes of graph_nx without a position, to
+        self.positions. See place.
+        """
+        rng = np.random.default_rng(seed)
+        fixed = [node for node in graph_nx.nodes if node in self.positions]
+        if not fixed:
+            # there is nothing to place the nodes near, so this is just a new layout
+            self.positions.update(force_layout(graph_nx, iterations=iterations, seed=seed,
+                                               num_workers=num_workers))
+            return
+
+        pos = {node: self.positions[node] for node in fixed}
+        centre = np.mean([pos[node] for node in fixed], axis=0)
+        for node in new_nodes:
+            placed = [pos[neighbour] for neighbour in graph_nx.neighbors(node)
+                      if neighbour in pos and neighbour != node]
+            start = np.mean(placed, axis=0) if placed else centre
+            pos[node] = start + rng.uniform(-_JITTER, _JITTER, size=2)
+
+        # with fixed nodes, force_layout doesn't rescale the positions, so the new nodes stay
+        # in the same coordinates as the rest of the layout
+        pos = force_layout(graph_nx, pos=pos, fixed=fixed, iterations=iterations, seed=seed,
+                           num_workers=num_workers)
+        for node in new_nodes:
+            self.positions[node] = np.asarray(pos[node], dtype=np.float64)
+
+    def save(self, file_name: str, key: str) -> None:
+        """Save this layout to the layout file file_name, as the layout of the graph whose
+        graph_key is key.
+        """
+        names = list(self.positions)
+        array_file.save_arrays(file_name, LAYOUT_MAGIC, LAYOUT_VERSION, {'graph_key': key}, {
+            'names': np.frombuffer('\n'.join(names).encode('utf-8'), dtype=np.uint8),
+            'positions': np.array([self.positions[name] for name in names],
+                                  dtype=np.float64).reshape((len(names), 2))
+        })
+
+
+def graph_key(graph_nx: nx.Graph) -> str:
+    """Return a hash of the nodes and weighted edges of graph_nx, which changes whenever its
+    layout would.
+
+    >>> graph_key(nx.Graph([('daca', 'dreamers')])) == graph_key(nx.Graph([('daca', 'maga')]))
+    False
+    """
+    digest = hashlib.sha256()
+    for node in graph_nx.nodes:
+        digest.update(f'{node}\n'.encode('utf-8'))
+    for node1, node2, weight in graph_nx.edges.data('weight'):
+        digest.update(f'{node1}\n{node2}\n{weight}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def layout_file_name(graph_file: str) -> str:
+    """Return the name of the layout file kept next to the file graph_file the graph was built
+    from.
+
+    >>> layout_file_name('total_filtered_politician.csv')
+    'total_filtered_politician.layout'
+    """
+    return os.path.splitext(graph_file)[0] + '.layout'
+
+
+def load_layout(file_name: str, key: str) -> Optional[GraphLayout]:
+    """Return the layout saved in the layout file file_name, or None if there is no such file
+    or it wasn't saved for the graph whose graph_key is key.
+    """
+    if not os.path.exists(file_name):
+        return None
+    try:
+        header, arrays = array_file.load_arrays(file_name, LAYOUT_MAGIC, LAYOUT_VERSION)
+    except ValueError:
+        # an older layout format, which is computed again
+        return None
+    if header.get('graph_key') != key:
+        return None
+
+    names = arrays['names'].tobytes().decode('utf-8').split('\n') if len(arrays['names']) else []
+    positions = np.array(arrays['positions'])
+    return GraphLayout(dict(zip(names, positions)))
+
+
+def load_or_compute_layout(graph_nx: nx.Graph, file_name: str, seed: Optional[int] = 0,
+                           iterations: int = 50, num_workers: int = 1) -> GraphLayout:
+    """Return the layout of graph_nx, loading it from the layout file file_name if it was saved
+    for this graph. Otherwise, lay out the whole graph with force_layout and save it to
+    file_name.
+
+    Optional arguments:
+        - seed: the seed of force_layout, so the same graph is always laid out the same way
+        - iterations: the number of steps of force_layout
+        - num_workers: see force_layout
+    """
+    key = graph_key(graph_nx)
+    layout = load_layout(file_name, key)
+    if layout is None:
+        layout = GraphLayout()
+        layout.place(graph_nx, iterations, seed, num_workers)
+        layout.save(file_name, key)
+    return layout
+
+
+def force_layout(graph_nx: nx.Graph, pos: Optional[dict] = None, fixed: Optional[list] = None,
+                 iterations: int = 50, seed: Optional[int] = None, weight: str = 'weight',
+                 num_workers: int = 1) -> dict[str, np.ndarray]:
+    """Return the positions of the nodes of graph_nx, laid out like nx.spring_layout does, with
+    the repulsion between far apart nodes approximated by a grid (see the module docstring).
+
+    The arguments are the same as the ones of nx.spring_layout: the nodes start at their
+    positions in pos (and the others at random), the nodes in fixed aren't moved, and the
+    positions are rescaled to [-1, 1] unless some nodes are fixed.
+
+    Optional arguments:
+        - pos: the starting positions of some of the nodes
+        - fixed: the nodes that keep their starting positions
+        - iterations: the number of steps the nodes are moved for
+        - seed: the seed of the random starting positions
+        - weight: the edge attribute used as the weight of every edge (1 if it's missing)
+        - num_workers: the number of processes the repulsion is computed with, or every cpu
+            core if it is 0
+
+    Preconditions:
+        - iterations >= 0
+        - num_workers >= 0
+        - fixed is None or all(node in pos for node in fixed)
+
+    >>> graph_nx = nx.path_graph(['daca', 'dreamers', 'maga'])
+    >>> pos = force_layout(graph_nx, seed=0)
+    >>> sorted(pos) == ['daca', 'dreamers', 'maga']
+    True
+    >>> all(-1 <= value <= 1 for position in pos.values() for value in position)
+    True
+    """
+    nodes = list(graph_nx.nodes)
+    if not nodes:
+        return {}
+    index = {node: i for i, node in enumerate(nodes)}
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 1, size=(len(nodes), 2))
+    for node, position in (pos or {}).items():
+        if node in index:
+            positions[index[node]] = position
+    is_fixed = np.zeros(len(nodes), dtype=bool)
+    is_fixed[[index[node] for node in (fixed or [])]] = True
+
+    edges = np.array([(index[node1], index[node2], 1.0 if value is None else value)
+                      for node1, node2, value in graph_nx.edges.data(weight)
+                      if node1 != node2], dtype=np.float64).reshape((-1, 3))
+    sources = edges[:, 0].astype(np.int64)
+    targets = edges[:, 1].astype(np.int64)
+
+    # the same constants as nx.spring_layout
+    k = math.sqrt(1 / len(nodes))
+    temperature = max(float(np.ptp(positions, axis=0).max()), 0.01) * 0.1
+    cooling = temperature / (iterations + 1)
+
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    pool = multiprocessing.Pool(num_workers) if num_workers > 1 else None
+    try:
+        for _ in range(iterations):
+            displacement = _repulsion(positions, k, pool, num_workers)
+            # every edge pulls its nodes together by distance^2 / k * weight
+            delta = positions[sources] - positions[targets]
+            distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), _MIN_DISTANCE)
+            pull = delta * (distance * edges[:, 2] / k)[:, None]
+            for axis in range(2):
+                displacement[:, axis] += \
+                    np.bincount(targets, pull[:, axis], minlength=len(nodes)) \
+                    - np.bincount(sources, pull[:, axis], minlength=len(nodes))
+
+            length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), _MIN_DISTANCE)
+            step = displacement * (np.minimum(length, temperature) / length)[:, None]
+            step[is_fixed] = 0
+            positions += step
+            temperature -= cooling
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if fixed is None or len(fixed) == 0:
+        positions -= positions.mean(axis=0)
+        scale = np.abs(positions).max()
+        if scale > 0:
+            positions /= scale
+    return dict(zip(nodes, positions))
+
+
+def _repulsion(positions: np.ndarray, k: float, pool: Optional[multiprocessing.Pool],
+               num_workers: int) -> np.ndarray:
+    """Return how far every node at the given positions is pushed by the others, k^2 / distance
+    away from each of them, with the far apart nodes approximated by the grid of force_layout.
+    """
+    grid_size = max(1, math.ceil(math.sqrt(len(positions) / NODES_PER_CELL)))
+    low = positions.min(axis=0)
+    span = np.maximum(np.ptp(positions, axis=0), 1e-12)
+    cell_xy = np.minimum(((positions - low) / span * grid_size).astype(np.int64), grid_size - 1)
+    cells = cell_xy[:, 0] * grid_size + cell_xy[:, 1]
+
+    # the nodes are sorted by cell, so the nodes of a cell are next to each other
+    order = np.argsort(cells, kind='stable')
+    counts = np.bincount(cells, minlength=grid_size * grid_size)
+    starts = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=starts[1:])
+    occupied = np.flatnonzero(counts)
+    centroids = np.stack([np.bincount(cells, positions[:, axis], minlength=len(counts))[occupied]
+                          for axis in range(2)]) / counts[occupied]
+    grid = {'x': positions[order, 0], 'y': positions[order, 1], 'k': k, 'grid_size': grid_size,
+            'counts': counts, 'starts': starts, 'occupied': occupied, 'centroids': centroids}
+
+    # the cells are split into tasks of about the same number of pairs, in order
+    pairs = counts[occupied] * _near_cells(occupied, grid_size, counts)[1] + len(occupied)
+    costs = np.cumsum(pairs)
+    num_tasks = max(-(-int(costs[-1]) // _MAX_PAIRS), 4 * num_workers if pool else 1)
+    bounds = np.unique(np.searchsorted(costs, np.linspace(0, costs[-1], num_tasks + 1)[1:-1]))
+    tasks = [(grid, lo, hi) for lo, hi in zip([0, *bounds.tolist()],
+                                              [*bounds.tolist(), len(occupied)]) if lo < hi]
+
+    displacement = np.zeros((len(positions), 2))
+    for first, forces in (pool.map(_cell_forces, tasks) if pool else map(_cell_forces, tasks)):
+        displacement[first:first + len(forces)] += forces
+    displacement[order] = displacement.copy()
+    return displacement
+
+
+def _near_cells(cells: np.ndarray, grid_size: int,
+                counts: np.ndarray) -> tuple[list[tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """Return the pairs of cells whose nodes push each other exactly, as a list of the arrays of
+    cells and of the nonempty cells after them next to them, and the number of nodes in each of
+    cells and the cells after it.
+
+    Every cell is paired with itself and with the cells next to it that come after it, so every
+    pair of cells next to each other is only paired once.
+    """
+    x, y = cells // grid_size, cells % grid_size
+    pairs = []
+    near = np.zeros(len(cells), dtype=np.int64)
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        other = (x + dx) * grid_size + y + dy
+        valid = (x + dx < grid_size) & (y + dy >= 0) & (y + dy < grid_size)
+        valid[valid] = counts[other[valid]] > 0
+        pairs.append((cells[valid], other[valid]))
+        near[valid] += counts[other[valid]]
+    return pairs, near
+
+
+def _cell_forces(task: tuple[dict, int, int]) -> tuple[int, np.ndarray]:
+    """Return the repulsion from the occupied cells lo to hi of the grid of _repulsion (task is
+    the grid, lo and hi), and the index (in the order of the grid) of the first node it pushes.
+
+    Along with their nodes, this pushes the nodes of the cells after them next to them.
+    """
+    grid, lo, hi = task
+    x, y, counts, starts = grid['x'], grid['y'], grid['counts'], grid['starts']
+    k2 = grid['k'] ** 2
+    cells = grid['occupied'][lo:hi]
+    pairs = _near_cells(cells, grid['grid_size'], counts)[0]
+    first = int(starts[cells[0]])
+    last = max(int(starts[other[-1] + 1]) for _, other in pairs if len(other) > 0)
+    forces = np.zeros((last - first, 2))
+
+    # every node in the same cell or a cell next to it, exactly
+    for offset, (cell, other) in enumerate(pairs):
+        index1 = _ranges(starts[cell], counts[cell])
+        # every node of cell is paired with every node of other
+        repeats = np.repeat(counts[other], counts[cell])
+        index2 = _ranges(np.repeat(starts[other], counts[cell]), repeats)
+        index1 = np.repeat(index1, repeats)
+        delta_x = x[index1] - x[index2]
+        delta_y = y[index1] - y[index2]
+        strength = k2 / np.maximum(delta_x * delta_x + delta_y * delta_y, _MIN_DISTANCE ** 2)
+        for axis, delta in enumerate((delta_x * strength, delta_y * strength)):
+            forces[:, axis] += np.bincount(index1 - first, delta, minlength=len(forces))
+            if offset > 0:
+                # a cell is paired with itself in both orders, and with the others in one
+                forces[:, axis] -= np.bincount(index2 - first, delta, minlength=len(forces))
+
+    # every other cell, from its centroid
+    size = grid['grid_size']
+    occupied, centroids = grid['occupied'], grid['centroids']
+    far = (np.abs(cells[:, None] // size - occupied // size) > 1) \
+        | (np.abs(cells[:, None] % size - occupied % size) > 1)
+    delta_x = centroids[0, lo:hi, None] - centroids[0]
+    delta_y = centroids[1, lo:hi, None] - centroids[1]
+    strength = np.where(far, counts[occupied] * k2
+                        / np.maximum(delta_x * delta_x + delta_y * delta_y, _MIN_DISTANCE ** 2), 0)
+    cell_forces = np.stack([centroids[0, lo:hi] * strength.sum(axis=1) - strength @ centroids[0],
+                            centroids[1, lo:hi] * strength.sum(axis=1) - strength @ centroids[1]],
+                           axis=1)
+    end = int(starts[cells[-1] + 1]) - first
+    forces[:end] += np.repeat(cell_forces, counts[cells], axis=0)
+    return first, forces
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Return the concatenation of range(start, start + length) for every start and length.
+
+    >>> _ranges(np.array([5, 0]), np.array([2, 3])).tolist()
+    [5, 6, 0, 1, 2]
+    """
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+# The layouts of this file, by name (see get_layout).
+LAYOUTS = {'force_layout': force_layout}
+
+
+def get_layout(name: str) -> Callable[..., dict]:
+    """Return the layout function called name, which is either one of LAYOUTS or a layout of
+    networkx (such as 'spring_layout' or 'kamada_kawai_layout').
+
+    >>> get_layout('force_layout') is force_layout, get_layout('spring_layout') is nx.spring_layout
+    (True, True)
+    """
+    if name in LAYOUTS:
+        return LAYOUTS[name]
+    return getattr(nx, name)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['hashlib', 'math', 'multiprocessing', 'os', 'networkx', 'numpy',
+                          'array_file'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -14,15 +14,35 @@ please consult with us.
 
 This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
 """
+import os
+import webbrowser
+
 # This file converted the hydrated tweet files to a csv file
-from making_new_csv import get_us_hashtags
+from making_new_csv import get_us_hashtags, get_us_hashtags_parallel, get_us_hashtags_columnar
 
 # This file convert the processed csv data to python graph datatype
 import csv_to_graph
 
+# This file caches each step of building the python graph, so only the steps whose inputs
+# changed are run again
+import build_cache
+
 # This file does the visual
 from rendering import render_tkinter_gui, visualize_graph
 
+# This file scores the partisanship of the hashtags by the politicians who used them
+import partisanship
+
+# This file counts the hashtags of every day, so the graph of any range of days can be built
+import timeline
+
+# These files find the clusters of hashtags used together, and colour the graph by them
+import clustering
+import visualization
+
+# This file lays out the graph once, and saves the layout next to the csv file
+from layout import layout_file_name, load_or_compute_layout
+
 if __name__ == '__main__':
     # How we processed the data (Here are few different file size for you to try)
     # uncomment one of the following versions to test our program that process the raw data
@@ -41,16 +61,68 @@ if __name__ == '__main__':
     # get_us_hashtags('all_tweet_ids.jsonl', 'full_member_info.csv', 'accounts-twitter-data.csv',
     # 'total_filtered_politician.csv')
 
-    # creates a weighted python graph
-    g = csv_to_graph.load_weighted_hashtags_graph('total_filtered_politician.csv', 200, 'abs')
+    # The same filtering, split across every cpu core (gives the same csv file as above)
+    # get_us_hashtags_parallel('all_tweet_ids.jsonl', 'full_member_info.csv',
+    # 'accounts-twitter-data.csv', 'total_filtered_politician.csv')
+
+    # The same filtering, saved to a columnar file instead, which is smaller and faster to load
+    # (csv_to_graph.load_weighted_hashtags_graph reads either file)
+    # get_us_hashtags_columnar('all_tweet_ids.jsonl', 'full_member_info.csv',
+    # 'accounts-twitter-data.csv', 'total_filtered_politician.cols')
+
+    # creates a weighted python graph, reusing what was saved by earlier runs if the csv file
+    # hasn't changed (for example, changing 200 only removes the hashtags again)
+    g = build_cache.build_graph_from_csv('total_filtered_politician.csv', 200, 'abs')
 
     # If you want to use the other weighting for the edges, comment out the line above, and uncomment
     # the line below.
 
-    # g = csv_to_graph.load_weighted_hashtags_graph('total_filtered_politician.csv', 200, 'max')
+    # g = build_cache.build_graph_from_csv('total_filtered_politician.csv', 200, 'max')
+
+    # To go straight from the hydrated tweets to the graph, caching the filtered csv file too, use
+    # g = build_cache.build_graph('all_tweet_ids.jsonl', 'full_member_info.csv',
+    #                             'accounts-twitter-data.csv', 200, 'abs')
+
+    # To build the graph without saving or loading a snapshot, use
+    # g = csv_to_graph.load_weighted_hashtags_graph('total_filtered_politician.csv', 200, 'abs')
+
+    # To build the graph straight from the hydrated tweets, without writing the csv file in
+    # between (pass csv_file_name='total_filtered_politician.csv' to write it as well), use
+    # g = csv_to_graph.load_weighted_hashtags_graph_from_tweets(
+    #     'all_tweet_ids.jsonl', 'full_member_info.csv', 'accounts-twitter-data.csv', 200, 'abs')
+
+    # To score the partisanship of the hashtags by the politicians who used them instead of by
+    # their tweets, so one politician who tweets a hashtag many times can't decide its
+    # partisanship alone ('politicians', 'wilson' and 'tweets' are the other scores), use
+    # partisanship.apply_scores(g, partisanship.count_politician_hashtags(
+    #     'total_filtered_politician.csv'), 'bayesian')
+
+    # To build the graph of only the tweets sent in a range of days (for example, the month
+    # before the 2018 midterms), count the tweets of every day once with
+    # store = timeline.build_timeline('total_filtered_politician.csv', 'timeline_store')
+    # (building it again only adds the tweets that aren't in it yet) and then, after
+    # import datetime, build the graph of any range of days from the counts of its days with
+    # g = store.window_graph(datetime.date(2018, 10, 6), datetime.date(2018, 11, 6), 20, 'abs')
+    # (store.rolling_graphs gives the graph of every week, month, etc. of a range of days)
+
+    # To colour the hashtags by the clusters of hashtags used together (found once, and then
+    # loaded from a file next to the csv file), hiding the edges between clusters, use
+    # clusters = clustering.load_or_compute_clusters(
+    #     g, clustering.clusters_file_name('total_filtered_politician.csv'))
+    # visualization.visualize_graph_clusters(g, clusters, output_file='clusters.png')
+
+    # only the most used hashtags are drawn, so the browser stays responsive (rank_by can also
+    # be 'degree' or 'strength', and min_weight leaves out the weaker edges)
+    nx_graph = g.to_networkx(5000, rank_by='count')
 
-    nx_graph = g.to_networkx()
-    visualize_graph(nx_graph, "All Hashtags and Their Connections")
+    # the layout is only computed the first time (or when the graph changes), and every view of
+    # the gui reuses its positions
+    layout = load_or_compute_layout(nx_graph, layout_file_name('total_filtered_politician.csv'))
+    # the whole graph is saved to an html file (drawn with webgl if it is large), which is then
+    # opened in the browser, and can be opened again without running the program
+    visualize_graph(nx_graph, "All Hashtags and Their Connections", pos=layout.place(nx_graph),
+                    output_file='all_hashtags.html')
+    webbrowser.open('file://' + os.path.abspath('all_hashtags.html'))
 
     # final graphics output
-    render_tkinter_gui(nx_graph)
+    render_tkinter_gui(nx_graph, layout)
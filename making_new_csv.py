@@ -14,8 +14,73 @@ please consult with us.
 
 This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
 """
+import calendar
 import json
 import csv
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+import columnar
+
+# orjson decodes tweets a few times faster than the json module, but it is not required.
+try:
+    import orjson as json_backend
+except ImportError:
+    json_backend = json
+
+# The header for the filtered csv files. The tweet ids are used to skip tweets that were already
+# counted when a new batch of tweets is added, see incremental.py, and the times the tweets were
+# sent to count them by day, see timeline.py.
+FIELDNAMES = ['name', 'partisan_score', 'hashtags', 'tweet_id', 'created_at']
+
+# How many shards each worker process gets in get_us_hashtags_parallel. Using a few shards per
+# worker keeps every core busy even when some parts of the file are denser than others.
+SHARDS_PER_WORKER = 4
+
+# The number of every month in the "created_at" of a tweet, see parse_created_at.
+_MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name != ''}
+
+
+class FilteredTweet(NamedTuple):
+    """A tweet with hashtags that was sent by a us politician.
+
+    Instance Attributes:
+        - name: the name of the politician
+        - party: the partisan score of the politician (democrat: 0, republicans: 1)
+        - hashtags: the hashtags of the tweet, as they were written
+        - tweet_id: the id of the tweet
+        - user_id: the twitter id of the politician
+        - created_at: the time the tweet was sent, in seconds since the epoch (UTC), or -1 if
+            it isn't known
+    """
+    name: str
+    party: int
+    hashtags: set[str]
+    tweet_id: str
+    user_id: str
+    created_at: int
+
+    def csv_row(self) -> dict:
+        """Return the row of this tweet in the csv files made by get_us_hashtags."""
+        return {'name': self.name, 'partisan_score': self.party, 'hashtags': self.hashtags,
+                'tweet_id': self.tweet_id, 'created_at': self.created_at}
+
+    def hashtag_list(self) -> list[str]:
+        """Return the hashtags of this tweet the same way csv_to_graph.string_to_list reads them
+        back from the csv row: in lower case, in the order of the set.
+        """
+        return [hashtag.lower() for hashtag in self.hashtags]
+
+
+# Byte patterns used to look at a tweet before decoding it. A tweet only has to be decoded if it
+# has a hashtag and one of its "id_str" values belongs to a us politician. Quotes inside the
+# text of a tweet are escaped, so these can only match real keys.
+_HASHTAGS_PATTERN = re.compile(rb'"hashtags"\s*:\s*\[\s*(\{?)')
+_ID_STR_PATTERN = re.compile(rb'"id_str"\s*:\s*"(\d+)"')
 
 
 def get_us_hashtags(tweets_file: str, member_info_file: str, senate_file: str,
@@ -26,39 +91,248 @@ def get_us_hashtags(tweets_file: str, member_info_file: str, senate_file: str,
     scores(democrat: 0, republicans: 1).It returns a integer value of how many politicians that is
     in the original tweet file that are not us politicians or their tweets don't have hashtags.
     """
-    # creates a integer to measure the tweets that is not us politician tweets,
-    # but still with hashtags in their tweets.
-    unread = 0
-    # Try to find how many different us politicians send tweets
-    unique_politicians = set()
     us_politicians = get_us_information(member_info_file, senate_file)
     # create up a csv file called with the name in csv_file
     # (there is no need to create this file before hand)
     with open(csv_file_name, mode='w', encoding='utf-8') as csv_file:
-        # the header for the csv files
-        fieldnames = ['name', 'partisan_score', 'hashtags']
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames, lineterminator='\n')
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, lineterminator='\n')
         writer.writeheader()
         # this opens up the tweet file that we hydrated
-        with open(tweets_file, encoding="UTF-8") as json_file:
+        with open(tweets_file, mode='rb') as json_file:
             print("opened")
-            for line in json_file:
-                tweet = json.loads(line)
-                user = tweet['user']
-                user_id = user['id_str']
-                # this makes sure that there won't be any empty hashtags
-                if tweet['entities']['hashtags'] != []:
-                    if user_id in us_politicians:
-                        writer.writerow(
-                            {'name': user['name'],
-                             'partisan_score': us_politicians[user['id_str']],
-                             'hashtags': {x['text'] for x in tweet['entities']['hashtags']}})
-                        unique_politicians.add(user_id)
-                    else:
-                        unread += 1
+            unread, unique_politicians = _filter_tweets(json_file, us_politicians, writer)
             return {'unread': unread, 'unique_politicians': len(unique_politicians)}
 
 
+def get_us_hashtags_parallel(tweets_file: str, member_info_file: str, senate_file: str,
+                             csv_file_name: str, num_workers: int = 0) -> dict[str, int]:
+    """
+    Same as get_us_hashtags, but the tweet file is split into byte ranges that start and end on
+    line boundaries, and every range is filtered by its own worker process. The rows of each
+    range are written to a temporary file, and those files are joined in the order of the ranges,
+    so the csv file (and the returned counts) are the same as the ones from get_us_hashtags.
+
+    Optional arguments:
+        - num_workers: the number of worker processes to use, or every cpu core if it is 0.
+
+    Preconditions:
+        - num_workers >= 0
+    """
+    us_politicians = get_us_information(member_info_file, senate_file)
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    shards = shard_offsets(tweets_file, num_workers * SHARDS_PER_WORKER)
+
+    # the shard files are put next to the output, since they add up to the size of the output
+    output_dir = os.path.dirname(os.path.abspath(csv_file_name))
+    with tempfile.TemporaryDirectory(dir=output_dir) as shard_dir:
+        jobs = [(tweets_file, start, end, us_politicians,
+                 os.path.join(shard_dir, f'shard_{i}.csv'))
+                for i, (start, end) in enumerate(shards)]
+        with multiprocessing.Pool(num_workers) as pool:
+            results = pool.map(_filter_shard, jobs, chunksize=1)
+
+        with open(csv_file_name, mode='w', encoding='utf-8') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, lineterminator='\n')
+            writer.writeheader()
+        # the shard files are already encoded, so they are appended byte for byte
+        with open(csv_file_name, mode='ab') as csv_file:
+            for job in jobs:
+                with open(job[4], mode='rb') as shard_file:
+                    shutil.copyfileobj(shard_file, csv_file)
+
+    unread = sum(result[0] for result in results)
+    unique_politicians = set()
+    for result in results:
+        unique_politicians.update(result[1])
+    return {'unread': unread, 'unique_politicians': len(unique_politicians)}
+
+
+def get_us_hashtags_columnar(tweets_file: str, member_info_file: str, senate_file: str,
+                             columnar_file_name: str) -> dict[str, int]:
+    """
+    Same as get_us_hashtags, but the tweets are saved to a columnar file (see columnar.py)
+    instead of a csv file. load_weighted_hashtags_graph reads either kind of file.
+    """
+    stats = {'unread': 0, 'unique_politicians': set()}
+    columnar.write_columnar(stream_us_tweets(tweets_file, member_info_file, senate_file, stats),
+                            columnar_file_name)
+    return {'unread': stats['unread'], 'unique_politicians': len(stats['unique_politicians'])}
+
+
+def shard_offsets(file_name: str, num_shards: int) -> list[tuple[int, int]]:
+    """Return a list of (start, end) byte offsets that split file_name into at most num_shards
+    ranges of about the same size. Every range starts at the beginning of a line and ends right
+    after a newline (or at the end of the file), so no line is split between two ranges.
+
+    Preconditions:
+        - num_shards > 0
+    """
+    size = os.path.getsize(file_name)
+    boundaries = [0]
+    with open(file_name, mode='rb') as file:
+        for i in range(1, num_shards):
+            position = size * i // num_shards
+            if position <= boundaries[-1]:
+                continue
+            # move forward to the start of the next line
+            file.seek(position - 1)
+            file.readline()
+            position = file.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)
+            if boundaries[i] < boundaries[i + 1]]
+
+
+def _filter_shard(job: tuple[str, int, int, dict[str, int], str]) -> tuple[int, set[str]]:
+    """Filter the lines of the tweet file between the start and end byte offsets of job into a
+    csv file without a header, and return the unread count and the set of politician ids seen.
+
+    job is a tuple of (tweets_file, start, end, us_politicians, shard_file_name).
+    """
+    tweets_file, start, end, us_politicians, shard_file_name = job
+    with open(shard_file_name, mode='w', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, lineterminator='\n')
+        with open(tweets_file, mode='rb') as json_file:
+            json_file.seek(start)
+            return _filter_tweets(_read_lines_until(json_file, end), us_politicians, writer)
+
+
+def _read_lines_until(file: Any, end: int) -> Iterable[bytes]:
+    """Yield the lines of the binary file from its current position up to the byte offset end.
+    """
+    position = file.tell()
+    while position < end:
+        line = file.readline()
+        if line == b'':
+            return
+        position += len(line)
+        yield line
+
+
+def _filter_tweets(lines: Iterable[bytes], us_politicians: dict[str, int],
+                   writer: csv.DictWriter) -> tuple[int, set[str]]:
+    """Write a row to writer for every tweet in lines that was sent by a us politician and has
+    hashtags. Return the number of tweets with hashtags that were not sent by us politicians,
+    and the set of ids of the us politicians that were found.
+    """
+    stats = {'unread': 0, 'unique_politicians': set()}
+    for tweet in iter_us_tweets(lines, us_politicians, stats):
+        writer.writerow(tweet.csv_row())
+    return stats['unread'], stats['unique_politicians']
+
+
+def stream_us_tweets(tweets_file: str, member_info_file: str, senate_file: str,
+                     stats: Optional[dict] = None) -> Iterator[FilteredTweet]:
+    """Yield every tweet in the hydrated tweets_file that was sent by a us politician and has
+    hashtags, without writing them to a csv file. See iter_us_tweets for stats.
+    """
+    us_politicians = get_us_information(member_info_file, senate_file)
+    if stats is None:
+        stats = {'unread': 0, 'unique_politicians': set()}
+    with open(tweets_file, mode='rb') as json_file:
+        yield from iter_us_tweets(json_file, us_politicians, stats)
+
+
+def tee_to_csv(tweets: Iterable[FilteredTweet], csv_file_name: str) -> Iterator[FilteredTweet]:
+    """Yield every tweet in tweets, writing each to the csv file csv_file_name as it passes
+    through. The csv file is the same as the one get_us_hashtags makes from the same tweets.
+    """
+    with open(csv_file_name, mode='w', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, lineterminator='\n')
+        writer.writeheader()
+        for tweet in tweets:
+            writer.writerow(tweet.csv_row())
+            yield tweet
+
+
+def iter_us_tweets(lines: Iterable[bytes], us_politicians: dict[str, int],
+                   stats: dict) -> Iterator[FilteredTweet]:
+    """Yield every tweet in lines (the lines of a hydrated tweet file) that was sent by a us
+    politician and has hashtags.
+
+    stats must be a dict with an int under 'unread' and a set under 'unique_politicians'. As the
+    tweets are read, the number of tweets with hashtags that were not sent by us politicians is
+    added to stats['unread'], and the ids of the us politicians found to
+    stats['unique_politicians'].
+
+    Most tweets are skipped without being decoded, see _HASHTAGS_PATTERN and _ID_STR_PATTERN.
+    """
+    politician_ids = {user_id.encode() for user_id in us_politicians}
+    for line in lines:
+        # one match for every hashtags list in the tweet (including the ones of a retweeted
+        # or quoted tweet), which is b'{' if the list is not empty
+        hashtag_lists = _HASHTAGS_PATTERN.findall(line)
+        if b'{' not in hashtag_lists:
+            # the tweet's own hashtags are empty too
+            continue
+        if len(hashtag_lists) == 1 and politician_ids.isdisjoint(_ID_STR_PATTERN.findall(line)):
+            # the only hashtags list is the tweet's own, and the user is not a us politician
+            stats['unread'] += 1
+            continue
+
+        tweet = _decode_tweet(line)
+        user = tweet['user']
+        user_id = user['id_str']
+        # this makes sure that there won't be any empty hashtags
+        if tweet['entities']['hashtags'] != []:
+            if user_id in us_politicians:
+                stats['unique_politicians'].add(user_id)
+                yield FilteredTweet(user['name'], us_politicians[user_id],
+                                    {x['text'] for x in tweet['entities']['hashtags']},
+                                    tweet['id_str'], user_id,
+                                    parse_created_at(tweet.get('created_at', '')))
+            else:
+                stats['unread'] += 1
+
+
+def _decode_tweet(line: bytes) -> dict:
+    """Return the tweet in the json line line.
+
+    orjson rejects a lone UTF-16 surrogate escape, which the json module accepts, and which
+    tweets whose text was cut in the middle of an emoji have, so such a line is decoded again
+    with the json module. This way every tweet the json module can decode is kept.
+
+    >>> _decode_tweet(b'{"id_str": "1", "text": "cut \\ud83d"}')['text'] == 'cut \\ud83d'
+    True
+    """
+    try:
+        return json_backend.loads(line)
+    except json_backend.JSONDecodeError:
+        return json.loads(line)
+
+
+def parse_created_at(created_at: str) -> int:
+    """Return the time in the "created_at" of a tweet (like 'Wed Oct 10 20:19:24 +0000 2018')
+    in seconds since the epoch, or -1 if created_at isn't in that format.
+
+    This is a few times faster than datetime.strptime, which matters when it is done for every
+    tweet of the data-set.
+
+    >>> parse_created_at('Wed Oct 10 20:19:24 +0000 2018')
+    1539202764
+    >>> parse_created_at('Wed Oct 10 16:19:24 -0400 2018')
+    1539202764
+    >>> parse_created_at('')
+    -1
+    """
+    parts = created_at.split(' ')
+    if len(parts) != 6 or parts[1] not in _MONTHS:
+        return -1
+    _, month, day, clock, offset, year = parts
+    try:
+        hours, minutes, seconds = clock.split(':')
+        offset_minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+        if offset[0] == '-':
+            offset_minutes = -offset_minutes
+        return (calendar.timegm((int(year), _MONTHS[month], int(day), int(hours), int(minutes),
+                                 int(seconds))) - offset_minutes * 60)
+    except ValueError:
+        return -1
+
+
 def get_us_information(all_nations_file: str, senate_file: str) -> dict[str, int]:
     """
     This function will get all us politician's information
@@ -107,7 +381,10 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 100,
         'disable': ['E1136'],
-        'extra-imports': ['csv', 'json'],
-        'allowed-io': ['get_us_information', 'get_us_hashtags', 'get_us_senator'],
+        'extra-imports': ['calendar', 'csv', 'json', 'multiprocessing', 'os', 're', 'shutil',
+                          'tempfile', 'orjson', 'columnar'],
+        'allowed-io': ['get_us_information', 'get_us_hashtags', 'get_us_senator',
+                       'get_us_hashtags_parallel', 'shard_offsets', '_filter_shard',
+                       'stream_us_tweets', 'tee_to_csv'],
         'max-nested-blocks': 4
     })
@@ -0,0 +1,356 @@
+"""CSC111 2021 Hashtag Partisanship, scoring the partisanship of hashtags by politician
+
+The partisanship a WeightedGraph gives a hashtag is the share of the tweets it is in that are
+Republican, so every tweet counts the same, and a single politician who tweets a hashtag
+hundreds of times decides its partisanship alone. This file counts the number of times every
+politician used every hashtag instead, from which the partisanship of the hashtags can be
+scored in a few ways (see SCORES):
+    - 'tweets': the share of the tweets the hashtag is in that are Republican, which is the
+        partisanship of the graph
+    - 'politicians': the share of the politicians who used the hashtag that are Republican,
+        so every politician gets one vote no matter how many times they used it
+    - 'wilson': the bound of the Wilson score interval of 'politicians' that is closest to
+        0.5, or 0.5 if the interval has 0.5 in it, so a hashtag used by only a few
+        politicians is only as partisan as they are sure to make it
+    - 'bayesian': the mean of the Beta posterior of 'politicians', whose prior is worth
+        PRIOR_POLITICIANS politicians with the share of Republicans of all the politicians, so
+        a hashtag used by a few politicians is pulled towards the share of all of them
+Since the counts of every score come from the same (hashtag, politician) counts, the tweets
+are only read once, and every score is worked out from the counts with numpy.
+
+The tweets are counted as a map-reduce on a pool of processes. The filtered file (a csv file
+or a columnar file) is split into shards, each of which is counted by a worker into its own
+(hashtag, politician) keys (see _count_records), and those are merged into one
+HashtagPoliticianCounts (see merge_counts). The hashtags are in lower case, like in the graph,
+and a politician is their name and party, so a politician who changed parties is counted as a
+different politician for each.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import csv
+import multiprocessing
+import os
+from array import array
+from typing import Iterable, Union
+
+import numpy as np
+
+from dataclasses import DEMOCRATIC, REPUBLICAN, WeightedGraph
+from compact_graph import CompactWeightedGraph, sum_by_key
+import columnar
+import csv_to_graph
+import making_new_csv
+
+SCORES = ['tweets', 'politicians', 'wilson', 'bayesian']
+
+# The z-score of the Wilson score interval of the 'wilson' score (a 95% interval).
+WILSON_Z = 1.96
+
+# How many politicians the prior of the 'bayesian' score is worth.
+PRIOR_POLITICIANS = 4
+
+# The hashtag of a (hashtag, politician) key takes up the bits above these (see _count_records).
+_POLITICIAN_BITS = 32
+
+
+class HashtagPoliticianCounts:
+    """The number of times every politician used every hashtag.
+
+    Instance Attributes:
+        - hashtags: every hashtag, in lower case, in the order they were first found
+        - politicians: the name and party of every politician, in the order they were first
+            found
+        - hashtag_ids, politician_ids, counts: the number of times the politician
+            politicians[politician_ids[i]] used the hashtag hashtags[hashtag_ids[i]] is
+            counts[i], for every hashtag a politician used, sorted by hashtag and then by
+            politician
+
+    Representation Invariants:
+        - len(self.hashtag_ids) == len(self.politician_ids) == len(self.counts)
+        - all(count >= 1 for count in self.counts)
+
+    >>> counts = count_records([('Nancy Pelosi', 0, ['daca', 'dreamers']),
+    ...                         ('Nancy Pelosi', 0, ['daca']), ('Ted Cruz', 1, ['daca'])])
+    >>> counts.party_counts()[0].tolist(), counts.party_counts()[1].tolist()
+    ([2, 1], [1, 0])
+    >>> counts.scores('tweets').tolist(), counts.scores('politicians').tolist()
+    ([0.3333333333333333, 0.0], [0.5, 0.0])
+    """
+    hashtags: list[str]
+    politicians: list[tuple[str, int]]
+    hashtag_ids: np.ndarray
+    politician_ids: np.ndarray
+    counts: np.ndarray
+
+    def __init__(self, hashtags: list[str], politicians: list[tuple[str, int]],
+                 hashtag_ids: np.ndarray, politician_ids: np.ndarray,
+                 counts: np.ndarray) -> None:
+        self.hashtags = hashtags
+        self.politicians = politicians
+        self.hashtag_ids = hashtag_ids
+        self.politician_ids = politician_ids
+        self.counts = counts
+
+    def party_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the number of times every hashtag was used by Democrats, and by Republicans,
+        which are the count_dem and count_rep of the graph.
+        """
+        parties = self._parties()[self.politician_ids]
+        return (self._sum_by_hashtag(self.counts * (parties == DEMOCRATIC)),
+                self._sum_by_hashtag(self.counts * (parties == REPUBLICAN)))
+
+    def politician_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the number of Democrats who used every hashtag, and the number of
+        Republicans.
+        """
+        parties = self._parties()[self.politician_ids]
+        return (self._sum_by_hashtag((parties == DEMOCRATIC).astype(np.int64)),
+                self._sum_by_hashtag((parties == REPUBLICAN).astype(np.int64)))
+
+    def scores(self, score: str) -> np.ndarray:
+        """Return the partisanship of every hashtag, between 0 (Democratic) and 1
+        (Republican), scored in the given way (see the module docstring).
+
+        Preconditions:
+            - score in SCORES
+
+        >>> counts = count_records([(f'Republican {i}', 1, ['maga']) for i in range(20)]
+        ...                        + [('Nancy Pelosi', 0, ['maga', 'daca'])])
+        >>> [round(partisanship, 3) for partisanship in counts.scores('wilson').tolist()]
+        [0.773, 0.5]
+        >>> [round(partisanship, 3) for partisanship in counts.scores('bayesian').tolist()]
+        [0.952, 0.762]
+        """
+        if score == 'tweets':
+            count_dem, count_rep = self.party_counts()
+            return count_rep / (count_dem + count_rep)
+
+        politicians_dem, politicians_rep = self.politician_counts()
+        total = politicians_dem + politicians_rep
+        if score == 'politicians':
+            return politicians_rep / total
+        elif score == 'wilson':
+            share = politicians_rep / total
+            spread = WILSON_Z ** 2 / total
+            centre = (share + spread / 2) / (1 + spread)
+            half_width = WILSON_Z * np.sqrt(share * (1 - share) / total
+                                            + spread / (4 * total)) / (1 + spread)
+            return np.where(centre - half_width > 0.5, centre - half_width,
+                            np.where(centre + half_width < 0.5, centre + half_width, 0.5))
+        else:
+            prior = float(np.mean(self._parties() == REPUBLICAN)) if self.politicians else 0.5
+            return (politicians_rep + PRIOR_POLITICIANS * prior) / (total + PRIOR_POLITICIANS)
+
+    def score_dict(self, score: str) -> dict[str, float]:
+        """Return the partisanship of every hashtag scored in the given way, by hashtag.
+
+        Preconditions:
+            - score in SCORES
+        """
+        return dict(zip(self.hashtags, self.scores(score).tolist()))
+
+    def _parties(self) -> np.ndarray:
+        """Return the party of every politician."""
+        return np.fromiter((party for _, party in self.politicians), dtype=np.uint8,
+                           count=len(self.politicians))
+
+    def _sum_by_hashtag(self, values: np.ndarray) -> np.ndarray:
+        """Return the sum of values over the politicians of every hashtag."""
+        return np.bincount(self.hashtag_ids, weights=values,
+                           minlength=len(self.hashtags)).astype(values.dtype)
+
+
+def count_politician_hashtags(tweets_file: str, num_workers: int = 0) -> HashtagPoliticianCounts:
+    """Return the number of times every politician used every hashtag in tweets_file, a csv
+    file made by get_us_hashtags or a columnar file (see columnar.py).
+
+    tweets_file is split into shards, which are counted by num_workers worker processes and
+    then merged. A csv file is split into byte ranges (see making_new_csv.shard_offsets), and
+    a columnar file into ranges of tweets.
+
+    Optional arguments:
+        - num_workers: the number of worker processes to use, or every cpu core if it is 0.
+            The shards are counted in this process if it is 1.
+
+    Preconditions:
+        - num_workers >= 0
+    """
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    num_shards = num_workers * making_new_csv.SHARDS_PER_WORKER
+    if columnar.is_columnar_file(tweets_file):
+        num_tweets = len(columnar.load_columnar(tweets_file)['parties'])
+        jobs = [('columnar', tweets_file, num_tweets * i // num_shards,
+                 num_tweets * (i + 1) // num_shards) for i in range(num_shards)]
+    else:
+        jobs = [('csv', tweets_file, start, end)
+                for start, end in making_new_csv.shard_offsets(tweets_file, num_shards)]
+
+    if num_workers == 1:
+        return merge_counts([_count_shard(job) for job in jobs])
+    with multiprocessing.Pool(num_workers) as pool:
+        # the shards are merged in order, so the hashtags are in the order they are in the file
+        return merge_counts(pool.map(_count_shard, jobs, chunksize=1))
+
+
+def count_records(records: Iterable[tuple[str, int, list[str]]]) -> HashtagPoliticianCounts:
+    """Return the number of times every politician used every hashtag in records, which are
+    tuples of the name of the politician who sent a tweet, their party and the list of
+    hashtags of the tweet, in lower case.
+    """
+    return merge_counts([_count_records(records)])
+
+
+def merge_counts(shards: list[tuple[list[str], list[tuple[str, int]], np.ndarray, np.ndarray]]) \
+        -> HashtagPoliticianCounts:
+    """Return the counts of every shard in shards (see _count_records) added together.
+
+    Every shard has its own ids for the hashtags and politicians, so they are given the ids of
+    the merged counts first, in the order of the shards, and then the counts of the same keys
+    are added up.
+
+    >>> first = _count_records([('Nancy Pelosi', 0, ['daca', 'dreamers'])])
+    >>> second = _count_records([('Ted Cruz', 1, ['maga']), ('Nancy Pelosi', 0, ['daca'])])
+    >>> counts = merge_counts([first, second])
+    >>> counts.hashtags, counts.politicians
+    (['daca', 'dreamers', 'maga'], [('Nancy Pelosi', 0), ('Ted Cruz', 1)])
+    >>> counts.hashtag_ids.tolist(), counts.politician_ids.tolist(), counts.counts.tolist()
+    ([0, 1, 2], [0, 0, 1], [2, 1, 1])
+    """
+    hashtag_ids = {}
+    politician_ids = {}
+    all_keys = []
+    all_counts = []
+    for hashtags, politicians, keys, counts in shards:
+        new_hashtag_ids = np.array([hashtag_ids.setdefault(hashtag, len(hashtag_ids))
+                                    for hashtag in hashtags], dtype=np.int64)
+        new_politician_ids = np.array([politician_ids.setdefault(politician,
+                                                                 len(politician_ids))
+                                       for politician in politicians], dtype=np.int64)
+        all_keys.append((new_hashtag_ids[keys >> _POLITICIAN_BITS] << _POLITICIAN_BITS)
+                        | new_politician_ids[keys & ((1 << _POLITICIAN_BITS) - 1)])
+        all_counts.append(counts)
+
+    keys, counts = sum_by_key(np.concatenate(all_keys or [np.zeros(0, dtype=np.int64)]),
+                              np.concatenate(all_counts or [np.zeros(0, dtype=np.int64)]))
+    return HashtagPoliticianCounts(list(hashtag_ids), list(politician_ids),
+                                   (keys >> _POLITICIAN_BITS).astype(np.int32),
+                                   (keys & ((1 << _POLITICIAN_BITS) - 1)).astype(np.int32),
+                                   counts.astype(np.int64))
+
+
+def apply_scores(graph: Union[WeightedGraph, CompactWeightedGraph],
+                 counts: HashtagPoliticianCounts, score: str = 'bayesian') -> None:
+    """Set the partisanship of every hashtag of graph to its partisanship in counts, scored in
+    the given way. See WeightedGraph.set_weight_hashtags.
+
+    Preconditions:
+        - score in SCORES
+
+    >>> g = WeightedGraph()
+    >>> for _ in range(5):
+    ...     g.add_vertex('maga', 1)
+    >>> g.add_vertex('maga', 0)
+    >>> counts = count_records([('Ted Cruz', 1, ['maga'])] * 5 + [('Nancy Pelosi', 0, ['maga'])])
+    >>> apply_scores(g, counts, 'politicians')
+    >>> g.get_weight_hashtag('maga')
+    0.5
+    """
+    graph.set_weight_hashtags(counts.score_dict(score))
+
+
+def _count_shard(job: tuple[str, str, int, int]) \
+        -> tuple[list[str], list[tuple[str, int]], np.ndarray, np.ndarray]:
+    """Count the shard of job (see _count_records), which is a tuple of the kind of file
+    ('csv' or 'columnar'), the name of the file, and the start and end of the shard: byte
+    offsets for a csv file, and tweet numbers for a columnar file.
+    """
+    kind, tweets_file, start, end = job
+    if kind == 'columnar':
+        return _count_columnar_shard(tweets_file, start, end)
+
+    with open(tweets_file, mode='rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).decode('utf-8').splitlines()
+    if start == 0:
+        # the header of the csv file
+        lines = lines[1:]
+    return _count_records((row[0], int(row[1]), csv_to_graph.string_to_list(row[2]))
+                          for row in csv.reader(lines))
+
+
+def _count_columnar_shard(tweets_file: str, start: int, end: int) \
+        -> tuple[list[str], list[tuple[str, int]], np.ndarray, np.ndarray]:
+    """Count the tweets of the columnar file tweets_file from tweet number start up to (but not
+    including) tweet number end, like _count_records, without looking at them one at a time.
+    """
+    columns = columnar.load_columnar(tweets_file)
+    # hashtags that are only different in case are the same once they are lower-cased, like in
+    # cooccurrence.encode_columnar
+    hashtag_ids = {}
+    lowered = np.array([hashtag_ids.setdefault(hashtag.lower(), len(hashtag_ids))
+                        for hashtag in columnar.decode_strings(columns['hashtags'])],
+                       dtype=np.int64)
+    offsets = columns['tweet_offsets']
+    uses = np.diff(offsets[start:end + 1])
+    hashtags = lowered[columns['tweet_hashtags'][offsets[start]:offsets[end]]]
+    # a politician is the index of the politician in the file and the party of the tweet
+    politicians = (np.repeat(columns['politicians'][start:end].astype(np.int64), uses) * 2
+                   + np.repeat(columns['parties'][start:end], uses))
+    # the ids of the file are in the order the hashtags and politicians first appear, so the
+    # ones in this shard keep that order
+    shard_hashtags, hashtags = np.unique(hashtags, return_inverse=True)
+    shard_politicians, politicians = np.unique(politicians, return_inverse=True)
+    keys, counts = sum_by_key((hashtags.astype(np.int64) << _POLITICIAN_BITS) | politicians,
+                              np.ones(len(hashtags), dtype=np.int64))
+
+    all_hashtags = list(hashtag_ids)
+    names = columnar.decode_strings(columns['politician_names'])
+    return ([all_hashtags[hashtag] for hashtag in shard_hashtags.tolist()],
+            [(names[politician // 2], politician % 2)
+             for politician in shard_politicians.tolist()], keys, counts)
+
+
+def _count_records(records: Iterable[tuple[str, int, list[str]]]) \
+        -> tuple[list[str], list[tuple[str, int]], np.ndarray, np.ndarray]:
+    """Return the counts of the tweets in records (see count_records) as a shard: the list of
+    its hashtags and the list of its politicians (which are indexed by their ids in the shard),
+    and the sorted (hashtag, politician) keys with the count of each. The key of a hashtag and
+    a politician is (hashtag id << _POLITICIAN_BITS) | politician id.
+    """
+    hashtag_ids = {}
+    politician_ids = {}
+    keys = array('q')
+    for name, party, hashtags in records:
+        politician = politician_ids.setdefault((name, party), len(politician_ids))
+        for hashtag in hashtags:
+            keys.append((hashtag_ids.setdefault(hashtag, len(hashtag_ids)) << _POLITICIAN_BITS)
+                        | politician)
+    keys = np.frombuffer(keys, dtype=np.int64)
+    keys, counts = sum_by_key(keys, np.ones(len(keys), dtype=np.int64))
+    return list(hashtag_ids), list(politician_ids), keys, counts
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['csv', 'multiprocessing', 'os', 'array', 'numpy', 'dataclasses',
+                          'compact_graph', 'columnar', 'csv_to_graph', 'making_new_csv'],
+        'allowed-io': ['_count_shard'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -11,15 +11,26 @@ St. George campus. All forms of distribution of this code, whether as given or w
 are expressly prohibited.
 This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
 """
-from typing import List, Tuple
+import heapq
+import multiprocessing
+import os
+import queue
+import tempfile
+from typing import List, Optional
 import tkinter as tk
 from tkinter import ttk
+import webbrowser
 
 import networkx as nx
 
-from plotly.graph_objs import Scatter, Figure, Layout
+import numpy as np
+from plotly.graph_objs import Scatter, Scattergl, Figure, Layout
 import plotly.graph_objs as go
 
+from layout import GraphLayout, get_layout
+from search import HashtagIndex
+import sampling
+
 PARTISANSHIP_RANGE = [0, 1]
 DEFAULT_NODES_TO_RENDER = 20
 MIN_LINE_WIDTH = 3.0
@@ -28,20 +39,57 @@ MAX_LINE_WIDTH = 20
 MAX_NODE_SIZE = 100
 MIN_NODE_SIZE = 20
 
+# Graphs with more edges than this are drawn with webgl.
+LARGE_GRAPH_EDGES = 5000
+
+# The most edges visualize_graph draws by default.
+MAX_EDGES = 50000
+
+# The partisanship scores where one partisanship category ends and the next begins (see
+# partisanship_score_to_str), and a score in each category.
+_PARTISANSHIP_BOUNDS = [0.2, 0.4, 0.6, 0.8]
+_CATEGORY_SCORES = [0.0, 0.2, 0.4, 0.6, 0.8]
+
+# The number of processes the views of the gui are drawn in.
+RENDER_WORKERS = 2
+
+# How often (in milliseconds) the gui checks whether a view has been drawn.
+POLL_INTERVAL = 100
+
+# The number of matching hashtags the node selector of the gui shows.
+TYPE_AHEAD_RESULTS = 30
+
 
 def draw_node_and_neighbours(graph: nx.Graph,
                              selected_node_name: str,
-                             num_nodes=DEFAULT_NODES_TO_RENDER) -> None:
-    """ Draw node selected_node_name and it's neighbours. The graph will be rendered in a new tab
-    in the user's browser
+                             num_nodes=DEFAULT_NODES_TO_RENDER,
+                             layout: Optional[GraphLayout] = None,
+                             output_file: str = '') -> None:
+    """ Draw node selected_node_name and it's neighbours with the strongest edges to it. The graph
+    will be rendered in a new tab in the user's browser
 
     Preconditions:
         - num_nodes > 0
 
     Optional arguments:
         - num_nodes: The maximum number of nodes that can appear in the graph
+        - layout: the layout of graph whose positions are reused (see layout.py), instead of
+          laying out the drawn nodes from scratch
+        - output_file: the html file the graph is saved to, see visualize_graph
     """
 
+    new_graph, title, node_size, line_width = _neighbours_view(graph, selected_node_name,
+                                                               num_nodes)
+    visualize_graph(new_graph, title, min_node_size=node_size, line_width=line_width,
+                    pos=layout.place(new_graph) if layout is not None else None,
+                    output_file=output_file)
+
+
+def _neighbours_view(graph: nx.Graph, selected_node_name: str,
+                     num_nodes: int) -> tuple[nx.Graph, str, float, float]:
+    """Return the graph draw_node_and_neighbours draws, its title, and the size of its nodes
+    and the width of its edges.
+    """
     total_nodes = len(list(graph.nodes))
     if num_nodes > total_nodes:
         num_nodes = total_nodes
@@ -49,31 +97,62 @@ def draw_node_and_neighbours(graph: nx.Graph,
     line_width = max(MAX_LINE_WIDTH / num_nodes, MIN_LINE_WIDTH)
     nodes = [(selected_node_name, graph.nodes[selected_node_name])]
     edges = []
-    nodes_rendered = 1
-    for neighbour in graph.neighbors(selected_node_name):
-        if num_nodes <= nodes_rendered:
-            break
+    for neighbour in strongest_neighbours(graph, selected_node_name, num_nodes - 1):
         nodes.append((neighbour, graph.nodes[neighbour]))
         edge_weight = graph[selected_node_name][neighbour]['weight']
         edges.append((selected_node_name, neighbour, {'weight': edge_weight}))
-        nodes_rendered += 1
 
     new_graph = nx.Graph()
     new_graph.add_nodes_from(nodes)
     new_graph.add_edges_from(edges)
-    visualize_graph(new_graph, f"Displaying immediate neighbours of #{selected_node_name}",
-                    min_node_size=node_size, line_width=line_width)
+    return (new_graph, f"Displaying immediate neighbours of #{selected_node_name}", node_size,
+            line_width)
+
+
+def strongest_neighbours(graph: nx.Graph, node_name: str, k: int) -> List[str]:
+    """ Return the (at most) k neighbours of node_name with the heaviest edges to it, heaviest
+    first.
+
+    This uses graph.graph['ranked_neighbours'] if the graph has it (see
+    WeightedGraph.to_networkx), which takes O(k) time, and sorts the neighbours otherwise.
+    """
+    ranked_neighbours = graph.graph.get('ranked_neighbours', {})
+    if node_name in ranked_neighbours:
+        return ranked_neighbours[node_name][:k]
+    else:
+        return heapq.nlargest(k, (neighbour for neighbour in graph.neighbors(node_name)
+                                  if neighbour != node_name),
+                              key=lambda neighbour: graph[node_name][neighbour]['weight'])
 
 
 def draw_limited_num_of_nodes(graph: nx.Graph,
-                              num_nodes=DEFAULT_NODES_TO_RENDER) -> None:
+                              num_nodes=DEFAULT_NODES_TO_RENDER,
+                              layout: Optional[GraphLayout] = None,
+                              output_file: str = '', strategy: str = 'bfs',
+                              seed: Optional[int] = None) -> None:
     """ Draw num_nodes nodes from the Object "graph", prioritizing connected nodes when
     possible. Will open the graph in your default browser
 
     Preconditions:
         - num_nodes > 0
+        - strategy in sampling.STRATEGIES
     Optional arguments:
         - num_nodes: The maximum number of nodes that can appear in the graph
+        - layout: the layout of graph whose positions are reused, see draw_node_and_neighbours
+        - output_file: the html file the graph is saved to, see visualize_graph
+        - strategy: how the nodes are picked, see sampling.py
+        - seed: the seed of the random choices, so the same nodes are drawn for the same seed
+    """
+    new_graph, title, node_size, line_width = _random_view(graph, num_nodes, strategy, seed)
+    visualize_graph(new_graph, title, min_node_size=node_size, line_width=line_width,
+                    pos=layout.place(new_graph) if layout is not None else None,
+                    output_file=output_file)
+
+
+def _random_view(graph: nx.Graph, num_nodes: int, strategy: str,
+                 seed: Optional[int]) -> tuple[nx.Graph, str, float, float]:
+    """Return the graph draw_limited_num_of_nodes draws, its title, and the size of its nodes
+    and the width of its edges.
     """
     total_nodes = len(list(graph.nodes))
     if num_nodes > total_nodes:
@@ -83,55 +162,12 @@ def draw_limited_num_of_nodes(graph: nx.Graph,
 
     original_num_nodes = num_nodes
 
-    nodes = []
-    edges = []
-    unvisited_nodes = set(graph.nodes)
-    while num_nodes > 0:
-        start_node = unvisited_nodes.pop()
-        nodes_clump, edges_clump = _get_nodes_and_edges(graph, start_node, num_nodes, set())
-        num_nodes -= len(nodes_clump)
-        for node in nodes_clump:
-            nodes.append((node, graph.nodes[node]))
-            if node != start_node:
-                unvisited_nodes.remove(node)
-        for edge in edges_clump:
-            edge_weight = graph[edge[0]][edge[1]]['weight']
-            edges.append((edge[0], edge[1], {'weight': edge_weight}))
+    sampled_nodes, sampled_edges = sampling.sample_subgraph(graph, num_nodes, strategy, seed)
     new_graph = nx.Graph()
-    new_graph.add_nodes_from(nodes)
-    new_graph.add_edges_from(edges)
-
-    visualize_graph(new_graph, title=f"Displaying {original_num_nodes} random nodes",
-                    min_node_size=node_size, line_width=line_width)
-
-
-def _get_nodes_and_edges(graph: nx.Graph, current_node_name: str, num_nodes: int,
-                         visited: set[str]) -> \
-        Tuple[List[str], List[Tuple[str, str]]]:
-    """ returns tuple of list of num_nodes nodes from the graph, and a list of the edges between them.
-    Note: The first element of the tuple contains the nodes, and the second element of the tuple
-    is the list of edges
-
-    The visited parameter represents nodes that were already visited by this recursive algorithm
-
-
-    """
-    if num_nodes == 0:
-        return ([], [])
-    else:
-        nodes = [current_node_name]
-        edges = []
-        visited.add(current_node_name)
-        for neighbour in graph.neighbors(current_node_name):
-            if neighbour not in visited:
-                neighbour_nodes, neighbours_edges = _get_nodes_and_edges(graph, neighbour,
-                                                                         num_nodes - 1, visited)
-                if len(neighbour_nodes) > 0:
-                    edges.append((current_node_name, neighbour))
-                num_nodes -= len(neighbour_nodes)
-                nodes.extend(neighbour_nodes)
-                edges.extend(neighbours_edges)
-        return (nodes, edges)
+    new_graph.add_nodes_from((node, graph.nodes[node]) for node in sampled_nodes)
+    new_graph.add_edges_from((node1, node2, {'weight': graph[node1][node2]['weight']})
+                             for node1, node2 in sampled_edges)
+    return new_graph, f"Displaying {original_num_nodes} random nodes", node_size, line_width
 
 
 def partisanship_score_to_str(partisanship_score: int) -> str:
@@ -171,11 +207,191 @@ def get_colour(partisanship_score: int) -> str:
         return 'red'
 
 
-def render_tkinter_gui(graph: nx.Graph) -> None:
+class BackgroundRenderer:
+    """Draws the views of the gui to html files in a pool of worker processes, so the gui keeps
+    responding while a view is being drawn.
+
+    Every request is numbered, and only the drawing of the newest request is kept: a request
+    supersedes (and cancels) every request before it. The number of the newest request is
+    shared with the workers, which check it between picking the nodes of a view, placing them
+    and writing the html file, and stop drawing a superseded request there, so it doesn't hold
+    its worker for long. At most num_workers requests are drawn at once, and a request made
+    while every worker is busy waits in a single pending slot, which a newer request replaces,
+    so clicking many times in a row only draws the last click.
+
+    The drawings are sent back through a queue, and are taken out of it by poll, which the gui
+    calls from its own thread.
+
+    Instance Attributes:
+        - generation: the number of the newest request
+        - num_workers: the number of worker processes
+    """
+    generation: int
+    num_workers: int
+
+    # Private Instance Attributes:
+    #     - _pool: the worker processes
+    #     - _newest: the generation, shared with the worker processes
+    #     - _results: the generation, html file (or None if it wasn't written) and error (or
+    #       None) of every finished drawing
+    #     - _running: the generations of the requests being drawn
+    #     - _pending: the request waiting for a worker, if there is one
+    #     - _directory: the temporary directory the html files are saved in
+    _pool: multiprocessing.Pool
+    _newest: multiprocessing.Value
+    _results: queue.Queue
+    _running: set[int]
+    _pending: Optional[tuple]
+    _directory: tempfile.TemporaryDirectory
+
+    def __init__(self, graph: nx.Graph, layout: Optional[GraphLayout] = None,
+                 num_workers: int = RENDER_WORKERS) -> None:
+        """Start num_workers worker processes, each with its own copy of graph and layout.
+
+        Preconditions:
+            - num_workers >= 1
+        """
+        self.generation = 0
+        self.num_workers = num_workers
+        self._newest = multiprocessing.Value('q', 0)
+        self._pool = multiprocessing.Pool(num_workers, initializer=_init_render_worker,
+                                          initargs=(graph, layout, self._newest))
+        self._results = queue.Queue()
+        self._running = set()
+        self._pending = None
+        self._directory = tempfile.TemporaryDirectory(prefix='hashtag_views_')
+
+    def request(self, view: str, *args: object) -> None:
+        """Draw the given view of the graph: 'neighbours' (with the hashtag and the number of
+        nodes, see draw_node_and_neighbours) or 'random' (with the number of nodes and the
+        sampling strategy, see draw_limited_num_of_nodes), superseding every earlier request.
+        """
+        self.generation += 1
+        self._newest.value = self.generation
+        output_file = os.path.join(self._directory.name, f'view_{self.generation}.html')
+        self._pending = (self.generation, view, args, output_file)
+        self._start_pending()
+
+    def cancel(self) -> None:
+        """Cancel every request made so far. A drawing that has already started stops at the
+        next point its worker checks for a newer request.
+        """
+        self.generation += 1
+        self._newest.value = self.generation
+        self._pending = None
+
+    def busy(self) -> bool:
+        """Return whether the newest request hasn't been drawn yet."""
+        return self._pending is not None or self.generation in self._running
+
+    def poll(self) -> tuple[Optional[str], Optional[str]]:
+        """Return the html file of the newest request if it was drawn since the last call (and
+        None otherwise), and the error message if drawing it failed (and None otherwise).
+        """
+        newest, message = None, None
+        while not self._results.empty():
+            generation, output_file, error = self._results.get()
+            self._running.discard(generation)
+            if generation == self.generation:
+                newest = output_file
+                message = None if error is None else str(error)
+            elif output_file is not None and os.path.exists(output_file):
+                # a superseded drawing
+                os.remove(output_file)
+        self._start_pending()
+        return newest, message
+
+    def close(self) -> None:
+        """Stop the worker processes and delete the html files."""
+        self._pool.terminate()
+        self._pool.join()
+        self._directory.cleanup()
+
+    def _start_pending(self) -> None:
+        """Send the pending request to a worker, if there is one and a worker is free."""
+        if self._pending is None or len(self._running) >= self.num_workers:
+            return
+        generation, view, args, output_file = self._pending
+        self._pending = None
+        self._running.add(generation)
+        self._pool.apply_async(_render_view, (generation, view, args, output_file),
+                               callback=lambda drawn: self._results.put(
+                                   (generation, output_file if drawn else None, None)),
+                               error_callback=lambda error: self._results.put(
+                                   (generation, None, error)))
+
+
+# The graph and layout of a worker process of BackgroundRenderer, and the generation of its
+# newest request.
+_worker_graph = None
+_worker_layout = None
+_worker_newest = None
+
+
+def _init_render_worker(graph: nx.Graph, layout: Optional[GraphLayout],
+                        newest: multiprocessing.Value) -> None:
+    """Keep graph, layout and the shared generation newest in this worker process of a
+    BackgroundRenderer.
+    """
+    global _worker_graph, _worker_layout, _worker_newest
+    _worker_graph, _worker_layout, _worker_newest = graph, layout, newest
+
+
+def _render_view(generation: int, view: str, args: tuple, output_file: str) -> bool:
+    """Draw the given view (see BackgroundRenderer.request) of the graph of this worker process
+    to the html file output_file, for the request numbered generation. Return whether it was
+    drawn, which it isn't if a newer request is made before its nodes are picked, placed, or
+    written to output_file.
+    """
+    if _worker_newest.value != generation:
+        return False
+    if view == 'neighbours':
+        node_name, num_nodes = args
+        new_graph, title, node_size, line_width = _neighbours_view(_worker_graph, node_name,
+                                                                   num_nodes)
+    else:
+        num_nodes, strategy = args
+        new_graph, title, node_size, line_width = _random_view(_worker_graph, num_nodes,
+                                                               strategy, None)
+
+    if _worker_newest.value != generation:
+        return False
+    if _worker_layout is not None:
+        pos = _worker_layout.place(new_graph)
+    else:
+        pos = get_layout('force_layout')(new_graph)
+
+    if _worker_newest.value != generation:
+        return False
+    visualize_graph(new_graph, title, min_node_size=node_size, line_width=line_width, pos=pos,
+                    output_file=output_file)
+    return True
+
+
+def render_tkinter_gui(graph: nx.Graph, layout: Optional[GraphLayout] = None,
+                       num_workers: int = RENDER_WORKERS) -> None:
     """ Renders a UI to interact with the graph. Note that all graphs launched will show in a
     new tab in the user's default browser
 
+    The views are drawn in the background (see BackgroundRenderer), so the window keeps
+    responding while they are: a progress bar runs until the newest view opens, a newer click
+    supersedes the view being drawn, and the cancel button stops waiting for it.
+
+    The node selector is a type-ahead box: it lists the most used hashtags that start with (or
+    contain) what has been typed into it (see search.HashtagIndex), rather than every hashtag.
+
+    Optional arguments:
+        - layout: the layout of graph (see layout.load_or_compute_layout), whose positions are
+          reused by every view, so no view is laid out from scratch
+        - num_workers: the number of processes the views are drawn in
+
+    Preconditions:
+        - num_workers >= 1
     """
+    # the worker processes are started before the window, so they don't inherit it
+    renderer = BackgroundRenderer(graph, layout, num_workers)
+    index = HashtagIndex(graph.nodes, (count for _, count in graph.nodes.data('count')))
+
     window = tk.Tk()
     window.title("Hashtag Partisanship")
 
@@ -183,6 +399,7 @@ def render_tkinter_gui(graph: nx.Graph) -> None:
     frame_user_interaction.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
 
     selected_node_name = tk.StringVar()
+    strategy = tk.StringVar(value=sampling.STRATEGIES[0])
     num_nodes_as_str = tk.StringVar(value=str(DEFAULT_NODES_TO_RENDER))
 
     node_selector = ttk.Combobox(master=frame_user_interaction,
@@ -205,9 +422,13 @@ def render_tkinter_gui(graph: nx.Graph) -> None:
             num_nodes = 1
             num_nodes_as_str.set(1)
 
-        draw_limited_num_of_nodes(graph, num_nodes)
+        renderer.request('random', num_nodes, strategy.get())
+        progress_bar.start()
 
     def on_combobox_selected(event: tk.Event) -> None:
+        if selected_node_name.get() not in graph.nodes:
+            # what was typed isn't a hashtag of the graph
+            return
         selected_node_partisanship = partisanship_score_to_str(
             graph.nodes[selected_node_name.get()]['bias'])
         partisanship_label[
@@ -219,15 +440,44 @@ def render_tkinter_gui(graph: nx.Graph) -> None:
         else:
             num_nodes_as_str.set(1)
             num_nodes = 1
-        draw_node_and_neighbours(graph, selected_node_name.get(), num_nodes)
+        renderer.request('neighbours', selected_node_name.get(), num_nodes)
+        progress_bar.start()
+
+    def on_key_released(event: tk.Event) -> None:
+        if event.keysym not in ('Up', 'Down', 'Return', 'Escape'):
+            node_selector['values'] = index.search(selected_node_name.get(), TYPE_AHEAD_RESULTS)
+
+    def on_cancel_btn_pressed() -> None:
+        renderer.cancel()
+        progress_bar.stop()
+
+    def poll_renderer() -> None:
+        output_file, error = renderer.poll()
+        if error is not None:
+            partisanship_label['text'] = f'The view could not be drawn: {error}'
+        if output_file is not None:
+            webbrowser.open('file://' + output_file)
+        if not renderer.busy():
+            progress_bar.stop()
+        window.after(POLL_INTERVAL, poll_renderer)
 
     # add button for show random nodes
     show_random_nodes_btn = tk.Button(master=frame_user_interaction, text="View random vertices",
                                       command=on_random_nodes_btn_pressed)
-
-    node_selector['values'] = list(graph.nodes)
-    node_selector.state(['readonly'])
+    # how the random vertices are picked
+    strategy_label = ttk.Label(master=frame_user_interaction, text='Pick random vertices by:')
+    strategy_selector = ttk.Combobox(master=frame_user_interaction, textvariable=strategy,
+                                     values=sampling.STRATEGIES)
+    strategy_selector.state(['readonly'])
+    # the progress bar runs while a view is being drawn
+    progress_bar = ttk.Progressbar(master=frame_user_interaction, mode='indeterminate')
+    cancel_btn = tk.Button(master=frame_user_interaction, text="Cancel",
+                           command=on_cancel_btn_pressed)
+
+    node_selector['values'] = index.search('', TYPE_AHEAD_RESULTS)
     node_selector.bind("<<ComboboxSelected>>", on_combobox_selected)
+    node_selector.bind("<Return>", on_combobox_selected)
+    node_selector.bind("<KeyRelease>", on_key_released)
 
     node_selector.grid(row=0, column=1)
     node_selector_label.grid(row=0, column=0)
@@ -235,16 +485,39 @@ def render_tkinter_gui(graph: nx.Graph) -> None:
     num_nodes_entry.grid(row=1, column=1)
     show_random_nodes_btn.grid(row=2, column=0)
     partisanship_label.grid(row=2, column=1)
+    strategy_label.grid(row=3, column=0)
+    strategy_selector.grid(row=3, column=1)
+    progress_bar.grid(row=4, column=0)
+    cancel_btn.grid(row=4, column=1)
 
-    window.mainloop()
+    window.after(POLL_INTERVAL, poll_renderer)
+    try:
+        window.mainloop()
+    finally:
+        renderer.close()
 
 
 def visualize_graph(graph_nx: nx.Graph, title: str, min_node_size=5.0,
-                    line_width=MIN_LINE_WIDTH) -> None:
+                    line_width=MIN_LINE_WIDTH, pos: Optional[dict] = None,
+                    layout_name: str = 'force_layout', max_edges: int = MAX_EDGES,
+                    output_file: str = '') -> None:
     """Use plotly and networkx to visualize all edges and nodes from nodes_list. Nodes will be
     rendered with a size of at least min_node_size, and an edge width of at least line_width. the
     graph will have the variable title as it's title
 
+    The nodes are drawn at the positions in pos (see layout.GraphLayout.place) if it is given,
+    and laid out with the layout called layout_name otherwise (see layout.get_layout), which can
+    be the name of any networkx layout too.
+
+    The nodes and edges are given to plotly as numpy arrays, which plotly saves in binary
+    instead of as lists of numbers. Graphs with more than LARGE_GRAPH_EDGES edges are drawn with
+    webgl (Scattergl) instead of svg, and only their max_edges heaviest edges are drawn.
+
+    Optional arguments:
+        - max_edges: the most edges that are drawn
+        - output_file: the html file the graph is saved to (rather than displaying it in your
+          web browser), which can be opened later or served as it is
+
     NOTE: This is a modified version of visualize_graph from a3_visualization.py
 
     """
@@ -252,48 +525,47 @@ def visualize_graph(graph_nx: nx.Graph, title: str, min_node_size=5.0,
     LINE_COLOUR = 'rgb(210,210,210)'
     VERTEX_BORDER_COLOUR = 'rgb(50, 50, 50)'
 
-    pos = nx.spring_layout(graph_nx)
-
-    x_values = [pos[k][0] for k in graph_nx.nodes]
-    y_values = [pos[k][1] for k in graph_nx.nodes]
+    if pos is None:
+        pos = get_layout(layout_name)(graph_nx)
 
     node_names = list(graph_nx.nodes)
-
-    node_counts = [graph_nx.nodes[node_name]['count'] for node_name in node_names]
-    max_count = max(node_counts)
-    sizes = [min_node_size + (graph_nx.nodes[node_name]['count'] / max_count) * 30 for node_name
-             in node_names]
-    node_colours = [get_colour(graph_nx.nodes[node_name]['bias']) for node_name in graph_nx.nodes]
-
-    x_edges = []
-    y_edges = []
-    for edge in graph_nx.edges:
-        x_edges += [pos[edge[0]][0], pos[edge[1]][0], None]
-        y_edges += [pos[edge[0]][1], pos[edge[1]][1], None]
-
-    labels = []
-    for node_name in graph_nx.nodes:
-        partisanship = partisanship_score_to_str(graph_nx.nodes[node_name]['bias'])
-        count = graph_nx.nodes[node_name]['count']
-        labels.append(f'#{node_name} occurs {count} times and is a {partisanship} hashtag')
-    edges_scatter = Scatter(x=x_edges,
-                            y=y_edges,
+    index = {node_name: i for i, node_name in enumerate(node_names)}
+    positions = np.array([pos[node_name] for node_name in node_names],
+                         dtype=np.float32).reshape((-1, 2))
+    counts = np.array([count for _, count in graph_nx.nodes.data('count')], dtype=np.int64)
+    biases = np.array([bias for _, bias in graph_nx.nodes.data('bias')], dtype=np.float64)
+
+    large = graph_nx.number_of_edges() > LARGE_GRAPH_EDGES
+    scatter = Scattergl if large else Scatter
+
+    sizes = min_node_size + counts / max(counts.max(initial=0), 1) * 30
+    # every partisanship category is described (and coloured) once, and given to every node in
+    # it by its index
+    categories = np.digitize(biases, _PARTISANSHIP_BOUNDS)
+    partisanships = np.array([partisanship_score_to_str(score) for score in _CATEGORY_SCORES])
+    colours = np.array([get_colour(score) for score in _CATEGORY_SCORES])
+
+    edges_scatter = scatter(x=_edge_coordinates(graph_nx, index, positions[:, 0], max_edges),
+                            y=_edge_coordinates(graph_nx, index, positions[:, 1], max_edges),
                             mode='lines',
                             name='edges',
                             line=dict(color=LINE_COLOUR, width=line_width),
                             hoverinfo='none',
                             )
-    edges_traces = Scatter(x=x_values,
-                           y=y_values,
+    edges_traces = scatter(x=positions[:, 0],
+                           y=positions[:, 1],
                            mode='markers',
                            name='nodes',
                            marker=dict(symbol='circle-dot',
                                        size=sizes,
-                                       color=node_colours,
+                                       color=colours[categories],
                                        line=dict(color=VERTEX_BORDER_COLOUR, width=0.5)
                                        ),
-                           text=labels,
-                           hovertemplate='%{text}',
+                           text=node_names,
+                           customdata=np.stack([counts.astype(str), partisanships[categories]],
+                                               axis=-1),
+                           hovertemplate='#%{text} occurs %{customdata[0]} times and is a '
+                                         '%{customdata[1]} hashtag',
                            hoverlabel={'namelength': 0}
                            )
 
@@ -304,7 +576,35 @@ def visualize_graph(graph_nx: nx.Graph, title: str, min_node_size=5.0,
     fig.update_layout({'showlegend': False})
     fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
     fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
-    fig.show()
+    if output_file == '':
+        fig.show()
+    else:
+        fig.write_html(output_file)
+
+
+def _edge_coordinates(graph_nx: nx.Graph, index: dict[str, int], coordinates: np.ndarray,
+                      max_edges: int) -> np.ndarray:
+    """Return the coordinates of the ends of the (at most) max_edges heaviest edges of graph_nx,
+    each edge followed by a nan so plotly draws the edges as separate lines. coordinates holds
+    the x (or y) coordinate of every node, in the order of index.
+
+    >>> graph_nx = nx.Graph([('daca', 'dreamers', {'weight': 0.5}),
+    ...                      ('daca', 'maga', {'weight': 0.1})])
+    >>> index = {'daca': 0, 'dreamers': 1, 'maga': 2}
+    >>> _edge_coordinates(graph_nx, index, np.array([0.0, 1.0, 2.0]), 1).tolist()
+    [0.0, 1.0, nan]
+    """
+    edges = np.array([(index[node1], index[node2]) for node1, node2 in graph_nx.edges],
+                     dtype=np.int64).reshape((-1, 2))
+    if len(edges) > max_edges:
+        weights = np.array([weight for _, _, weight in graph_nx.edges.data('weight', default=0)],
+                           dtype=np.float64)
+        edges = edges[np.argpartition(-weights, max_edges - 1)[:max_edges]]
+
+    ends = np.full((len(edges), 3), np.nan, dtype=coordinates.dtype)
+    ends[:, 0] = coordinates[edges[:, 0]]
+    ends[:, 1] = coordinates[edges[:, 1]]
+    return ends.ravel()
 
 
 if __name__ == '__main__':
@@ -312,7 +612,9 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'max-line-length': 100,
-        'extra-imports': ['python_ta.contracts', 'networkx', 'plotly.graph_obs', 'tkinter'],
+        'extra-imports': ['python_ta.contracts', 'heapq', 'multiprocessing', 'os', 'queue',
+                          'tempfile', 'webbrowser', 'networkx', 'numpy', 'plotly.graph_obs',
+                          'tkinter', 'layout', 'search', 'sampling'],
         'disable': ['R1705', 'C0200'],
     })
 
@@ -0,0 +1,246 @@
+"""CSC111 2021 Hashtag Partisanship, sampling parts of the graph
+
+This file picks a limited number of the nodes of a networkx graph of hashtags (and the edges
+they were reached by) to draw, without recursion, and stops as soon as it has enough of them.
+
+There are three ways, or strategies, of picking the nodes:
+    - 'bfs': the ego-net of a random node, which is its neighbours, then their neighbours, and
+        so on, the heaviest edges first (see bfs_sample)
+    - 'walk': the nodes a random walk starting at a random node passes through, where every
+        step takes an edge with a probability proportional to its weight, and goes back to the
+        start now and then (see random_walk_sample)
+    - 'top': the ego-nets of the most used hashtags (see top_count_seeds)
+When a part of the graph runs out of nodes before enough are picked, the strategy starts again
+from another node. Every strategy takes a seed, so the same nodes can be picked again.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import heapq
+import itertools
+import random
+from collections import deque
+from typing import Iterator, Optional
+
+import networkx as nx
+import numpy as np
+
+STRATEGIES = ['bfs', 'walk', 'top']
+
+# The chance that a random walk goes back to its start at each step.
+RESTART_PROBABILITY = 0.15
+
+# The most steps in a row a random walk takes without picking a new node, so a walk stuck in a
+# part of the graph with few nodes ends.
+MAX_STALLED_STEPS = 50
+
+
+def sample_subgraph(graph_nx: nx.Graph, budget: int, strategy: str = 'bfs',
+                    seed: Optional[int] = None) -> tuple[list[str], list[tuple[str, str]]]:
+    """Return (at most) budget nodes of graph_nx picked with the given strategy (see the module
+    docstring), and the edges they were reached by.
+
+    Optional arguments:
+        - strategy: one of STRATEGIES
+        - seed: the seed of the random choices, so the same nodes are picked for the same seed
+
+    Preconditions:
+        - budget >= 0
+        - strategy in STRATEGIES
+
+    >>> graph_nx = nx.Graph([('daca', 'dreamers', {'weight': 0.5}),
+    ...                      ('daca', 'maga', {'weight': 0.1}), ('kag', 'maga', {'weight': 0.3})])
+    >>> for node, count in [('daca', 5), ('dreamers', 3), ('maga', 20), ('kag', 8)]:
+    ...     graph_nx.nodes[node]['count'] = count
+    >>> sample_subgraph(graph_nx, 3, 'top')
+    (['maga', 'kag', 'daca'], [('maga', 'kag'), ('maga', 'daca')])
+    >>> nodes, edges = sample_subgraph(graph_nx, 10, 'walk', seed=1)
+    >>> sorted(nodes), len(edges)
+    (['daca', 'dreamers', 'kag', 'maga'], 3)
+    """
+    budget = min(budget, graph_nx.number_of_nodes())
+    rng = random.Random(seed)
+    if strategy == 'top':
+        starts = iter(top_count_seeds(graph_nx, budget))
+    else:
+        starts = _random_nodes(graph_nx, rng)
+
+    nodes, edges = [], []
+    visited = set()
+    while len(nodes) < budget:
+        start = next(start for start in starts if start not in visited)
+        if strategy == 'walk':
+            clump, clump_edges = random_walk_sample(graph_nx, start, budget - len(nodes), rng,
+                                                    visited)
+        else:
+            clump, clump_edges = bfs_sample(graph_nx, start, budget - len(nodes), visited)
+        nodes.extend(clump)
+        edges.extend(clump_edges)
+    return nodes, edges
+
+
+def bfs_sample(graph_nx: nx.Graph, start: str, budget: int,
+               visited: Optional[set] = None) -> tuple[list[str], list[tuple[str, str]]]:
+    """Return the (at most) budget nodes of the ego-net of start, in the order a breadth-first
+    search reaches them, and the edges they were reached by. The neighbours of every node are
+    visited from the heaviest edge to the lightest.
+
+    visited holds the nodes that can't be picked, and the picked nodes are added to it. No node
+    is looked at after budget nodes are picked.
+
+    Preconditions:
+        - start in graph_nx and start not in visited
+        - budget >= 1
+
+    >>> graph_nx = nx.Graph([('daca', 'dreamers', {'weight': 0.1}),
+    ...                      ('daca', 'maga', {'weight': 0.5}), ('kag', 'maga', {'weight': 0.3})])
+    >>> bfs_sample(graph_nx, 'daca', 3)
+    (['daca', 'maga', 'dreamers'], [('daca', 'maga'), ('daca', 'dreamers')])
+    """
+    if visited is None:
+        visited = set()
+    nodes, edges = [start], []
+    visited.add(start)
+    queue = deque([start])
+    while queue and len(nodes) < budget:
+        node = queue.popleft()
+        for neighbour in _heaviest_first(graph_nx, node, budget - len(nodes) + len(visited)):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                nodes.append(neighbour)
+                edges.append((node, neighbour))
+                queue.append(neighbour)
+                if len(nodes) == budget:
+                    break
+    return nodes, edges
+
+
+def random_walk_sample(graph_nx: nx.Graph, start: str, budget: int, rng: random.Random,
+                       visited: Optional[set] = None,
+                       restart: float = RESTART_PROBABILITY) \
+        -> tuple[list[str], list[tuple[str, str]]]:
+    """Return the (at most) budget nodes a weighted random walk from start passes through, in
+    the order it first reaches them, and the edges it first reached them by.
+
+    Every step goes back to start with probability restart, and otherwise takes an edge of the
+    current node with a probability proportional to its weight. The walk ends once it has
+    picked budget nodes, or after MAX_STALLED_STEPS steps in a row that don't pick a new node,
+    so it takes O(budget * MAX_STALLED_STEPS) steps at most.
+
+    visited holds the nodes that can't be picked, and the picked nodes are added to it (the walk
+    can still pass through them).
+
+    Preconditions:
+        - start in graph_nx and start not in visited
+        - budget >= 1
+        - 0 <= restart < 1
+    """
+    if visited is None:
+        visited = set()
+    nodes, edges = [start], []
+    visited.add(start)
+    # the neighbours and cumulative weights of every node the walk has been at, so the walk
+    # takes O(log(degree)) time for every step at a node it has been at before
+    steps = {}
+    node = start
+    stalled_steps = 0
+    while len(nodes) < budget and stalled_steps < MAX_STALLED_STEPS:
+        stalled_steps += 1
+        if node not in steps:
+            steps[node] = _cumulative_weights(graph_nx, node)
+        neighbours, cumulative_weights = steps[node]
+        if not neighbours or rng.random() < restart:
+            node = start
+            continue
+        neighbour = rng.choices(neighbours, cum_weights=cumulative_weights)[0]
+        if neighbour not in visited:
+            visited.add(neighbour)
+            nodes.append(neighbour)
+            edges.append((node, neighbour))
+            stalled_steps = 0
+        node = neighbour
+    return nodes, edges
+
+
+def top_count_seeds(graph_nx: nx.Graph, k: int) -> list[str]:
+    """Return the (at most) k nodes of graph_nx with the largest count, largest first.
+
+    >>> graph_nx = nx.Graph()
+    >>> graph_nx.add_nodes_from([('daca', {'count': 5}), ('maga', {'count': 20}),
+    ...                          ('kag', {'count': 8})])
+    >>> top_count_seeds(graph_nx, 2)
+    ['maga', 'kag']
+    """
+    nodes = list(graph_nx.nodes)
+    counts = np.fromiter((count for _, count in graph_nx.nodes.data('count', default=0)),
+                         dtype=np.float64, count=len(nodes))
+    if k < len(nodes):
+        top = np.argpartition(-counts, k)[:k]
+    else:
+        top = np.arange(len(nodes))
+    # the ties are broken by the order of the nodes
+    top = top[np.lexsort((top, -counts[top]))]
+    return [nodes[i] for i in top.tolist()]
+
+
+def _heaviest_first(graph_nx: nx.Graph, node: str, k: int) -> list[str]:
+    """Return the neighbours of node (but not node itself), from the heaviest edge to the
+    lightest: all of them if graph_nx.graph['ranked_neighbours'] has them (see
+    WeightedGraph.to_networkx), and only the k heaviest otherwise.
+    """
+    ranked_neighbours = graph_nx.graph.get('ranked_neighbours', {})
+    if node in ranked_neighbours:
+        return ranked_neighbours[node]
+    adjacent = graph_nx[node]
+    neighbours = [neighbour for neighbour in adjacent if neighbour != node]
+    if len(neighbours) <= k:
+        return sorted(neighbours, key=lambda neighbour: adjacent[neighbour].get('weight', 0),
+                      reverse=True)
+    return heapq.nlargest(k, neighbours,
+                          key=lambda neighbour: adjacent[neighbour].get('weight', 0))
+
+
+def _cumulative_weights(graph_nx: nx.Graph, node: str) -> tuple[list[str], list[float]]:
+    """Return the neighbours of node (but not node itself), and the cumulative weights of the
+    edges to them. Every edge weighs 1 if they all weigh 0.
+    """
+    neighbours, weights = [], []
+    for neighbour, attributes in graph_nx[node].items():
+        if neighbour != node:
+            neighbours.append(neighbour)
+            weights.append(attributes.get('weight', 1))
+    if sum(weights) <= 0:
+        weights = [1] * len(neighbours)
+    return neighbours, list(itertools.accumulate(weights))
+
+
+def _random_nodes(graph_nx: nx.Graph, rng: random.Random) -> Iterator[str]:
+    """Yield random nodes of graph_nx (possibly more than once), and then every node once, so
+    the caller can skip the nodes it has already picked without this shuffling every node.
+    """
+    nodes = list(graph_nx.nodes)
+    for _ in range(len(nodes)):
+        yield nodes[rng.randrange(len(nodes))]
+    yield from nodes
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['heapq', 'itertools', 'random', 'collections', 'networkx', 'numpy'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
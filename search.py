@@ -0,0 +1,274 @@
+"""CSC111 2021 Hashtag Partisanship, searching for hashtags
+
+This file finds the hashtags of the graph whose names start with or contain what the user has
+typed, most used first, quickly enough to be done on every keystroke of the gui.
+
+The hashtags are numbered from the most used to the least used, so the matches with the
+smallest numbers are the most used ones. The prefix matches are found by bisecting the sorted
+names, which gives a range of numbers whose top matches are picked with np.partition. The
+hashtags containing what was typed are found with an index of the n-grams (runs of n
+characters) of the names:
+    - for every 1-gram and 2-gram, the top_n most used hashtags that contain it are stored, so
+        queries of one or two characters are a single lookup
+    - for every 3-gram, the numbers of every hashtag that contains it are stored, in order.
+        A longer query walks the list of its rarest 3-gram from the most used hashtag on,
+        skipping the hashtags missing one of its other 3-grams, and stops as soon as it has
+        found enough matches.
+
+The n-grams are built with numpy, from the names encoded as one array of code points.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import bisect
+from typing import Iterable
+
+import numpy as np
+
+# The number of matches search returns by default, and the number stored for every 1-gram and
+# 2-gram.
+DEFAULT_TOP_N = 50
+
+# The code point that separates the names in the encoded names.
+_SEPARATOR = ord('\n')
+
+# The number of bits of a code point in the key of an n-gram.
+_CODE_BITS = 21
+
+# The number of hashtags of the list of a 3-gram that are checked at once, at first.
+_FIRST_CHUNK = 256
+
+
+class HashtagIndex:
+    """An index of the names of the hashtags of a graph, for finding the hashtags that start
+    with or contain some text, most used first.
+
+    Instance Attributes:
+        - names: the name of every hashtag, from the most used to the least used
+        - counts: the count of every hashtag, in the same order as names
+        - top_n: the most matches a search returns
+
+    Representation Invariants:
+        - len(self.names) == len(self.counts)
+        - all(self.counts[i] >= self.counts[i + 1] for i in range(len(self.counts) - 1))
+
+    >>> index = HashtagIndex(['daca', 'maga', 'dreamers', 'kag'], [5, 20, 3, 8])
+    >>> index.search('')
+    ['maga', 'kag', 'daca', 'dreamers']
+    >>> index.search('ag')
+    ['maga', 'kag']
+    >>> index.search('#D')
+    ['daca', 'dreamers']
+    >>> index.search('ream')
+    ['dreamers']
+    >>> index.search('a', 2)
+    ['maga', 'kag']
+    """
+    names: list[str]
+    counts: np.ndarray
+    top_n: int
+
+    # Private Instance Attributes:
+    #     - _lowered: every name in lower case, in the same order as names
+    #     - _sorted: every name in lower case, in alphabetical order
+    #     - _sorted_ids: the number of every name of _sorted
+    #     - _grams: the keys, offsets and hashtag numbers of the n-grams of every length n (the
+    #         hashtags containing the n-gram keys[i] are ids[offsets[i]:offsets[i + 1]])
+    _lowered: list[str]
+    _sorted: list[str]
+    _sorted_ids: np.ndarray
+    _grams: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+    def __init__(self, names: Iterable[str], counts: Iterable[int],
+                 top_n: int = DEFAULT_TOP_N) -> None:
+        """Index the hashtags with the given names and counts. Hashtags with the same count
+        are kept in the order they are given in.
+
+        Preconditions:
+            - all('\\n' not in name for name in names)
+            - top_n >= 1
+        """
+        names = list(names)
+        counts = np.fromiter(counts, dtype=np.int64, count=len(names))
+        order = np.argsort(-counts, kind='stable')
+        self.names = [names[i] for i in order.tolist()]
+        self.counts = counts[order]
+        self.top_n = top_n
+
+        self._lowered = [name.lower() for name in self.names]
+        sorted_ids = sorted(range(len(self._lowered)), key=self._lowered.__getitem__)
+        self._sorted = [self._lowered[i] for i in sorted_ids]
+        self._sorted_ids = np.array(sorted_ids, dtype=np.int32)
+
+        codes, owners = _encode_names(self._lowered)
+        self._grams = {1: _gram_lists(codes, owners, 1, top_n),
+                       2: _gram_lists(codes, owners, 2, top_n),
+                       3: _gram_lists(codes, owners, 3, 0)}
+
+    def search(self, query: str, limit: int = 0) -> list[str]:
+        """Return the (at most) limit names that start with query, most used first, followed
+        by the names that contain query elsewhere, most used first. Case and a leading # are
+        ignored. If query is empty, the most used names are returned.
+
+        Optional arguments:
+            - limit: the most names returned, or top_n if it is 0
+
+        Preconditions:
+            - 0 <= limit <= self.top_n
+        """
+        limit = limit or self.top_n
+        query = query.lower().lstrip('#')
+        if query == '':
+            return self.names[:limit]
+
+        ids = self._prefix_ids(query, limit).tolist()
+        if len(ids) < limit:
+            found = set(ids)
+            for i in self._substring_ids(query, limit + len(ids)):
+                if i not in found:
+                    ids.append(i)
+                    if len(ids) == limit:
+                        break
+        return [self.names[i] for i in ids]
+
+    def _prefix_ids(self, query: str, limit: int) -> np.ndarray:
+        """Return the numbers of the (at most) limit most used names that start with query, in
+        order.
+        """
+        low = bisect.bisect_left(self._sorted, query)
+        high = bisect.bisect_left(self._sorted, query + chr(0x10FFFF), low)
+        ids = self._sorted_ids[low:high]
+        if len(ids) > limit:
+            ids = np.partition(ids, limit - 1)[:limit]
+        return np.sort(ids)
+
+    def _substring_ids(self, query: str, limit: int) -> Iterable[int]:
+        """Yield the numbers of the (at most) limit most used names that contain query, in
+        order. Only the top_n most used are yielded if query has less than three characters.
+        """
+        if len(query) <= 2:
+            yield from self._gram_ids(len(query), _gram_key(query))[:limit].tolist()
+            return
+
+        lists = sorted((self._gram_ids(3, _gram_key(query[i:i + 3]))
+                        for i in range(len(query) - 2)), key=len)
+        rarest = lists[0]
+        found = 0
+        start, size = 0, _FIRST_CHUNK
+        while start < len(rarest) and found < limit:
+            # the hashtags of this chunk that have every 3-gram of query
+            chunk = rarest[start:start + size]
+            for ids in lists[1:]:
+                positions = np.minimum(np.searchsorted(ids, chunk), len(ids) - 1)
+                chunk = chunk[ids[positions] == chunk]
+            for i in chunk.tolist():
+                if query in self._lowered[i]:
+                    yield i
+                    found += 1
+                    if found == limit:
+                        return
+            start, size = start + size, size * 2
+
+    def _gram_ids(self, n: int, key: int) -> np.ndarray:
+        """Return the numbers of the hashtags stored for the n-gram with the given key, in
+        order.
+        """
+        keys, offsets, ids = self._grams[n]
+        key = np.uint64(key)
+        i = np.searchsorted(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return ids[:0]
+        return ids[offsets[i]:offsets[i + 1]]
+
+
+def _encode_names(names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the code points of names, each followed by a newline, and the number of the name
+    every code point belongs to.
+
+    >>> codes, owners = _encode_names(['ab', 'c'])
+    >>> codes.tolist(), owners.tolist()
+    ([97, 98, 10, 99, 10], [0, 0, 0, 1, 1])
+    """
+    codes = np.frombuffer(''.join(name + '\n' for name in names).encode('utf-32-le'),
+                          dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(name) + 1 for name in names), dtype=np.int64, count=len(names))
+    return codes, np.repeat(np.arange(len(names), dtype=np.int32), lengths)
+
+
+def _gram_key(gram: str) -> int:
+    """Return the key of the n-gram gram, which has its code points as digits.
+
+    >>> _gram_key('ab') == (ord('a') << _CODE_BITS) | ord('b')
+    True
+    """
+    key = 0
+    for character in gram:
+        key = (key << _CODE_BITS) | ord(character)
+    return key
+
+
+def _gram_lists(codes: np.ndarray, owners: np.ndarray, n: int,
+                limit: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the sorted keys of the n-grams of the encoded names (see _encode_names), with the
+    offsets and numbers of the names containing each of them (see HashtagIndex._grams), in order.
+    Only the first limit names of every n-gram are kept, unless limit is 0.
+
+    >>> keys, offsets, ids = _gram_lists(*_encode_names(['ab', 'b', 'bab']), 1, 0)
+    >>> [chr(key) for key in keys.tolist()], offsets.tolist(), ids.tolist()
+    (['a', 'b'], [0, 2, 5], [0, 2, 0, 1, 2])
+    """
+    size = max(len(codes) - n + 1, 0)
+    keys = np.zeros(size, dtype=np.uint64)
+    valid = np.ones(size, dtype=bool)
+    for i in range(n):
+        keys = (keys << np.uint64(_CODE_BITS)) | codes[i:i + size]
+        valid &= codes[i:i + size] != _SEPARATOR
+    keys = keys[valid]
+    ids = owners[:size][valid]
+
+    order = np.lexsort((ids, keys))
+    keys, ids = keys[order], ids[order]
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+    keys, ids = keys[distinct], ids[distinct]
+
+    starts = _group_starts(keys)
+    if limit > 0:
+        # the place of every name in the list of its n-gram
+        places = np.arange(len(keys)) - np.repeat(starts, np.diff(np.append(starts, len(keys))))
+        keys, ids = keys[places < limit], ids[places < limit]
+        starts = _group_starts(keys)
+    return keys[starts], np.append(starts, len(keys)), ids
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    """Return the index of the first of every run of equal keys in the sorted array keys.
+
+    >>> _group_starts(np.array([3, 3, 5, 7, 7], dtype=np.uint64)).tolist()
+    [0, 2, 3]
+    """
+    is_start = np.ones(len(keys), dtype=bool)
+    is_start[1:] = keys[1:] != keys[:-1]
+    return np.flatnonzero(is_start)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['bisect', 'numpy'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,204 @@
+"""CSC111 2021 Hashtag Partisanship, counting the common hashtags in bounded memory
+
+This file builds the graph of the hashtags above min_count without keeping a count for every
+hashtag of the data-set, most of which are only used a few times and are removed by
+remove_min_count anyway.
+
+The tweets are read twice. The first pass keeps a Misra-Gries summary of the hashtags, which
+uses a fixed number of counters k. Every hashtag that is in more than N / (k + 1) of the N
+hashtag uses of the data-set is guaranteed to still have a counter at the end. These
+hashtags are the candidates. The second pass counts the candidates, and the pairs of them, exactly
+(see cooccurrence.py), a chunk of tweets at a time, so only the candidates are ever counted.
+
+So every hashtag above min_count is in the graph, with exactly the same counts and edges as in
+the graph load_weighted_hashtags_graph builds, as long as min_count >= N / (k + 1). Otherwise, a
+hashtag at or below N / (k + 1) may be left out (along with its edges), but every hashtag and
+edge that is in the graph still has its exact counts. heavy_hitters_graph returns these
+guarantees along with the graph.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+from array import array
+from typing import Callable, Iterable, Union
+
+import numpy as np
+
+from dataclasses import DEMOCRATIC, WeightedGraph
+from compact_graph import CompactWeightedGraph
+import cooccurrence
+
+# A rough number of bytes each counter of a Misra-Gries summary takes up: an entry of a dict
+# with a short str key and an int value.
+BYTES_PER_COUNTER = 160
+
+# How many tweets are counted at once in the second pass.
+CHUNK_SIZE = 1 << 18
+
+
+class MisraGries:
+    """A summary of the most common items of a stream, which uses at most num_counters counters
+    no matter how many different items the stream has.
+
+    Every item that is in more than total / (num_counters + 1) of the stream is in counters,
+    and the counter of every item is at most that much below the number of times it is in the
+    stream.
+
+    Instance Attributes:
+        - num_counters: the most counters this summary keeps
+        - counters: the counter of every item that has one
+        - total: the number of items added to the stream so far
+
+    Representation Invariants:
+        - self.num_counters >= 1
+        - len(self.counters) <= self.num_counters
+        - all(count >= 1 for count in self.counters.values())
+
+    >>> summary = MisraGries(2)
+    >>> for item in ['maga', 'daca', 'maga', 'kag', 'maga', 'dreamers']:
+    ...     summary.add(item)
+    >>> summary.total, summary.max_error()
+    (6, 2)
+    >>> 'maga' in summary.counters
+    True
+    """
+    num_counters: int
+    counters: dict
+    total: int
+
+    def __init__(self, num_counters: int) -> None:
+        """Initialize an empty summary with at most num_counters counters.
+
+        Preconditions:
+            - num_counters >= 1
+        """
+        self.num_counters = num_counters
+        self.counters = {}
+        self.total = 0
+
+    def add(self, item: object) -> None:
+        """Add one use of item to the stream."""
+        self.total += 1
+        counters = self.counters
+        if item in counters:
+            counters[item] += 1
+        elif len(counters) < self.num_counters:
+            counters[item] = 1
+        else:
+            # every counter (and the uncounted use of item) goes down by one, which happens at
+            # most total / (num_counters + 1) times
+            self.counters = {key: count - 1 for key, count in counters.items() if count > 1}
+
+    def max_error(self) -> int:
+        """Return the most the counter of an item can be below the number of times it is in
+        the stream. Every item in the stream more than this many times has a counter.
+        """
+        return self.total // (self.num_counters + 1)
+
+
+def heavy_hitters_graph(read_records: Callable[[], Iterable[tuple[int, list[str]]]],
+                        min_count: int, edge_format: str, memory_budget: int,
+                        compact: bool = False) \
+        -> tuple[Union[WeightedGraph, CompactWeightedGraph], dict]:
+    """Return the graph of the records returned by read_records (tuples of the party of a tweet
+    and its list of hashtags), without the hashtags at or below min_count, and its guarantees.
+
+    read_records is called twice, and must return the same records both times. memory_budget is
+    the number of bytes the Misra-Gries summary of the first pass can take up.
+
+    The guarantees are a dict with:
+        - 'hashtag_uses': the number of hashtag uses in the records
+        - 'counters': the number of counters of the summary
+        - 'max_missed_count': every hashtag used more times than this is in the graph
+        - 'exact': whether the graph is the same as the one load_weighted_hashtags_graph builds,
+            which it is when min_count >= max_missed_count
+    The counts of every hashtag and edge in the graph are always exact.
+
+    See csv_to_graph.load_weighted_hashtags_graph for compact.
+
+    Preconditions:
+        - min_count >= 0
+        - edge_format == 'abs' or 'max'
+        - memory_budget >= BYTES_PER_COUNTER
+    """
+    summary = MisraGries(memory_budget // BYTES_PER_COUNTER)
+    for _, lst in read_records():
+        for hashtag in lst:
+            summary.add(hashtag)
+    # a hashtag's counter is at most its count, so a counter above min_count means the
+    # hashtag might be above min_count, and one above it plus max_error means it must be
+    candidates = {hashtag for hashtag, count in summary.counters.items()
+                  if count + summary.max_error() > min_count}
+
+    ids = {}
+    counts = np.zeros(len(candidates), dtype=np.int64)
+    counts_dem = np.zeros(len(candidates), dtype=np.int64)
+    pairs = cooccurrence.pair_matrix(len(candidates), np.zeros(1, dtype=np.int64),
+                                     np.zeros(0, dtype=np.int32))
+    for offsets, hashtag_ids, parties in _encode_chunks(read_records(), candidates, ids):
+        entry_parties = np.repeat(parties, np.diff(offsets))
+        counts += np.bincount(hashtag_ids, minlength=len(candidates))
+        counts_dem += np.bincount(hashtag_ids[entry_parties == DEMOCRATIC],
+                                  minlength=len(candidates))
+        pairs += cooccurrence.pair_matrix(len(candidates), offsets, hashtag_ids)
+
+    # the ids were given in the order the hashtags first appear, like encode_records does, so
+    # the graph has its hashtags in the same order as the exact graph
+    keep = counts[:len(ids)] > min_count
+    pairs = pairs.tocsr()[:len(ids), :len(ids)][keep][:, keep].tocsr()
+    arrays = cooccurrence.graph_arrays([item for item, kept in zip(ids, keep.tolist()) if kept],
+                                       counts[:len(ids)][keep], counts_dem[:len(ids)][keep],
+                                       pairs)
+
+    guarantees = {'hashtag_uses': summary.total, 'counters': summary.num_counters,
+                  'max_missed_count': summary.max_error(),
+                  'exact': min_count >= summary.max_error()}
+    return cooccurrence.build_graph(arrays, edge_format, compact), guarantees
+
+
+def _encode_chunks(records: Iterable[tuple[int, list[str]]], candidates: set[str],
+                   ids: dict[str, int]) -> Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield the records in chunks of CHUNK_SIZE tweets, encoded like encode_records does, but
+    with only the hashtags in candidates. ids maps each candidate to its id, and is added to as
+    new candidates are found, so it is shared by every chunk.
+    """
+    offsets = array('q', [0])
+    hashtag_ids = array('i')
+    parties = array('B')
+    for party, lst in records:
+        for hashtag in lst:
+            if hashtag in candidates:
+                hashtag_ids.append(ids.setdefault(hashtag, len(ids)))
+        offsets.append(len(hashtag_ids))
+        parties.append(party)
+        if len(parties) == CHUNK_SIZE:
+            yield (np.frombuffer(offsets, dtype=np.int64),
+                   np.frombuffer(hashtag_ids, dtype=np.int32),
+                   np.frombuffer(parties, dtype=np.uint8))
+            offsets = array('q', [0])
+            hashtag_ids = array('i')
+            parties = array('B')
+    yield (np.frombuffer(offsets, dtype=np.int64), np.frombuffer(hashtag_ids, dtype=np.int32),
+           np.frombuffer(parties, dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['array', 'numpy', 'dataclasses', 'compact_graph', 'cooccurrence'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
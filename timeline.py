@@ -0,0 +1,465 @@
+"""CSC111 2021 Hashtag Partisanship, counting the hashtags of every day
+
+This file keeps the counts of the hashtags and the pairs of hashtags of the tweets of every day
+in a directory (a timeline store), so that the graph of the tweets sent between any two days
+can be built without reading the tweets again. This shows how the partisanship of a hashtag
+changes over time, for example over an election cycle.
+
+The tweets of every day (in UTC) are counted into a bucket, which is an array file (see
+array_file.py) holding:
+    - hashtags: the ids of the hashtags used that day, sorted
+    - counts, counts_dem: the number of times each of them was used that day, and the number of
+        times it was used by a Democrat
+    - pair_keys: the keys (id1 << 32) | id2 of every pair of hashtags with id1 <= id2 that
+        appeared in a tweet together that day, sorted
+    - pair_counts: (X^T X)[id1, id2] for each pair, where X is the incidence matrix of the
+        tweets of that day (see cooccurrence.py)
+    - tweet_ids: the ids of the tweets counted in the bucket, sorted, so that a tweet that is
+        added again (for example by building the store from the same file twice) is only
+        counted once
+The ids are the same for every bucket: they are the numbers of the hashtags in the store's
+dictionary of hashtags, in the order the hashtags were first added. All of these are sums over
+the tweets, so the counts of a window of days are the sums of the buckets of its days, which
+only takes time for the buckets in the window (see TimelineStore.window_counts). The counts
+of a window are then turned into a graph the same way cooccurrence.count_cooccurrences does.
+
+Copyright and Usage Information
+===============================
+This file is provided solely for the personal and private use of the professors and TAs
+in CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for this CSC111 project,
+please consult with us.
+
+This file is Copyright (c) 2021 Jiajin Wu, Tai Zhang, and Kenneth Miura.
+"""
+import bisect
+import csv
+import datetime
+import os
+from array import array
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+import scipy.sparse
+
+import array_file
+from dataclasses import DEMOCRATIC, WeightedGraph
+from compact_graph import CompactWeightedGraph, sum_by_key
+import columnar
+import cooccurrence
+import csv_to_graph
+
+TIMELINE_MAGIC = b'HASHDAYS'
+TIMELINE_VERSION = 2
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# How many tweets TimelineStore.add_tweets encodes before adding them to the buckets.
+CHUNK_SIZE = 1 << 18
+
+# The name of the file of the dictionary of hashtags in a timeline store, and the extension of
+# the buckets, which are named after their day (like 2018-11-06.day).
+_HASHTAGS_FILE = 'hashtags'
+_BUCKET_EXTENSION = '.day'
+
+# The id of the first hashtag of a pair takes up the bits above these in its key.
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+# The names of the arrays of a bucket.
+_BUCKET_ARRAYS = ['hashtags', 'counts', 'counts_dem', 'pair_keys', 'pair_counts']
+
+
+class TimelineStore:
+    """The counts of the hashtags and the pairs of hashtags of the tweets of every day, saved
+    in the directory store_dir. See the module docstring.
+
+    Instance Attributes:
+        - store_dir: the directory the dictionary of hashtags and the buckets are saved in
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as store_dir:
+    ...     store = TimelineStore(store_dir)
+    ...     tweets = [(11, 1541462400, 0, ['daca', 'dreamers']),
+    ...               (12, 1541548800, 1, ['maga', 'daca']), (13, 1541552400, 1, ['maga'])]
+    ...     store.add_tweets(tweets)
+    ...     store.add_tweets(tweets)
+    ...     store.days()
+    ...     g = store.window_graph(datetime.date(2018, 11, 7), datetime.date(2018, 11, 7))
+    ...     g.get_weight_hashtag('daca'), g.get_count_edge('daca', 'maga')
+    3
+    0
+    [datetime.date(2018, 11, 6), datetime.date(2018, 11, 7)]
+    (1.0, 1)
+    """
+    store_dir: str
+
+    # Private Instance Attributes:
+    #     - _hashtags: every hashtag of the store, indexed by id
+    #     - _ids: maps each hashtag of the store to its id
+    #     - _days: the days that have a bucket, sorted
+    _hashtags: list[str]
+    _ids: dict[str, int]
+    _days: list[datetime.date]
+
+    def __init__(self, store_dir: str) -> None:
+        """Open the timeline store in store_dir, making the directory if it doesn't exist."""
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        hashtags_file = os.path.join(store_dir, _HASHTAGS_FILE)
+        if os.path.exists(hashtags_file):
+            blob = _load_timeline_file(hashtags_file)['hashtags']
+            self._hashtags = columnar.decode_strings(blob)
+        else:
+            self._hashtags = []
+        self._ids = {hashtag: i for i, hashtag in enumerate(self._hashtags)}
+        self._days = sorted(datetime.date.fromisoformat(name[:-len(_BUCKET_EXTENSION)])
+                            for name in os.listdir(store_dir)
+                            if name.endswith(_BUCKET_EXTENSION))
+
+    def days(self) -> list[datetime.date]:
+        """Return the days that have tweets in this store, in order."""
+        return list(self._days)
+
+    def hashtag_ids(self, hashtags: Iterable[str]) -> np.ndarray:
+        """Return the id of every hashtag in hashtags, giving the ones that aren't in this
+        store yet the next ids. The new hashtags are only saved once tweets are added.
+        """
+        return np.array([self._ids.setdefault(hashtag, len(self._ids)) for hashtag in hashtags],
+                        dtype=np.int64)
+
+    def add_tweets(self, records: Iterable[tuple[int, int, int, list[str]]]) -> int:
+        """Add the tweets in records, which are tuples of the id of a tweet (or -1 if it isn't
+        known), the time it was sent (in seconds since the epoch, or -1 if it isn't known), its
+        party and its list of hashtags (in lower case), to the buckets of their days. Return
+        the number of tweets added, which leaves out the ones whose ids or times aren't known,
+        and the ones that are already in the store.
+
+        records is encoded and added CHUNK_SIZE tweets at a time, so it can be a stream of
+        tweets that doesn't fit in memory.
+        """
+        added = 0
+        offsets, hashtag_ids, parties = array('q', [0]), array('q'), array('B')
+        tweet_ids, times = array('q'), array('q')
+        for tweet_id, created_at, party, hashtags in records:
+            for hashtag in hashtags:
+                hashtag_ids.append(self._ids.setdefault(hashtag, len(self._ids)))
+            offsets.append(len(hashtag_ids))
+            parties.append(party)
+            tweet_ids.append(tweet_id)
+            times.append(created_at)
+            if len(times) == CHUNK_SIZE:
+                added += self.add_encoded(np.frombuffer(offsets, dtype=np.int64),
+                                          np.frombuffer(hashtag_ids, dtype=np.int64),
+                                          np.frombuffer(parties, dtype=np.uint8),
+                                          np.frombuffer(times, dtype=np.int64),
+                                          np.frombuffer(tweet_ids, dtype=np.int64))
+                offsets, hashtag_ids, parties = array('q', [0]), array('q'), array('B')
+                tweet_ids, times = array('q'), array('q')
+        return added + self.add_encoded(np.frombuffer(offsets, dtype=np.int64),
+                                        np.frombuffer(hashtag_ids, dtype=np.int64),
+                                        np.frombuffer(parties, dtype=np.uint8),
+                                        np.frombuffer(times, dtype=np.int64),
+                                        np.frombuffer(tweet_ids, dtype=np.int64))
+
+    def add_encoded(self, offsets: np.ndarray, hashtag_ids: np.ndarray, parties: np.ndarray,
+                    created_at: np.ndarray, tweet_ids: np.ndarray) -> int:
+        """Add the tweets encoded in the given arrays to the buckets of their days, like
+        add_tweets. The hashtags of tweet i are hashtag_ids[offsets[i]:offsets[i + 1]], which
+        are ids of this store (see hashtag_ids), its party is parties[i], the time it was
+        sent is created_at[i], and its id is tweet_ids[i].
+
+        Only the tweet ids of the buckets of the days of these tweets are read, so this takes
+        time for those days, and not for the whole store.
+        """
+        # the dictionary is saved first, so a bucket never has an id that isn't in it
+        if len(self._ids) > len(self._hashtags):
+            self._hashtags = list(self._ids)
+            hashtags_blob = np.frombuffer('\n'.join(self._hashtags).encode('utf-8'),
+                                          dtype=np.uint8)
+            _save_timeline_file(os.path.join(self.store_dir, _HASHTAGS_FILE),
+                                {'num_hashtags': len(self._hashtags)},
+                                {'hashtags': hashtags_blob})
+
+        tweets = np.flatnonzero((created_at >= 0) & (tweet_ids >= 0))
+        if len(tweets) == 0:
+            return 0
+        days = created_at[tweets] // SECONDS_PER_DAY
+        order = np.argsort(days, kind='stable')
+        tweets, days = tweets[order], days[order]
+        starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+        added = 0
+        for start, end in zip(starts.tolist(), np.append(starts[1:], len(days)).tolist()):
+            day = datetime.date(1970, 1, 1) + datetime.timedelta(days=int(days[start]))
+            # a tweet that is in these arrays twice is only counted once
+            day_tweet_ids, first = np.unique(tweet_ids[tweets[start:end]], return_index=True)
+            day_tweets = tweets[start:end][first]
+            if day in self._days:
+                seen_ids = np.array(_load_timeline_file(self._bucket_file(day))['tweet_ids'])
+                new = ~_positions(seen_ids, day_tweet_ids)[1]
+                day_tweets, day_tweet_ids = day_tweets[new], day_tweet_ids[new]
+                if len(day_tweets) == 0:
+                    continue
+                day_tweet_ids = np.union1d(seen_ids, day_tweet_ids)
+
+            day_offsets, day_ids = _select_tweets(offsets, hashtag_ids, day_tweets)
+            bucket = _count_day(day_offsets, day_ids, parties[day_tweets])
+            if day in self._days:
+                bucket = _merge_counts([self._bucket(day), bucket], [1, 1])
+            else:
+                bisect.insort(self._days, day)
+            bucket['tweet_ids'] = day_tweet_ids
+            _save_timeline_file(self._bucket_file(day), {'day': day.isoformat()}, bucket)
+            added += len(day_tweets)
+        return added
+
+    def window_counts(self, first_day: datetime.date,
+                      last_day: datetime.date) -> dict[str, np.ndarray]:
+        """Return the sums of the buckets of the days from first_day to last_day (inclusive),
+        with the same arrays as a bucket. Only the buckets of the days in the window are read.
+        """
+        low = bisect.bisect_left(self._days, first_day)
+        high = bisect.bisect_right(self._days, last_day)
+        return _merge_counts([self._bucket(day) for day in self._days[low:high]],
+                             [1] * (high - low))
+
+    def window_graph(self, first_day: datetime.date, last_day: datetime.date,
+                     min_count: int = 0, edge_format: str = 'abs', compact: bool = False) \
+            -> Union[WeightedGraph, CompactWeightedGraph]:
+        """Return the graph of the tweets sent from first_day to last_day (inclusive), without
+        the hashtags at or below min_count in that window. This graph has the same hashtags,
+        counts and edges as the one load_weighted_hashtags_graph would build from just those
+        tweets, but its hashtags are in the order they were first added to the store.
+
+        See csv_to_graph.load_weighted_hashtags_graph for compact.
+
+        Preconditions:
+            - min_count >= 0
+            - edge_format == 'abs' or 'max'
+        """
+        return self._graph_of(self.window_counts(first_day, last_day), min_count, edge_format,
+                              compact)
+
+    def rolling_graphs(self, first_day: datetime.date, last_day: datetime.date,
+                       window_days: int, min_count: int = 0, edge_format: str = 'abs',
+                       compact: bool = False) \
+            -> Iterator[tuple[datetime.date, Union[WeightedGraph, CompactWeightedGraph]]]:
+        """Yield every day from window_days - 1 days after first_day to last_day, with the
+        window_graph of the window_days days that end on it.
+
+        Every window's counts are the counts of the window before it, plus the bucket of its
+        last day, minus the bucket of the day before its first day, so each step only reads
+        two buckets no matter how long the windows are.
+
+        Preconditions:
+            - window_days >= 1
+            - min_count >= 0
+            - edge_format == 'abs' or 'max'
+        """
+        one_day = datetime.timedelta(days=1)
+        day = first_day + (window_days - 1) * one_day
+        # the window before the first one, which starts the day before first_day
+        counts = self.window_counts(first_day - one_day, day - one_day)
+        while day <= last_day:
+            counts = _merge_counts([counts, self._bucket(day),
+                                    self._bucket(day - window_days * one_day)], [1, 1, -1])
+            yield day, self._graph_of(counts, min_count, edge_format, compact)
+            day += one_day
+
+    def _bucket(self, day: datetime.date) -> dict[str, np.ndarray]:
+        """Return the arrays of the bucket of day other than its tweet ids, which are empty if
+        it has no bucket. The arrays are copied out of the file, so the bucket can be saved
+        again while they are used.
+        """
+        if day not in self._days:
+            return _empty_counts()
+        arrays = _load_timeline_file(self._bucket_file(day))
+        return {name: np.array(arrays[name]) for name in _BUCKET_ARRAYS}
+
+    def _bucket_file(self, day: datetime.date) -> str:
+        """Return the name of the file of the bucket of day."""
+        return os.path.join(self.store_dir, day.isoformat() + _BUCKET_EXTENSION)
+
+    def _graph_of(self, counts: dict[str, np.ndarray], min_count: int, edge_format: str,
+                  compact: bool) -> Union[WeightedGraph, CompactWeightedGraph]:
+        """Return the graph of the counts of a window (see window_counts), without the
+        hashtags at or below min_count. See window_graph.
+        """
+        keep = counts['counts'] > min_count
+        kept = counts['hashtags'][keep]
+        # the position of the hashtags of every pair in kept, and whether both were kept
+        rows, row_kept = _positions(kept, counts['pair_keys'] >> _ID_BITS)
+        cols, col_kept = _positions(kept, counts['pair_keys'] & _ID_MASK)
+        both_kept = row_kept & col_kept
+        rows, cols = rows[both_kept], cols[both_kept]
+        pair_counts = counts['pair_counts'][both_kept]
+        # every pair between two different hashtags is in the rows of both of them
+        different = rows != cols
+        pairs = scipy.sparse.csr_matrix(
+            (np.concatenate([pair_counts, pair_counts[different]]),
+             (np.concatenate([rows, cols[different]]), np.concatenate([cols, rows[different]]))),
+            shape=(len(kept), len(kept)))
+
+        arrays = cooccurrence.graph_arrays([self._hashtags[i] for i in kept.tolist()],
+                                           counts['counts'][keep], counts['counts_dem'][keep],
+                                           pairs)
+        return cooccurrence.build_graph(arrays, edge_format, compact)
+
+
+def build_timeline(tweets_file: str, store_dir: str) -> TimelineStore:
+    """Add the tweets of tweets_file, a csv file made by get_us_hashtags or a columnar file, to
+    the timeline store in store_dir, and return the store. The tweets of a columnar file are
+    added without looking at them one at a time.
+
+    Only the tweets that aren't in the store yet are added, so building the same store from
+    the same file again (or from a file that overlaps the tweets already in the store)
+    doesn't count any tweet twice. The tweets of files made before the created_at column was
+    added have no times, so none of them are added.
+    """
+    store = TimelineStore(store_dir)
+    if columnar.is_columnar_file(tweets_file):
+        items, offsets, hashtag_ids, parties = cooccurrence.encode_columnar(tweets_file)
+        columns = columnar.load_columnar(tweets_file)
+        store.add_encoded(offsets, store.hashtag_ids(items)[hashtag_ids], parties,
+                          np.asarray(columns['created_at']), np.asarray(columns['tweet_ids']))
+    else:
+        store.add_tweets(_read_timed_rows(tweets_file))
+    return store
+
+
+def _load_timeline_file(file_name: str) -> dict[str, np.ndarray]:
+    """Return the arrays of the timeline file file_name (a bucket or the dictionary of
+    hashtags), which are memory-mapped.
+
+    Raise a ValueError if file_name isn't a timeline file of TIMELINE_VERSION.
+    """
+    return array_file.load_arrays(file_name, TIMELINE_MAGIC, TIMELINE_VERSION)[1]
+
+
+def _save_timeline_file(file_name: str, header: dict, arrays: dict[str, np.ndarray]) -> None:
+    """Save arrays to the timeline file file_name, with the given header."""
+    array_file.save_arrays(file_name, TIMELINE_MAGIC, TIMELINE_VERSION, header, arrays)
+
+
+def _count_day(offsets: np.ndarray, hashtag_ids: np.ndarray,
+               parties: np.ndarray) -> dict[str, np.ndarray]:
+    """Return the bucket of the tweets encoded in the given arrays (see
+    TimelineStore.add_encoded).
+
+    >>> bucket = _count_day(np.array([0, 2, 5]), np.array([7, 3, 3, 3, 9]), np.array([0, 1]))
+    >>> bucket['hashtags'].tolist(), bucket['counts'].tolist(), bucket['counts_dem'].tolist()
+    ([3, 7, 9], [3, 1, 1], [1, 1, 0])
+    >>> [(key >> _ID_BITS, key & _ID_MASK) for key in bucket['pair_keys'].tolist()]
+    [(3, 3), (3, 7), (3, 9), (7, 7), (9, 9)]
+    >>> bucket['pair_counts'].tolist()
+    [5, 1, 2, 1, 1]
+    """
+    hashtags, local_ids = np.unique(hashtag_ids, return_inverse=True)
+    entry_parties = np.repeat(parties, np.diff(offsets))
+    pairs = scipy.sparse.triu(cooccurrence.pair_matrix(len(hashtags), offsets, local_ids)).tocoo()
+    pair_keys, pair_counts = sum_by_key((hashtags[pairs.row] << _ID_BITS) | hashtags[pairs.col],
+                                        pairs.data.astype(np.int64))
+    return {'hashtags': hashtags,
+            'counts': np.bincount(local_ids, minlength=len(hashtags)).astype(np.int64),
+            'counts_dem': np.bincount(local_ids[entry_parties == DEMOCRATIC],
+                                      minlength=len(hashtags)).astype(np.int64),
+            'pair_keys': pair_keys,
+            'pair_counts': pair_counts}
+
+
+def _merge_counts(buckets: list[dict[str, np.ndarray]],
+                  signs: list[int]) -> dict[str, np.ndarray]:
+    """Return the sum of buckets, each multiplied by its sign in signs (1 or -1). The
+    hashtags and pairs whose counts add up to 0 are left out.
+    """
+    if len(buckets) == 0:
+        return _empty_counts()
+    hashtags = np.concatenate([bucket['hashtags'] for bucket in buckets])
+    counts = np.concatenate([sign * bucket['counts'] for bucket, sign in zip(buckets, signs)])
+    counts_dem = np.concatenate([sign * bucket['counts_dem']
+                                 for bucket, sign in zip(buckets, signs)])
+    pair_keys = np.concatenate([bucket['pair_keys'] for bucket in buckets])
+    pair_counts = np.concatenate([sign * bucket['pair_counts']
+                                  for bucket, sign in zip(buckets, signs)])
+
+    # sum_by_key sorts the keys the same way both times
+    merged_hashtags, counts = sum_by_key(hashtags, counts)
+    counts_dem = sum_by_key(hashtags, counts_dem)[1]
+    pair_keys, pair_counts = sum_by_key(pair_keys, pair_counts)
+    used = counts != 0
+    paired = pair_counts != 0
+    return {'hashtags': merged_hashtags[used], 'counts': counts[used],
+            'counts_dem': counts_dem[used], 'pair_keys': pair_keys[paired],
+            'pair_counts': pair_counts[paired]}
+
+
+def _empty_counts() -> dict[str, np.ndarray]:
+    """Return the arrays of a bucket without any tweets."""
+    return {name: np.zeros(0, dtype=np.int64) for name in _BUCKET_ARRAYS}
+
+
+def _select_tweets(offsets: np.ndarray, hashtag_ids: np.ndarray,
+                   tweets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the offsets and hashtag ids of the given tweets of the tweets encoded in offsets
+    and hashtag_ids, in the order of tweets.
+
+    >>> new_offsets, new_ids = _select_tweets(np.array([0, 2, 3, 5]), np.array([4, 5, 6, 7, 8]),
+    ...                                       np.array([2, 0]))
+    >>> new_offsets.tolist(), new_ids.tolist()
+    ([0, 2, 4], [7, 8, 4, 5])
+    """
+    starts = offsets[tweets]
+    lengths = offsets[tweets + 1] - starts
+    new_offsets = np.zeros(len(tweets) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return new_offsets, hashtag_ids[positions]
+
+
+def _positions(sorted_values: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the position of every value of values in the sorted array sorted_values, and
+    whether it is in sorted_values at all.
+
+    >>> positions, found = _positions(np.array([2, 5, 9]), np.array([5, 3, 9, 10]))
+    >>> positions.tolist(), found.tolist()
+    ([1, 1, 2, 3], [True, False, True, False])
+    """
+    positions = np.searchsorted(sorted_values, values)
+    found = np.zeros(len(values), dtype=bool)
+    inside = positions < len(sorted_values)
+    found[inside] = sorted_values[positions[inside]] == values[inside]
+    return positions, found
+
+
+def _read_timed_rows(tweets_csv: str) -> Iterator[tuple[int, int, int, list[str]]]:
+    """Yield the tweet id, time, party and list of hashtags of every row of the csv file
+    tweets_csv. The id or the time is -1 if the row (or the file) doesn't have one.
+    """
+    with open(tweets_csv, encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        id_column = header.index('tweet_id') if 'tweet_id' in header else -1
+        time_column = header.index('created_at') if 'created_at' in header else -1
+        for row in reader:
+            tweet_id = int(row[id_column] or -1) if id_column != -1 else -1
+            created_at = int(row[time_column] or -1) if time_column != -1 else -1
+            yield tweet_id, created_at, int(row[1]), csv_to_graph.string_to_list(row[2])
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['bisect', 'csv', 'datetime', 'os', 'array', 'numpy', 'scipy.sparse',
+                          'dataclasses', 'compact_graph', 'columnar', 'cooccurrence',
+                          'csv_to_graph', 'array_file'],
+        'allowed-io': ['_read_timed_rows'],
+        'max-nested-blocks': 4
+    })
+
+    import doctest
+
+    doctest.testmod()
@@ -20,10 +20,12 @@ please consult our Course Syllabus.
 
 This file is Copyright (c) 2021 David Liu and Isaac Waller.
 """
-import networkx as nx
+from typing import Any, Union
+
 from plotly.graph_objs import Scatter, Figure
 
 import dataclasses
+from layout import get_layout
 
 
 # Colours to use when visualizing different clusters.
@@ -41,20 +43,21 @@ USER_COLOUR = 'rgb(105, 89, 205)'
 
 
 def visualize_graph(graph: dataclasses.WeightedGraph,
-                    layout: str = 'spring_layout',
+                    layout: str = 'force_layout',
                     max_vertices: int = 5000,
                     output_file: str = '') -> None:
     """Use plotly and networkx to visualize the given graph.
 
     Optional arguments:
-        - layout: which graph layout algorithm to use
+        - layout: which graph layout algorithm to use, one of layout.LAYOUTS or the name of
+            a networkx layout (see layout.get_layout)
         - max_vertices: the maximum number of vertices that can appear in the graph
         - output_file: a filename to save the plotly image to (rather than displaying
             in your web browser)
     """
     graph_nx = graph.to_networkx(max_vertices)
 
-    pos = getattr(nx, layout)(graph_nx)
+    pos = get_layout(layout)(graph_nx)
 
     x_values = [pos[k][0] for k in graph_nx.nodes]
     y_values = [pos[k][1] for k in graph_nx.nodes]
@@ -104,38 +107,42 @@ def visualize_graph(graph: dataclasses.WeightedGraph,
         fig.write_image(output_file)
 
 
-def visualize_graph_clusters(graph: dataclasses.WeightedGraph, clusters: list[set],
-                             layout: str = 'spring_layout',
+def visualize_graph_clusters(graph: dataclasses.WeightedGraph,
+                             clusters: Union[list[set], dict[Any, int]],
+                             layout: str = 'force_layout',
                              max_vertices: int = 5000,
                              output_file: str = '') -> None:
     """Visualize the given graph, using different colours to illustrate the different clusters.
 
+    clusters is either a list of sets of vertices, or a dict mapping every vertex to the index
+    of its cluster (see clustering.cluster_graph). A vertex in more than one set is in the
+    first of them.
+
     Hides all edges that go from one cluster to another. (This helps the graph layout algorithm
     positions vertices in the same cluster close together.)
 
     Same optional arguments as visualize_graph (see that function for details).
     """
+    if isinstance(clusters, dict):
+        cluster_of = clusters
+    else:
+        cluster_of = {}
+        for i, cluster in enumerate(clusters):
+            for vertex in cluster:
+                cluster_of.setdefault(vertex, i)
+
     graph_nx = graph.to_networkx(max_vertices)
-    all_edges = list(graph_nx.edges)
-    for edge in all_edges:
-        # Check if edge is within the same cluster
-        if any((edge[0] in cluster) != (edge[1] in cluster) for cluster in clusters):
-            graph_nx.remove_edge(edge[0], edge[1])
+    graph_nx.remove_edges_from([(u, v) for u, v in graph_nx.edges
+                                if cluster_of.get(u) != cluster_of.get(v)])
 
-    pos = getattr(nx, layout)(graph_nx)
+    pos = get_layout(layout)(graph_nx)
 
     x_values = [pos[k][0] for k in graph_nx.nodes]
     y_values = [pos[k][1] for k in graph_nx.nodes]
     labels = list(graph_nx.nodes)
 
-    colors = []
-    for k in graph_nx.nodes:
-        for i, c in enumerate(clusters):
-            if k in c:
-                colors.append(COLOUR_SCHEME[i % len(COLOUR_SCHEME)])
-                break
-        else:
-            colors.append(BOOK_COLOUR)
+    colors = [BOOK_COLOUR if k not in cluster_of
+              else COLOUR_SCHEME[cluster_of[k] % len(COLOUR_SCHEME)] for k in graph_nx.nodes]
 
     x_edges = []
     y_edges = []
@@ -169,7 +176,6 @@ def visualize_graph_clusters(graph: dataclasses.WeightedGraph, clusters: list[se
     fig.update_layout({'showlegend': False})
     fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
     fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
-    fig.show()
 
     if output_file == '':
         fig.show()